@@ -0,0 +1,182 @@
+"""Async API versus the sync model layer under concurrent load.
+
+Run from the lib directory:
+
+    python -m benchmarks.aio --size 100000 --ops 2000 --concurrency 50
+
+Seeds a throwaway SQLite file, then runs the same mixed workload (lookups by
+id and name, catalog pages, add-to-cart) from --concurrency coroutines on one
+event loop in three ways:
+
+  sync      the model classmethods called straight from the coroutines, as an
+            asyncio service would without db.aio (blocks the loop);
+  executor  the sync path pushed to a thread pool with one session per thread;
+  async     db.aio.
+
+For each it reports operations/sec and the worst event-loop stall seen by a
+10 ms heartbeat task, which is what other requests on the loop would wait.
+"""
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+HEARTBEAT = 0.01
+
+
+def workload(n_ops, n_supplements, n_users, seed=0):
+    """(kind, args) tuples: 40% lookup by id, 30% by name, 10% catalog page, 20% add to cart."""
+    rng = random.Random(seed)
+    ops = []
+    for _ in range(n_ops):
+        roll = rng.random()
+        if roll < 0.4:
+            ops.append(("find_supplement", (rng.randint(1, n_supplements),)))
+        elif roll < 0.7:
+            ops.append(("find_user_by_name", (rng.randint(1, n_users),)))
+        elif roll < 0.8:
+            ops.append(("list_supplements", (rng.randint(0, max(n_supplements - 20, 0)),)))
+        else:
+            ops.append(("add_to_cart", (rng.randint(1, n_users), rng.randint(1, n_supplements))))
+    return ops
+
+
+def sync_op(session, names, kind, args):
+    from db.database import run_immediate
+    from db.models.cart import Cart
+    from db.models.supplement import Supplement
+    from db.models.user import User
+    from db import resolver
+
+    if kind == "find_supplement":
+        return resolver.resolve(session, Supplement, args[0])
+    if kind == "find_user_by_name":
+        return resolver.resolve(session, User, names[args[0]])
+    if kind == "list_supplements":
+        return Supplement.stream(session, after_id=args[0], limit=20).all()
+    user, supplement = session.get(User, args[0]), session.get(Supplement, args[1])
+    try:
+        return run_immediate(session, lambda: Cart.add(session, user, supplement, 1, commit=False))
+    except ValueError:
+        return None
+
+
+async def async_op(names, kind, args):
+    from db import aio
+
+    if kind == "find_supplement":
+        return await aio.find_supplement(args[0])
+    if kind == "find_user_by_name":
+        return await aio.find_user(names[args[0]])
+    if kind == "list_supplements":
+        return await aio.list_supplements(after_id=args[0], limit=20)
+    try:
+        return await aio.add_to_cart(args[0], args[1], 1)
+    except ValueError:
+        return None
+
+
+async def drive(ops, concurrency, run):
+    """Run ops through run(kind, args) from concurrency coroutines; return (ops/sec, max stall ms)."""
+    queue = asyncio.Queue()
+    for op in ops:
+        queue.put_nowait(op)
+    stall = 0.0
+    done = asyncio.Event()
+
+    async def heartbeat():
+        nonlocal stall
+        while not done.is_set():
+            before = time.perf_counter()
+            await asyncio.sleep(HEARTBEAT)
+            stall = max(stall, time.perf_counter() - before - HEARTBEAT)
+
+    async def worker():
+        while not queue.empty():
+            kind, args = queue.get_nowait()
+            await run(kind, args)
+
+    ticker = asyncio.ensure_future(heartbeat())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticker
+    return len(ops) / elapsed, stall * 1000
+
+
+def user_names(engine):
+    from sqlalchemy import select
+    from db.models.user import User
+
+    with engine.connect() as conn:
+        return dict(conn.execute(select(User.id, User.name)).all())
+
+
+@click.command()
+@click.option('--size', type=click.IntRange(min=1), default=100000, show_default=True, help="Supplements in the catalog (users: a tenth).")
+@click.option('--ops', 'n_ops', type=click.IntRange(min=1), default=2000, show_default=True, help="Operations per mode.")
+@click.option('--concurrency', type=click.IntRange(min=1), default=50, show_default=True, help="Concurrent coroutines.")
+@click.option('--threads', type=click.IntRange(min=1), default=8, show_default=True, help="Thread pool size for the executor mode.")
+@click.option('--workers', type=click.IntRange(min=1), default=os.cpu_count() or 1, show_default=True, help="Seeder worker processes.")
+def main(size, n_ops, concurrency, threads, workers):
+    """Compare db.aio with the sync model layer from one event loop."""
+    from sqlalchemy.orm import sessionmaker
+    from db import aio
+    from db.database import configure, get_engine, get_session
+    from db.seed import seed_database
+
+    n_users = max(size // 10, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        configure(db_path=os.path.join(tmp, "aio.db"), profile="fast")
+        engine = get_engine()
+        seed_database(engine, n_supplements=size, n_users=n_users, n_cart=0, workers=workers)
+        names = user_names(engine)
+        results = {}
+
+        session = get_session()
+
+        async def run_sync(kind, args):
+            sync_op(session, names, kind, args)
+
+        results["sync"] = asyncio.run(drive(workload(n_ops, size, n_users, 1), concurrency, run_sync))
+
+        local = threading.local()
+        make_session = sessionmaker(bind=engine)
+        pool = ThreadPoolExecutor(threads)
+
+        def in_thread(kind, args):
+            if not hasattr(local, "session"):
+                local.session = make_session()
+            sync_op(local.session, names, kind, args)
+
+        async def run_executor(kind, args):
+            await asyncio.get_running_loop().run_in_executor(pool, in_thread, kind, args)
+
+        results["executor"] = asyncio.run(drive(workload(n_ops, size, n_users, 2), concurrency, run_executor))
+        pool.shutdown()
+
+        async def run_async():
+            async def run(kind, args):
+                await async_op(names, kind, args)
+            try:
+                return await drive(workload(n_ops, size, n_users, 3), concurrency, run)
+            finally:
+                await aio.dispose()
+
+        results["async"] = asyncio.run(run_async())
+        configure()
+
+    click.echo(f"\n{'mode':<10} {'ops/sec':>10} {'max loop stall ms':>18}")
+    for mode, (rate, stall) in results.items():
+        click.echo(f"{mode:<10} {rate:>10,.0f} {stall:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Catalog aggregates: an ORM loop against the NumPy snapshot.
+
+Run from the lib directory:
+
+    python -m benchmarks.analytics --rows 1000000
+
+Seeds a throwaway SQLite file with --rows supplements, then computes the
+same report both ways: total stock value, stock value and price percentiles
+per category, and the products under --low-stock units. The ORM side loops
+over Supplement objects (yield_per batches) and sorts each category's prices
+in Python. The snapshot side is timed per stage: building it from the
+database, saving the .npz, memory-mapping it back, and the aggregates
+themselves on the mapped arrays. The two reports are compared before
+anything is printed.
+"""
+import math
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+import click
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values, p):
+    """Linear interpolation between closest ranks, as np.percentile does."""
+    position = (len(sorted_values) - 1) * p / 100.0
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def orm_report(session, low_stock):
+    from db.models.supplement import Supplement
+
+    prices, values, low = defaultdict(list), defaultdict(float), defaultdict(int)
+    for supplement in session.query(Supplement).yield_per(10000):
+        category, quantity = supplement.category or '', supplement.quantity or 0
+        prices[category].append(supplement.price)
+        values[category] += supplement.price * quantity
+        if quantity < low_stock:
+            low[category] += 1
+    report = {}
+    for category, category_prices in prices.items():
+        category_prices.sort()
+        report[category] = (values[category], low[category],
+                            [percentile(category_prices, p) for p in PERCENTILES])
+    return report
+
+
+def snapshot_report(snapshot, low_stock):
+    return {row["category"]: (row["value"], row["low_stock"], [row["percentiles"][p] for p in PERCENTILES])
+            for row in snapshot.by_category(PERCENTILES, low_stock=low_stock)}
+
+
+def same(a, b):
+    return a.keys() == b.keys() and all(
+        a[key][1] == b[key][1] and all(math.isclose(x, y, rel_tol=1e-9) for x, y in zip([a[key][0]] + a[key][2], [b[key][0]] + b[key][2]))
+        for key in a
+    )
+
+
+@click.command()
+@click.option('--rows', type=click.IntRange(min=1), default=1000000, show_default=True, help="Supplements to seed.")
+@click.option('--low-stock', type=click.IntRange(min=0), default=10, show_default=True, help="Low-stock threshold.")
+def main(rows, low_stock):
+    """Time the ORM loop and each stage of the NumPy snapshot on the same report."""
+    from sqlalchemy.orm import Session
+    from db.analytics import Snapshot
+    from db.database import configure, get_engine
+    from db.seed import seed_database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "analytics.db")
+        cache = os.path.join(tmp, "analytics.npz")
+        configure(db_path=path, profile="bulk-load")
+        click.echo(f"Seeding {rows:,} supplements...", err=True)
+        seed_database(get_engine(), n_supplements=rows, n_users=1, n_cart=0)
+        engine = get_engine()
+
+        timings = {}
+        started = time.perf_counter()
+        with Session(engine) as session:
+            expected = orm_report(session, low_stock)
+        timings["ORM loop"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        snapshot = Snapshot.load(engine)
+        timings["snapshot: build"] = time.perf_counter() - started
+        started = time.perf_counter()
+        snapshot.save(cache)
+        timings["snapshot: save .npz"] = time.perf_counter() - started
+        started = time.perf_counter()
+        snapshot = Snapshot.open(cache)
+        timings["snapshot: mmap load"] = time.perf_counter() - started
+        started = time.perf_counter()
+        actual = snapshot_report(snapshot, low_stock)
+        timings["snapshot: aggregates"] = time.perf_counter() - started
+        matches = same(expected, actual)
+        size = os.path.getsize(cache)
+        del snapshot
+        configure()
+
+    click.echo(f"\n{rows:,} supplements, {len(expected)} categories, snapshot {size / 2**20:,.1f} MiB")
+    click.echo(f"{'stage':<22} {'ms':>10} {'vs ORM':>8}")
+    for stage, seconds in timings.items():
+        click.echo(f"{stage:<22} {seconds * 1000:>10,.1f} {timings['ORM loop'] / seconds:>7,.0f}x")
+    click.echo("Reports match." if matches else "Reports DIFFER.")
+    if not matches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
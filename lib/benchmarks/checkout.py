@@ -0,0 +1,142 @@
+"""Checking out carts one by one against the chunked bulk checkout.
+
+Run from the lib directory:
+
+    python -m benchmarks.checkout --users 20000 --lines 5
+
+Builds a throwaway database with --users users, each holding a cart of
+--lines lines, where every --bad-every-th cart has a line with quantity 0
+that checkout must refuse. Then, on a fresh copy for each mode, checks
+every cart out three ways: an ORM loop (load the lines, add an Order and
+its OrderItems, delete the lines, commit per user), Order.checkout once per
+user in its own transaction (what python cli.py checkout USER does), and
+db.checkout.checkout_carts with --chunk-size users per transaction (python
+cli.py checkout --all). Reports orders/sec and checks that all three leave
+the same orders, lines, carts and stock behind.
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import click
+from sqlalchemy import text
+
+
+def build(path, users, lines, bad_every):
+    from db.database import configure, get_engine
+
+    configure(db_path=path, profile="bulk-load")
+    with get_engine().begin() as conn:
+        conn.execute(text(
+            "INSERT INTO supplements (id, name, description, price, quantity, category) "
+            "VALUES (:id, :name, 'benchmark row', :price, 1000000, 'Bench')"
+        ), [{"id": i, "name": f"Supplement {i}", "price": 5 + i % 50} for i in range(1, lines * 10 + 1)])
+        conn.execute(text("INSERT INTO users (id, name, email) VALUES (:id, :name, :email)"),
+                     [{"id": i, "name": f"Buyer {i}", "email": f"buyer{i}@example.com"} for i in range(1, users + 1)])
+        conn.execute(text(
+            "INSERT INTO cart (user_name, supplement_name, supplement_price, quantity, user_id, supplement_id) "
+            "VALUES (:user_name, :supplement_name, :price, :quantity, :user_id, :supplement_id)"
+        ), [{
+            "user_name": f"Buyer {u}", "supplement_name": f"Supplement {s}", "price": 5 + s % 50,
+            "quantity": 0 if u % bad_every == 0 and n == 0 else 1 + (u + n) % 3, "user_id": u, "supplement_id": s,
+        } for u in range(1, users + 1) for n, s in enumerate(range(u % 10 * lines + 1, u % 10 * lines + lines + 1))])
+    configure()
+
+
+def state(path):
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    try:
+        return tuple(conn.execute(query).fetchall() for query in (
+            "SELECT COUNT(*), SUM(items), SUM(quantity), ROUND(SUM(total), 2) FROM orders",
+            "SELECT COUNT(*), SUM(quantity), ROUND(SUM(price * quantity), 2) FROM order_items",
+            "SELECT COUNT(*), SUM(quantity) FROM cart",
+            "SELECT SUM(quantity) FROM supplements",
+        ))
+    finally:
+        conn.close()
+
+
+def orm_loop(session, chunk_size):
+    from db.checkout import cart_users
+    from db.models.cart import Cart
+    from db.models.order import Order, OrderItem
+
+    for user_id in cart_users(session):
+        lines = session.query(Cart).filter_by(user_id=user_id).all()
+        if any(line.quantity is None or line.quantity < 1 for line in lines):
+            continue
+        order = Order(user_id=user_id, user_name=lines[0].user.name, items=len(lines),
+                      quantity=sum(line.quantity for line in lines),
+                      total=sum(line.quantity * line.supplement_price for line in lines))
+        order.lines = [OrderItem(supplement_id=line.supplement_id, supplement_name=line.supplement.name,
+                                 price=line.supplement_price, quantity=line.quantity) for line in lines]
+        session.add(order)
+        for line in lines:
+            session.delete(line)
+        session.commit()
+
+
+def per_user(session, chunk_size):
+    from db.checkout import cart_users
+    from db.database import run_immediate
+    from db.models.cart import Cart
+    from db.models.order import Order
+
+    user_ids = cart_users(session)
+    session.rollback()
+    for user_id in user_ids:
+        run_immediate(session, lambda: Order.checkout(session, Cart.user_id == user_id))
+
+
+def bulk(session, chunk_size):
+    from db.checkout import checkout_carts
+
+    checkout_carts(session, chunk_size=chunk_size)
+
+
+MODES = {
+    "orm": ("ORM loop, commit per user", orm_loop),
+    "user": ("Order.checkout per user", per_user),
+    "bulk": ("checkout_carts, chunked", bulk),
+}
+
+
+@click.command()
+@click.option('--users', type=click.IntRange(min=1), default=20000, show_default=True, help="Users with a cart.")
+@click.option('--lines', type=click.IntRange(min=1), default=5, show_default=True, help="Cart lines per user.")
+@click.option('--bad-every', type=click.IntRange(min=1), default=100, show_default=True, help="Every Nth cart has a line checkout must refuse.")
+@click.option('--chunk-size', type=click.IntRange(min=1), default=1000, show_default=True, help="Users per transaction in bulk mode.")
+@click.option('--modes', default=",".join(MODES), show_default=True, help="Comma-separated modes to run.")
+def main(users, lines, bad_every, chunk_size, modes):
+    """Time each checkout mode on the same carts."""
+    from db.database import configure, get_session
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        base, path = os.path.join(tmp, "base.db"), os.path.join(tmp, "run.db")
+        build(base, users, lines, bad_every)
+        for mode in modes.split(","):
+            name, work = MODES[mode]
+            shutil.copyfile(base, path)
+            configure(db_path=path, profile="durable")
+            session = get_session()
+            started = time.perf_counter()
+            work(session, chunk_size)
+            elapsed = time.perf_counter() - started
+            configure()
+            results.append((name, elapsed, state(path)))
+
+    orders = results[0][2][0][0][0]
+    click.echo(f"\nChecking out {users:,} carts of {lines} line(s), {users // bad_every:,} refused (durable profile)")
+    click.echo(f"{'mode':<28} {'seconds':>8} {'orders/sec':>11}  same result")
+    for name, elapsed, result in results:
+        click.echo(f"{name:<28} {elapsed:>8.2f} {orders / elapsed:>11,.0f}  {'yes' if result == results[0][2] else 'NO'}")
+    if any(result != results[0][2] for _, _, result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Set-based bulk deletes against deleting ORM objects one by one.
+
+Run from the lib directory:
+
+    python -m benchmarks.deletes --rows 100000
+
+Builds a throwaway catalog of 2 x --rows supplements and one user with a
+cart line for --rows of them. Then, on a fresh copy of it for each run,
+deletes --rows rows four ways: the user's cart lines, one category, every
+supplement under a price, and everything out of stock. Each is done once as
+the old ORM loop (query the rows, session.delete() each, and release each
+cart line's stock) and once with the model's single-statement operation
+(Cart.clear, Supplement.delete_where). Both runs must leave the same rows,
+stock and category stats behind. The ORM cart loop is quadratic (each
+per-line stock UPDATE scans the session's identity map), so time it at
+smaller --rows, or pass --no-orm to time the bulk operations alone.
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import click
+from sqlalchemy import text
+
+CATEGORIES = ("Bulk", "Keep")
+
+
+def build(path, rows):
+    """Supplement i: category Bulk for odd i, out of stock for even i, and a
+    price under 60 for exactly half of them, spread over the ids."""
+    from db.database import configure, get_engine
+
+    configure(db_path=path, profile="bulk-load")
+    n = 2 * rows
+    with get_engine().begin() as conn:
+        conn.execute(text(
+            "INSERT INTO supplements (id, name, description, price, quantity, category) "
+            "VALUES (:id, :name, 'benchmark row', :price, :quantity, :category)"
+        ), [{
+            "id": i, "name": f"Supplement {i}", "price": 10 + (i * 7919 % n) * 100.0 / n,
+            "quantity": 0 if i % 2 == 0 else 100, "category": CATEGORIES[i % 2 == 0],
+        } for i in range(1, n + 1)])
+        conn.execute(text("INSERT INTO users (id, name, email) VALUES (1, 'Bulk Buyer', 'bulk@example.com')"))
+        conn.execute(text(
+            "INSERT INTO cart (user_name, supplement_name, supplement_price, quantity, user_id, supplement_id) "
+            "SELECT 'Bulk Buyer', name, price, 1, 1, id FROM supplements WHERE id <= :rows"
+        ), {"rows": rows})
+    configure()
+
+
+def state(path):
+    """Everything a delete can change, to compare the two runs."""
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    try:
+        return tuple(conn.execute(query).fetchall() for query in (
+            "SELECT COUNT(*), SUM(quantity) FROM supplements",
+            "SELECT COUNT(*), SUM(quantity) FROM cart",
+            "SELECT * FROM category_stats ORDER BY category",
+        ))
+    finally:
+        conn.close()
+
+
+def orm_clear_cart(session):
+    from db.models.cart import Cart
+    from db.models.supplement import Supplement
+
+    for line in session.query(Cart).filter_by(user_id=1).all():
+        Supplement.release(session, line.supplement_id, line.quantity)
+        session.delete(line)
+
+
+def orm_delete_supplements(**filters):
+    def run(session):
+        from db.models.supplement import Supplement
+
+        for supplement in session.query(Supplement).filter(*Supplement.filters(**filters)).all():
+            session.delete(supplement)
+    return run
+
+
+def bulk_delete_supplements(**filters):
+    def run(session):
+        from db.models.supplement import Supplement
+
+        Supplement.delete_where(session, *Supplement.filters(**filters), commit=False)
+    return run
+
+
+def bulk_clear_cart(session):
+    from db.models.cart import Cart
+
+    Cart.clear(session, 1, commit=False)
+
+
+CASES = {
+    "cart": ("cart lines of a user", orm_clear_cart, bulk_clear_cart),
+    "category": ("category", orm_delete_supplements(category="Bulk"), bulk_delete_supplements(category="Bulk")),
+    "price": ("below a price", orm_delete_supplements(below_price=60), bulk_delete_supplements(below_price=60)),
+    "stock": ("out of stock", orm_delete_supplements(out_of_stock=True), bulk_delete_supplements(out_of_stock=True)),
+}
+
+
+def timed(base, path, work):
+    from db.database import configure, get_session, run_immediate
+
+    shutil.copyfile(base, path)
+    configure(db_path=path, profile="durable")
+    session = get_session()
+    started = time.perf_counter()
+    run_immediate(session, lambda: work(session))
+    elapsed = time.perf_counter() - started
+    configure()
+    return elapsed, state(path)
+
+
+@click.command()
+@click.option('--rows', type=click.IntRange(min=1), default=100000, show_default=True, help="Rows each delete removes.")
+@click.option('--cases', default=",".join(CASES), show_default=True, help="Comma-separated deletes to run.")
+@click.option('--orm/--no-orm', default=True, show_default=True, help="Also time the ORM loop (the cart one grows quadratically).")
+def main(rows, cases, orm):
+    """Time each bulk delete against the ORM loop it replaces."""
+    cases = [CASES[case] for case in cases.split(",")]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        base, path = os.path.join(tmp, "base.db"), os.path.join(tmp, "run.db")
+        build(base, rows)
+        for name, orm_work, bulk_work in cases:
+            bulk_seconds, bulk_state = timed(base, path, bulk_work)
+            orm_seconds, orm_state = timed(base, path, orm_work) if orm else (None, bulk_state)
+            results.append((name, orm_seconds, bulk_seconds, orm_state == bulk_state))
+
+    click.echo(f"\nDeleting {rows:,} rows (durable profile)")
+    click.echo(f"{'delete':<22} {'ORM loop s':>11} {'bulk s':>8} {'speedup':>8}  same result")
+    for name, orm_seconds, bulk_seconds, same in results:
+        if orm_seconds is None:
+            click.echo(f"{name:<22} {'-':>11} {bulk_seconds:>8.2f} {'-':>8}  -")
+        else:
+            click.echo(f"{name:<22} {orm_seconds:>11.2f} {bulk_seconds:>8.2f} {orm_seconds / bulk_seconds:>7.1f}x  {'yes' if same else 'NO'}")
+    if not all(same for *_, same in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Throughput of each SQLite connection profile.
+
+Run from the lib directory:
+
+    python -m benchmarks.profiles --commits 2000 --rows 200000
+
+For every profile in db.database.PROFILES (plus "legacy", the old bare
+engine with a rollback journal) this measures, on a fresh file:
+single-row ORM commits/sec (what add_supplement/add_to_cart do), bulk
+insert rows/sec through the seeder, and a full-table aggregate scan.
+"""
+import contextlib
+import json
+import os
+import tempfile
+import time
+
+import click
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from db.database import PROFILES, apply_profile
+from db.models import Base
+from db.models.supplement import Supplement
+from db.seed import seed_database
+
+
+def build_engine(path, profile):
+    engine = create_engine(f"sqlite:///{path}")
+    if profile != "legacy":
+        apply_profile(engine, profile)
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def bench_profile(profile, commits, rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(os.path.join(tmp, "profile.db"), profile)
+        session = sessionmaker(bind=engine)()
+
+        started = time.perf_counter()
+        for n in range(commits):
+            Supplement.create(session, f"Commit {n}", "profile benchmark", 9.99, 1, "Bench")
+        commit_rate = commits / (time.perf_counter() - started)
+        session.close()
+
+        started = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            seed_database(engine, n_supplements=rows, n_users=0, n_cart=0, reset_data=False)
+        insert_rate = rows / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT SUM(price * quantity) FROM supplements")).scalar()
+        scan_ms = (time.perf_counter() - started) * 1000
+        engine.dispose()
+
+    return {
+        "commits_per_sec": round(commit_rate, 1),
+        "bulk_rows_per_sec": round(insert_rate, 1),
+        "scan_ms": round(scan_ms, 2),
+    }
+
+
+@click.command()
+@click.option('--commits', default=2000, show_default=True, help="Single-row commits per profile.")
+@click.option('--rows', default=200000, show_default=True, help="Rows bulk inserted per profile.")
+@click.option('--output', type=click.Path(dir_okay=False), help="Write results to this JSON file.")
+def main(commits, rows, output):
+    """Compare the SQLite connection profiles."""
+    results = {}
+    click.echo(f"{'profile':<10} {'commits/sec':>12} {'bulk rows/sec':>14} {'scan ms':>9}")
+    for profile in ["legacy"] + sorted(PROFILES):
+        results[profile] = bench_profile(profile, commits, rows)
+        r = results[profile]
+        click.echo(f"{profile:<10} {r['commits_per_sec']:>12,.0f} {r['bulk_rows_per_sec']:>14,.0f} {r['scan_ms']:>9.1f}")
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Set-based repricing against updating ORM objects one by one.
+
+Run from the lib directory:
+
+    python -m benchmarks.reprice --rows 200000
+
+Builds a throwaway catalog of --rows supplements in 10 categories and
+--rows cart lines spread over them. Then, on a fresh copy for each run,
+reprices it three ways: one category by a percentage, the whole catalog to
+a fixed price, and a CSV-style list of new prices for every other
+supplement. Each is done once as an ORM loop (load the supplements, set
+each price, then copy it into each of their cart lines) and once with
+Supplement.reprice / Supplement.reprice_from. Both runs must leave the same
+prices, cart lines and category stats behind.
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import click
+from sqlalchemy import text
+
+CATEGORIES = 10
+
+
+def build(path, rows):
+    from db.database import configure, get_engine
+
+    configure(db_path=path, profile="bulk-load")
+    with get_engine().begin() as conn:
+        conn.execute(text(
+            "INSERT INTO supplements (id, name, description, price, quantity, category) "
+            "VALUES (:id, :name, 'benchmark row', :price, 100, :category)"
+        ), [{"id": i, "name": f"Supplement {i}", "price": 10 + i % 9000 / 100.0, "category": f"Category {i % CATEGORIES}"}
+            for i in range(1, rows + 1)])
+        conn.execute(text("INSERT INTO users (id, name, email) VALUES (:id, :name, :email)"),
+                     [{"id": i, "name": f"Buyer {i}", "email": f"buyer{i}@example.com"} for i in range(1, 101)])
+        conn.execute(text(
+            "INSERT INTO cart (user_name, supplement_name, supplement_price, quantity, user_id, supplement_id) "
+            "SELECT 'Buyer ' || (id % 100 + 1), name, price, 1, id % 100 + 1, id FROM supplements"
+        ))
+    configure()
+
+
+def state(path):
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    try:
+        return tuple(conn.execute(query).fetchall() for query in (
+            "SELECT COUNT(*), ROUND(SUM(price), 2) FROM supplements",
+            "SELECT COUNT(*), ROUND(SUM(supplement_price), 2) FROM cart",
+            "SELECT COUNT(*) FROM cart JOIN supplements ON supplements.id = cart.supplement_id "
+            "WHERE cart.supplement_price IS NOT supplements.price",
+            "SELECT category, products, quantity, ROUND(value, 2), min_price, max_price FROM category_stats ORDER BY category",
+        ))
+    finally:
+        conn.close()
+
+
+def new_prices(rows):
+    return [(i, 5 + i % 7000 / 100.0) for i in range(1, rows + 1, 2)]
+
+
+def orm_reprice(session, supplements, price_of):
+    for supplement in supplements:
+        supplement.price = price_of(supplement)
+        for line in supplement.cart_items:
+            line.supplement_price = supplement.price
+
+
+def orm_percent(category, percent):
+    def run(session, rows):
+        from db.models.supplement import Supplement
+
+        orm_reprice(session, session.query(Supplement).filter_by(category=category).all(),
+                    lambda supplement: round(supplement.price * (1 + percent / 100.0), 2))
+    return run
+
+
+def orm_price(price):
+    def run(session, rows):
+        from db.models.supplement import Supplement
+
+        orm_reprice(session, session.query(Supplement).all(), lambda supplement: price)
+    return run
+
+
+def orm_csv(session, rows):
+    from db.models.supplement import Supplement
+
+    prices = dict(new_prices(rows))
+    orm_reprice(session, session.query(Supplement).filter(Supplement.id.in_(list(prices))).all(),
+                lambda supplement: prices[supplement.id])
+
+
+def bulk_reprice(**options):
+    def run(session, rows):
+        from db.models.supplement import Supplement
+
+        Supplement.reprice(session, **options)
+    return run
+
+
+def bulk_csv(session, rows):
+    from db.models.supplement import Supplement
+
+    Supplement.reprice_from(session, new_prices(rows))
+
+
+CASES = {
+    "category": ("one category by -15%", orm_percent("Category 3", -15), bulk_reprice(category="Category 3", percent=-15)),
+    "price": ("whole catalog to $9.99", orm_price(9.99), bulk_reprice(price=9.99)),
+    "csv": ("price list, every other id", orm_csv, bulk_csv),
+}
+
+
+def timed(base, path, rows, work):
+    from db.database import configure, get_session, run_immediate
+
+    shutil.copyfile(base, path)
+    configure(db_path=path, profile="durable")
+    session = get_session()
+    started = time.perf_counter()
+    run_immediate(session, lambda: work(session, rows))
+    elapsed = time.perf_counter() - started
+    configure()
+    return elapsed, state(path)
+
+
+@click.command()
+@click.option('--rows', type=click.IntRange(min=1), default=200000, show_default=True, help="Supplements (and cart lines) to build.")
+@click.option('--cases', default=",".join(CASES), show_default=True, help="Comma-separated repricings to run.")
+@click.option('--orm/--no-orm', default=True, show_default=True, help="Also time the ORM loop.")
+def main(rows, cases, orm):
+    """Time each set-based repricing against the ORM loop it replaces."""
+    cases = [CASES[case] for case in cases.split(",")]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        base, path = os.path.join(tmp, "base.db"), os.path.join(tmp, "run.db")
+        build(base, rows)
+        for name, orm_work, bulk_work in cases:
+            bulk_seconds, bulk_state = timed(base, path, rows, bulk_work)
+            orm_seconds, orm_state = timed(base, path, rows, orm_work) if orm else (None, bulk_state)
+            results.append((name, orm_seconds, bulk_seconds, orm_state == bulk_state))
+
+    click.echo(f"\nRepricing a {rows:,}-supplement catalog with {rows:,} cart lines (durable profile)")
+    click.echo(f"{'repricing':<28} {'ORM loop s':>11} {'bulk s':>8} {'speedup':>8}  same result")
+    for name, orm_seconds, bulk_seconds, same in results:
+        if orm_seconds is None:
+            click.echo(f"{name:<28} {'-':>11} {bulk_seconds:>8.2f} {'-':>8}  -")
+        else:
+            click.echo(f"{name:<28} {orm_seconds:>11.2f} {bulk_seconds:>8.2f} {orm_seconds / bulk_seconds:>7.1f}x  {'yes' if same else 'NO'}")
+    if not all(same for *_, same in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
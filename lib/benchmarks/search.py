@@ -0,0 +1,94 @@
+"""Full-text search latency at catalog scale.
+
+Run from the lib directory:
+
+    python -m benchmarks.search --rows 1000000 --queries 200
+
+Seeds a throwaway SQLite file with --rows supplements, then times
+Supplement.search() for a few query shapes (one word, two words, a prefix, a
+category, deep pagination) against the LIKE '%...%' scan it replaces, and
+reports median / p95 milliseconds per query. The LIKE scan stops at the
+first 20 hits, so it is only competitive for very common words; unlike
+search it cannot rank.
+"""
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import click
+from sqlalchemy import or_
+
+from db.seed import CATEGORIES, WORDS
+
+
+def timed(fn, queries):
+    timings, matches = [], 0
+    for query in queries:
+        started = time.perf_counter()
+        matches += len(fn(query))
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "median_ms": statistics.median(timings),
+        "p95_ms": timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0],
+        "avg_matches": matches / len(queries),
+    }
+
+
+@click.command()
+@click.option('--rows', type=click.IntRange(min=1), default=1000000, show_default=True, help="Supplements in the catalog.")
+@click.option('--queries', type=click.IntRange(min=1), default=200, show_default=True, help="Queries per search shape.")
+@click.option('--like-queries', type=click.IntRange(min=1), default=10, show_default=True, help="Queries for the LIKE baseline (it scans the table).")
+@click.option('--workers', type=click.IntRange(min=1), default=os.cpu_count() or 1, show_default=True, help="Seeder worker processes.")
+def main(rows, queries, like_queries, workers):
+    """Compare FTS5 search with a LIKE scan."""
+    from db.database import configure, get_engine, get_session
+    from db.models.supplement import Supplement
+    from db.seed import seed_database
+
+    rng = random.Random(0)
+    words = [rng.choice(WORDS) for _ in range(queries * 2)]
+    shapes = {
+        "one word": words[:queries],
+        "two words": [f"{a} {b}" for a, b in zip(words[:queries], words[queries:])],
+        "prefix": [word[:3] for word in words[:queries]],
+        "category + word": [f"{rng.choice(CATEGORIES)} {word}" for word in words[:queries]],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure(db_path=os.path.join(tmp, "search.db"), profile="bulk-load")
+        seed_database(get_engine(), n_supplements=rows, n_users=0, n_cart=0, workers=workers, reset_data=False)
+        session = get_session()
+
+        def like(query):
+            # Same semantics as search (every word in some column), unranked.
+            conditions = [
+                or_(Supplement.name.like(f"%{word}%"), Supplement.description.like(f"%{word}%"),
+                    Supplement.category.like(f"%{word}%"))
+                for word in query.split()
+            ]
+            return session.query(Supplement).filter(*conditions).limit(20).all()
+
+        def search(query):
+            return Supplement.search(session, query, limit=20)
+
+        def page_ten(query):
+            return Supplement.search(session, query, limit=20, offset=180)
+
+        results = {}
+        for name, batch in shapes.items():
+            results[f"search: {name}"] = timed(search, batch)
+        results["search: one word, page 10"] = timed(page_ten, shapes["one word"])
+        results["LIKE scan: one word"] = timed(like, shapes["one word"][:like_queries])
+        results["LIKE scan: two words"] = timed(like, shapes["two words"][:like_queries])
+        configure()
+
+    click.echo(f"\n{'benchmark':<30} {'median ms':>10} {'p95 ms':>10} {'matches':>8}")
+    for name, r in results.items():
+        click.echo(f"{name:<30} {r['median_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['avg_matches']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Load generator for the JSON HTTP API (python cli.py serve).
+
+Run from the lib directory:
+
+    python -m benchmarks.serve --size 100000 --clients 16 --requests 5000
+
+Seeds a throwaway SQLite file, starts python cli.py serve on it in a child
+process, then fires --requests requests at each endpoint from --clients
+threads, each keeping one HTTP/1.1 connection open:
+
+  list         GET /supplements?after_id=...&limit=20 (a catalog page)
+  lookup       GET /supplements/<id> and GET /users/<name>, half each
+  add-to-cart  POST /cart with a random user and supplement
+
+and reports requests/sec plus p50/p99 latency per endpoint. Pass --url to
+load an already running server instead (its data must have at least --size
+supplements and --size / 10 users).
+"""
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote, urlsplit
+
+import click
+
+LIB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def requests_for(endpoint, n, n_supplements, names, seed):
+    """(method, path, body) tuples for one endpoint."""
+    rng = random.Random(seed)
+    requests = []
+    for i in range(n):
+        if endpoint == "list":
+            requests.append(("GET", f"/supplements?after_id={rng.randint(0, max(n_supplements - 20, 0))}&limit=20", None))
+        elif endpoint == "lookup":
+            if i % 2:
+                requests.append(("GET", f"/supplements/{rng.randint(1, n_supplements)}", None))
+            else:
+                requests.append(("GET", f"/users/{quote(rng.choice(names))}", None))
+        else:
+            body = {"user": rng.randint(1, len(names)), "supplement": rng.randint(1, n_supplements), "qty": 1}
+            requests.append(("POST", "/cart", json.dumps(body)))
+    return requests
+
+
+def fire(host, port, requests, clients):
+    """Send requests from clients keep-alive connections; return (elapsed, latencies ms, errors)."""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    queue = iter(requests)
+
+    def client():
+        conn = http.client.HTTPConnection(host, port)
+        mine = []
+        while True:
+            with lock:
+                request = next(queue, None)
+            if request is None:
+                break
+            method, path, body = request
+            headers = {"Content-Type": "application/json"} if body else {}
+            started = time.perf_counter()
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            mine.append((time.perf_counter() - started) * 1000)
+            # 409 is an add-to-cart that found the supplement sold out: a valid answer.
+            if response.status >= 400 and response.status != 409:
+                with lock:
+                    errors.append(response.status)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, sorted(latencies), errors
+
+
+def fetch_json(host, port, path):
+    conn = http.client.HTTPConnection(host, port)
+    conn.request("GET", path)
+    data = json.loads(conn.getresponse().read())
+    conn.close()
+    return data
+
+
+@contextmanager
+def server_process(path, profile, pool_size):
+    """Start cli.py serve on a free port; yield (host, port)."""
+    process = subprocess.Popen(
+        [sys.executable, "cli.py", "--db", path, "--db-profile", profile, "serve", "--port", "0",
+         "--pool-size", str(pool_size)],
+        cwd=LIB_DIR, stderr=subprocess.PIPE, text=True,
+    )
+    try:
+        # First stderr line: "Serving on http://host:port ..."
+        address = urlsplit(process.stderr.readline().split()[2])
+        yield address.hostname, address.port
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@click.command()
+@click.option('--size', type=click.IntRange(min=1), default=100000, show_default=True, help="Supplements in the catalog (users: a tenth).")
+@click.option('--requests', 'n_requests', type=click.IntRange(min=1), default=5000, show_default=True, help="Requests per endpoint.")
+@click.option('--clients', type=click.IntRange(min=1), default=16, show_default=True, help="Concurrent client connections.")
+@click.option('--pool-size', type=click.IntRange(min=1), default=16, show_default=True, help="Server connection pool size.")
+@click.option('--db-profile', default="durable", show_default=True, help="SQLite connection profile for the server.")
+@click.option('--url', help="Load this running server instead of starting one.")
+@click.option('--workers', type=click.IntRange(min=1), default=os.cpu_count() or 1, show_default=True, help="Seeder worker processes.")
+def main(size, n_requests, clients, pool_size, db_profile, url, workers):
+    """Measure requests/sec and p50/p99 latency of the HTTP API."""
+    results = {}
+
+    def run(host, port):
+        n_users = max(size // 10, 1)
+        names = []
+        after_id = 0
+        while len(names) < n_users:
+            users = fetch_json(host, port, f"/users?after_id={after_id}&limit=1000")
+            if not users:
+                break
+            names.extend(user["name"] for user in users)
+            after_id = users[-1]["id"]
+        for seed, endpoint in enumerate(("list", "lookup", "add-to-cart")):
+            batch = requests_for(endpoint, n_requests, size, names, seed)
+            results[endpoint] = fire(host, port, batch, clients)
+
+    if url:
+        address = urlsplit(url)
+        run(address.hostname, address.port or 80)
+    else:
+        from db.database import configure, get_engine
+        from db.seed import seed_database
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "serve.db")
+            configure(db_path=path, profile="bulk-load")
+            seed_database(get_engine(), n_supplements=size, n_users=max(size // 10, 1), n_cart=0, workers=workers)
+            configure()
+            with server_process(path, db_profile, pool_size) as (host, port):
+                run(host, port)
+
+    click.echo(f"\n{clients} clients, {n_requests} requests per endpoint")
+    click.echo(f"{'endpoint':<12} {'req/sec':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for endpoint, (elapsed, latencies, errors) in results.items():
+        click.echo(f"{endpoint:<12} {len(latencies) / elapsed:>10,.0f} {percentile(latencies, 0.5):>9.2f} "
+                   f"{percentile(latencies, 0.99):>9.2f} {len(errors):>7}")
+
+
+if __name__ == "__main__":
+    main()
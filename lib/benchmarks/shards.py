@@ -0,0 +1,127 @@
+"""Add-to-cart write throughput against the number of shards.
+
+Run from the lib directory:
+
+    python -m benchmarks.shards --shards 0,1,2,4,8 --workers 8 --ops 500
+
+For each shard count, seeds a throwaway catalog with --supplements
+supplements (plenty of stock) and --users users, splits the users over the
+shards with db.sharding.reshard, then starts --workers processes that each
+add --ops random (user, supplement) pairs to carts through a ShardRouter.
+It reports cart adds/sec, and checks that every unit is either in a cart,
+in a shard's allotment or still in the catalog. 0 shards is the baseline:
+the same adds through Cart.add on the single database, as the CLI does.
+"""
+import os
+import random
+import tempfile
+import time
+from multiprocessing import Pool
+
+import click
+from sqlalchemy import func, select, text
+
+STOCK = 1000000
+WARM_ALLOTMENT = 10000
+
+
+def setup(path, n_supplements, n_users, shards):
+    from db.database import configure, get_engine
+    from db.seed import seed_database
+    from db.sharding import reshard, shard_paths
+
+    configure(db_path=path, profile="bulk-load")
+    seed_database(get_engine(), n_supplements=n_supplements, n_users=n_users, n_cart=0, workers=1)
+    with get_engine().begin() as conn:
+        conn.execute(text("UPDATE supplements SET quantity = :stock"), {"stock": STOCK})
+    configure()
+    if shards:
+        reshard(path, [path], shard_paths(path, shards))
+        # Give every shard an allotment of every supplement up front, so the
+        # timed run measures the steady state rather than the first refills.
+        from db.sharding import ShardRouter, credit_allotment
+        from db.database import run_immediate
+        from db.models.supplement import Supplement
+        router = ShardRouter(path, shard_paths(path, shards), profile="bulk-load")
+        with router.catalog_session() as catalog:
+            ids = catalog.execute(select(Supplement.id)).scalars().all()
+            run_immediate(catalog, lambda: catalog.execute(
+                text("UPDATE supplements SET quantity = quantity - :taken"), {"taken": WARM_ALLOTMENT * shards}))
+        for index in range(shards):
+            with router.shard_session(index) as session:
+                run_immediate(session, lambda: [credit_allotment(session, i, WARM_ALLOTMENT) for i in ids])
+        router.dispose()
+
+
+def worker(task):
+    path, shards, profile, n_supplements, n_users, ops, seed = task
+    from db.database import configure, get_session, run_immediate
+    from db.models.cart import Cart
+    from db.models.supplement import Supplement
+    from db.models.user import User
+    from db.sharding import ShardRouter, shard_paths
+
+    rng = random.Random(seed)
+    pairs = [(rng.randint(1, n_users), rng.randint(1, n_supplements)) for _ in range(ops)]
+    if shards:
+        router = ShardRouter(path, shard_paths(path, shards), profile=profile)
+        for user_id, supplement_id in pairs:
+            router.add_to_cart(user_id, supplement_id, 1)
+        router.dispose()
+    else:
+        configure(db_path=path, profile=profile)
+        session = get_session()
+        for user_id, supplement_id in pairs:
+            user, supplement = session.get(User, user_id), session.get(Supplement, supplement_id)
+            run_immediate(session, lambda: Cart.add(session, user, supplement, 1, commit=False))
+        configure()
+    return ops
+
+
+def units(path, shards):
+    """Units in carts + allotments + catalog, which must equal the starting stock."""
+    from sqlalchemy import create_engine
+    from db.sharding import shard_paths
+
+    total = 0
+    for shard in [path] + (shard_paths(path, shards) if shards else []):
+        engine = create_engine(f"sqlite:///{shard}")
+        with engine.connect() as conn:
+            tables = {name for name, in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table in ("supplements", "cart", "stock_allotments"):
+                if table in tables:
+                    total += conn.execute(select(func.coalesce(func.sum(text("quantity")), 0)).select_from(text(table))).scalar()
+        engine.dispose()
+    return total
+
+
+@click.command()
+@click.option('--shards', 'shard_counts', default="0,1,2,4,8", show_default=True, help="Comma-separated shard counts to compare (0: unsharded).")
+@click.option('--workers', type=click.IntRange(min=1), default=8, show_default=True, help="Writer processes.")
+@click.option('--ops', type=click.IntRange(min=1), default=500, show_default=True, help="Cart adds per process.")
+@click.option('--supplements', 'n_supplements', type=click.IntRange(min=1), default=100, show_default=True, help="Supplements in the catalog.")
+@click.option('--users', 'n_users', type=click.IntRange(min=1), default=10000, show_default=True, help="Users to spread over the shards.")
+@click.option('--db-profile', default="durable", show_default=True, help="SQLite connection profile for the writers.")
+def main(shard_counts, workers, ops, n_supplements, n_users, db_profile):
+    """Measure cart adds/sec as users and carts are split over more SQLite files."""
+    results = []
+    for shards in [int(count) for count in shard_counts.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "catalog.db")
+            setup(path, n_supplements, n_users, shards)
+            tasks = [(path, shards, db_profile, n_supplements, n_users, ops, seed) for seed in range(workers)]
+            started = time.perf_counter()
+            with Pool(workers) as pool:
+                done = sum(pool.map(worker, tasks))
+            elapsed = time.perf_counter() - started
+            conserved = units(path, shards) == STOCK * n_supplements
+        results.append((shards, done / elapsed, conserved))
+
+    click.echo(f"\n{workers} processes x {ops} cart adds, {db_profile} profile")
+    click.echo(f"{'shards':>6} {'adds/sec':>10} {'speedup':>8}  stock")
+    for shards, rate, conserved in results:
+        click.echo(f"{shards or 'none':>6} {rate:>10,.0f} {rate / results[0][1]:>7.2f}x  {'ok' if conserved else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
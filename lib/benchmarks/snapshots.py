@@ -0,0 +1,137 @@
+"""Long reads on the live database against a read-only snapshot.
+
+Run from the lib directory:
+
+    python -m benchmarks.snapshots --rows 500000
+
+Seeds a throwaway SQLite file with --rows supplements, then runs three
+phases while a separate writer process commits one small stock update every
+--write-interval seconds: a full CSV export of the supplements from the live
+database, taking a snapshot of it (db.snapshots.take, --pages per step),
+and the same export from the snapshot, opened immutable with mmap. For each
+phase it reports the time taken, the writer's commits/sec and p50/max
+commit latency, and how large the writer saw the WAL grow (a long read
+keeps checkpoints from getting past it). The two exports must write the
+same number of rows.
+
+--journal delete (the default, and the bundled database's mode) reads the
+live database in rollback-journal mode, where the export's read lock
+blocks the writer until it finishes. --journal wal reads it through the
+durable profile instead, where the writer carries on but the WAL cannot be
+checkpointed past the export.
+"""
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from multiprocessing import Event, Pipe, Process
+
+import click
+
+
+def writer(path, rows, interval, stop, results):
+    conn = sqlite3.connect(path, timeout=30)
+    latencies, wal_peak, rng = [], 0, random.Random(7)
+    while not stop.is_set():
+        started = time.perf_counter()
+        conn.execute("UPDATE supplements SET quantity = quantity + 1 WHERE id = ?", (rng.randint(1, rows),))
+        conn.commit()
+        latencies.append((started, time.perf_counter() - started))
+        try:
+            wal_peak = max(wal_peak, os.path.getsize(f"{path}-wal"))
+        except OSError:
+            pass
+        time.sleep(interval)
+    conn.close()
+    results.send((latencies, wal_peak))
+
+
+def export(engine=None):
+    from db.database import get_engine
+    from db.exporter import export_table, open_output
+
+    with open_output(os.devnull, False) as out:
+        return export_table(engine or get_engine(), "supplements", out)
+
+
+def phase(path, rows, interval, work):
+    """Run work() with the writer going; returns (work's result, seconds, writer stats)."""
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")  # a no-op in rollback-journal mode
+    stop = Event()
+    receive, send = Pipe(duplex=False)
+    process = Process(target=writer, args=(path, rows, interval, stop, send))
+    process.start()
+    time.sleep(0.5)
+    started = time.perf_counter()
+    result = work()
+    finished = time.perf_counter()
+    stop.set()
+    latencies, wal_peak = receive.recv()
+    process.join()
+    # perf_counter is CLOCK_MONOTONIC, so the writer's timestamps compare with ours.
+    latencies = [latency for at, latency in latencies if started <= at <= finished]
+    return result, finished - started, latencies, wal_peak
+
+
+@click.command()
+@click.option('--rows', type=click.IntRange(min=1), default=500000, show_default=True, help="Supplements to seed.")
+@click.option('--pages', type=click.IntRange(min=1), default=1024, show_default=True, help="Pages the snapshot copies per step.")
+@click.option('--write-interval', type=click.FloatRange(min=0), default=0.01, show_default=True, help="Seconds the writer sleeps between commits.")
+@click.option('--journal', type=click.Choice(["delete", "wal"]), default="delete", show_default=True, help="Journal mode of the live database.")
+def main(rows, pages, write_interval, journal):
+    """Time a full export on the live database and on a snapshot, with a writer running."""
+    from sqlalchemy import create_engine
+    from db.database import configure, get_engine
+    from db.seed import seed_database
+    from db.snapshots import take
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "live.db")
+        configure(db_path=path, profile="bulk-load")
+        click.echo(f"Seeding {rows:,} supplements...", err=True)
+        seed_database(get_engine(), n_supplements=rows, n_users=1, n_cart=0)
+
+        configure()
+        if journal == "delete":
+            with sqlite3.connect(path) as conn:
+                conn.execute("PRAGMA journal_mode=DELETE")
+            # A plain engine: every connection profile would switch the file back to WAL.
+            engine = create_engine(f"sqlite:///{path}")
+            live_rows, *stats = phase(path, rows, write_interval, lambda: export(engine))
+            engine.dispose()
+        else:
+            configure(db_path=path, profile="durable")
+            live_rows, *stats = phase(path, rows, write_interval, export)
+        results.append((f"export, live database ({journal})", *stats))
+
+        taken = {}
+
+        def snapshot():
+            taken["path"], taken["pages"], taken["restarts"], _ = take(path, "bench", pages=pages)
+
+        _, *stats = phase(path, rows, write_interval, snapshot)
+        results.append((f"take snapshot ({taken['restarts']} restart(s))", *stats))
+
+        configure(db_path=path, snapshot="bench")
+        snapshot_rows, *stats = phase(path, rows, write_interval, export)
+        results.append(("export, snapshot", *stats))
+        size = os.path.getsize(taken["path"])
+        configure()
+
+    click.echo(f"\n{rows:,} supplements, snapshot {size / 2**20:,.1f} MiB ({taken['pages']:,} pages, {pages} per step)")
+    click.echo(f"{'phase':<32} {'seconds':>8} {'rows/sec':>10} {'writes/s':>9} {'p50 ms':>7} {'max ms':>8} {'WAL MiB':>8}")
+    for name, elapsed, latencies, wal_peak in results:
+        rate = f"{rows / elapsed:>10,.0f}" if name.startswith("export") else f"{'-':>10}"
+        click.echo(f"{name:<32} {elapsed:>8.2f} {rate} {len(latencies) / elapsed:>9,.0f} "
+                   f"{statistics.median(latencies) * 1000:>7.2f} {max(latencies) * 1000:>8.1f} {wal_peak / 2**20:>8.1f}")
+    if live_rows != snapshot_rows:
+        click.echo(f"Exports DIFFER: {live_rows} rows live, {snapshot_rows} from the snapshot.")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Cold-start latency of the CLI.
+
+Run from the lib directory:
+
+    python -m benchmarks.startup --runs 20 --output startup.json
+
+Each scenario is launched as a fresh interpreter, so the numbers include
+interpreter start-up and every import the CLI triggers. Commit the JSON (or
+keep it per release) and compare medians between versions.
+
+The client.py scenarios run the same command through the thin client: once
+against a `cli.py daemon` started on a throwaway socket, and once with no
+daemon listening, where the client falls back to running cli.py itself.
+"""
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import click
+
+
+LIB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(LIB_DIR, "cli.py")
+CLIENT = os.path.join(LIB_DIR, "client.py")
+
+
+def scenarios(db_path):
+    view_users = ["--db", db_path, "view-users", "--limit", "1"]
+    return {
+        "python -c pass": ([sys.executable, "-c", "pass"], None),
+        "import cli": ([sys.executable, "-c", "import cli"], None),
+        "cli --help": ([sys.executable, CLI, "--help"], None),
+        "cli view-users --limit 1": ([sys.executable, CLI] + view_users, None),
+        "client, daemon": ([sys.executable, CLIENT] + view_users, "daemon"),
+        "python -S client, daemon": ([sys.executable, "-S", CLIENT] + view_users, "daemon"),
+        "client, no daemon": ([sys.executable, CLIENT] + view_users, "no daemon"),
+    }
+
+
+def time_command(command, runs, env=None):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=LIB_DIR, env=env, stdout=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def start_daemon(socket_path, db_path):
+    """Start the CLI daemon on socket_path, warmed up on db_path, and wait until it accepts connections."""
+    daemon = subprocess.Popen([sys.executable, CLI, "--db", db_path, "daemon", "--socket", socket_path], cwd=LIB_DIR,
+                              stderr=subprocess.PIPE, text=True)
+    line = daemon.stderr.readline()
+    if "listening" not in line:
+        daemon.kill()
+        raise click.ClickException(f"Daemon did not start: {line.strip()}")
+    return daemon
+
+
+def heavy_modules_on_help():
+    """Report whether SQLAlchemy gets imported just to render --help."""
+    probe = (
+        "import sys, cli\n"
+        "print(int('sqlalchemy' in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, "-c", probe], cwd=LIB_DIR, capture_output=True, text=True, check=True)
+    return output.stdout.strip() == "1"
+
+
+@click.command()
+@click.option('--runs', default=10, show_default=True, help="Launches per scenario.")
+@click.option('--db', 'db_path', type=click.Path(exists=True, dir_okay=False), help="Database to read (default: a copy of db/nutrifit.db).")
+@click.option('--output', type=click.Path(dir_okay=False), help="Write results to this JSON file.")
+def main(runs, db_path, output):
+    """Measure CLI cold-start latency."""
+    with tempfile.TemporaryDirectory() as tmp:
+        if db_path is None:
+            db_path = os.path.join(tmp, "nutrifit.db")
+            shutil.copy(os.path.join(LIB_DIR, "db", "nutrifit.db"), db_path)
+
+        socket_path = os.path.join(tmp, "nutrifit.sock")
+        env = dict(os.environ, NUTRIFIT_SOCKET=socket_path)
+        daemon = start_daemon(socket_path, db_path)
+        results = {}
+        try:
+            for name, (command, mode) in scenarios(db_path).items():
+                if mode == "no daemon" and daemon.poll() is None:
+                    daemon.terminate()
+                    daemon.wait()
+                timings = time_command(command, runs, env=env if mode else None)
+                results[name] = {
+                    "min_ms": round(min(timings), 2),
+                    "median_ms": round(statistics.median(timings), 2),
+                    "max_ms": round(max(timings), 2),
+                }
+                click.echo(f"{name:<28} min {results[name]['min_ms']:>8.2f} ms   median {results[name]['median_ms']:>8.2f} ms")
+        finally:
+            if daemon.poll() is None:
+                daemon.terminate()
+                daemon.wait()
+
+    sqlalchemy_on_help = heavy_modules_on_help()
+    click.echo(f"SQLAlchemy imported by 'import cli': {'yes' if sqlalchemy_on_help else 'no'}")
+
+    if output:
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": runs,
+            "sqlalchemy_imported_on_help": sqlalchemy_on_help,
+            "results": results,
+        }
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        click.echo(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
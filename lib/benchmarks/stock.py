@@ -0,0 +1,129 @@
+"""Multi-process stress test for stock reservation.
+
+Run from the lib directory:
+
+    python -m benchmarks.stock --workers 8 --stock 2000 --attempts 500
+
+Seeds a throwaway SQLite file with one supplement holding --stock units and
+--workers users, then starts one process per user that keeps adding --qty
+units to its cart --attempts times, all fighting over the same row. When they
+are done it checks that the units in carts plus the units left in stock add
+up to --stock (and the stock never went negative), and reports successful
+reservations/sec. Exits with status 1 on an oversell.
+
+--mode naive runs the old read-check-write pattern (read quantity, then write
+quantity - n in a separate transaction) to show the oversell it allows.
+"""
+import os
+import tempfile
+import time
+from multiprocessing import Pool
+
+import click
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+
+def setup(path, stock, users, profile):
+    from db.database import configure, get_engine, get_session
+    from db.models.supplement import Supplement
+    from db.models.user import User
+
+    configure(db_path=path, profile=profile)
+    get_engine()
+    session = get_session()
+    Supplement.create(session, "Contended Whey", "stress test", 29.99, stock, "Bench")
+    for n in range(users):
+        User.create(session, f"Stress User {n}", f"stress.{n}@example.com")
+    configure()
+
+
+def worker(task):
+    path, profile, user_id, attempts, quantity, mode = task
+    from db.database import configure, get_session, is_busy, run_immediate
+    from db.models.cart import Cart
+    from db.models.supplement import Supplement
+    from db.models.user import User
+
+    configure(db_path=path, profile=profile)
+    session = get_session()
+    user = session.get(User, user_id)
+    supplement = session.get(Supplement, 1)
+
+    reserved = out_of_stock = busy = 0
+    for _ in range(attempts):
+        try:
+            if mode == "atomic":
+                run_immediate(session, lambda: Cart.add(session, user, supplement, quantity, commit=False))
+            else:
+                session.refresh(supplement)
+                if supplement.quantity < quantity:
+                    raise ValueError("out of stock")
+                left = supplement.quantity
+                Cart.merge(session, user.name, supplement.name, supplement.price, quantity, user.id, supplement.id)
+                supplement.quantity = left - quantity
+                session.commit()
+            reserved += 1
+        except ValueError:
+            out_of_stock += 1
+        except OperationalError as e:
+            session.rollback()
+            if not is_busy(e):
+                raise
+            busy += 1
+    configure()
+    return reserved, out_of_stock, busy
+
+
+def check(path, stock):
+    """Return (units in carts, units left) after a run."""
+    from db.database import configure, get_engine
+    from db.models.cart import Cart
+    from db.models.supplement import Supplement
+
+    configure(db_path=path)
+    with get_engine().connect() as conn:
+        in_carts = conn.execute(select(func.coalesce(func.sum(Cart.quantity), 0))).scalar()
+        left = conn.execute(select(Supplement.quantity).where(Supplement.id == 1)).scalar()
+    configure()
+    return in_carts, left
+
+
+@click.command()
+@click.option('--workers', type=click.IntRange(min=1), default=8, show_default=True, help="Competing processes.")
+@click.option('--stock', type=click.IntRange(min=0), default=2000, show_default=True, help="Units in stock at the start.")
+@click.option('--attempts', type=click.IntRange(min=1), default=500, show_default=True, help="Add-to-cart attempts per process.")
+@click.option('--qty', 'quantity', type=click.IntRange(min=1), default=1, show_default=True, help="Units per attempt.")
+@click.option('--mode', type=click.Choice(["atomic", "naive"]), default="atomic", show_default=True, help="Reservation strategy.")
+@click.option('--db-profile', default="durable", show_default=True, help="SQLite connection profile.")
+def main(workers, stock, attempts, quantity, mode, db_profile):
+    """Hammer one supplement from many processes and check nothing is oversold."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stock.db")
+        setup(path, stock, workers, db_profile)
+
+        tasks = [(path, db_profile, user_id, attempts, quantity, mode) for user_id in range(1, workers + 1)]
+        started = time.perf_counter()
+        with Pool(workers) as pool:
+            results = pool.map(worker, tasks)
+        elapsed = time.perf_counter() - started
+
+        reserved = sum(r[0] for r in results)
+        out_of_stock = sum(r[1] for r in results)
+        busy = sum(r[2] for r in results)
+        in_carts, left = check(path, stock)
+
+    click.echo(f"{mode}: {workers} processes x {attempts} attempts of {quantity} unit(s) against {stock} in stock")
+    click.echo(f"  reserved {reserved}, out of stock {out_of_stock}, gave up busy {busy} in {elapsed:.2f}s "
+               f"({reserved / elapsed:,.0f} reservations/sec)")
+    click.echo(f"  units in carts {in_carts} + left in stock {left} = {in_carts + left} (started with {stock})")
+
+    oversold = left < 0 or in_carts + left != stock
+    if oversold:
+        click.echo(f"  OVERSOLD by {in_carts + left - stock if left >= 0 else -left} unit(s)")
+        raise SystemExit(1)
+    click.echo("  no oversell")
+
+
+if __name__ == "__main__":
+    main()
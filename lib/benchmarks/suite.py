@@ -0,0 +1,208 @@
+"""Benchmark suite for the model layer and the CLI flows.
+
+Run from the lib directory:
+
+    python -m benchmarks.suite --sizes 10000,100000,1000000 --output bench.json
+    python -m benchmarks.suite --sizes 10000 --compare bench.json
+
+Each size builds a throwaway SQLite file with that many supplements and cart
+rows (and a tenth as many users) using the seeder, then times every
+benchmark. Wall time, queries issued and peak Python memory (tracemalloc) are
+recorded per benchmark and can be written to JSON. --compare checks a run
+against a saved one and exits non-zero on regressions.
+"""
+import contextlib
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+
+import click
+import sqlalchemy
+from sqlalchemy import event, select
+
+DEFAULT_SIZES = "10000,100000,1000000"
+
+
+class QueryCounter:
+    """Counts statements sent to the database by an engine."""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def measure(fn, calls, counter, track_memory):
+    if track_memory:
+        tracemalloc.start()
+    queries = counter.count
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(calls):
+            fn()
+    elapsed = time.perf_counter() - started
+    result = {
+        "calls": calls,
+        "wall_s": round(elapsed, 6),
+        "per_call_ms": round(elapsed * 1000 / calls, 4),
+        "queries": counter.count - queries,
+    }
+    if track_memory:
+        result["peak_mem_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+    return result
+
+
+def sample_names(session, model, ids):
+    table = model.__table__
+    rows = session.execute(select(table.c.name).where(table.c.id.in_(ids))).scalars().all()
+    return rows or ["missing"]
+
+
+def benchmarks(session, n_supplements, n_users, lookups, writes):
+    """(name, callable, calls) for every benchmark, reads before writes."""
+    import cli
+    from db.models.supplement import Supplement
+    from db.models.user import User
+    from db.models.cart import Cart
+
+    rng = random.Random(0)
+    supplement_ids = [rng.randint(1, n_supplements) for _ in range(lookups)]
+    user_ids = [rng.randint(1, n_users) for _ in range(lookups)]
+    supplement_names = sample_names(session, Supplement, supplement_ids[:900])
+    user_names = sample_names(session, User, user_ids[:900])
+
+    def cycle(values):
+        iterator = iter(values * (lookups // len(values) + 1))
+        return lambda: next(iterator)
+
+    next_supplement_id, next_user_id = cycle(supplement_ids), cycle(user_ids)
+    next_supplement_name, next_user_name = cycle(supplement_names), cycle(user_names)
+    created_supplements, created_carts = [], []
+    counter = iter(range(10 ** 9))
+
+    def create_supplement():
+        supplement = Supplement.create(session, f"Bench Supplement {next(counter)}", "benchmark row", 9.99, 10, "Bench")
+        created_supplements.append(supplement.id)
+
+    def create_user():
+        n = next(counter)
+        User.create(session, f"Bench User {n}", f"bench.{n}@example.com")
+
+    def create_cart():
+        # Fresh supplements have no cart lines yet, so the (user, supplement) pair is new.
+        supplement_id = created_supplements[len(created_carts) % len(created_supplements)]
+        created_carts.append(Cart.create(session, "bench", "bench", 9.99, 1, next_user_id(), supplement_id).id)
+
+    def delete_cart():
+        Cart.delete(session, created_carts.pop())
+
+    def add_to_cart():
+        cli.add_to_cart(str(next_user_id()), str(next_supplement_id()), 1)
+
+    return [
+        ("Supplement.find_by_id", lambda: Supplement.find_by_id(session, next_supplement_id()), lookups),
+        ("Supplement.find_by_name", lambda: Supplement.find_by_name(session, next_supplement_name()), lookups),
+        ("User.find_by_name", lambda: User.find_by_name(session, next_user_name()), lookups),
+        ("Supplement.get_all", lambda: Supplement.get_all(session), 1),
+        ("Cart.get_all", lambda: Cart.get_all(session), 1),
+        ("cli.view_supplements", cli.view_supplements, 1),
+        ("cli.view_users", cli.view_users, 1),
+        ("cli.view_cart", cli.view_cart, 1),
+        ("Supplement.create", create_supplement, writes),
+        ("User.create", create_user, writes),
+        ("Cart.create", create_cart, writes),
+        ("Cart.delete", delete_cart, writes),
+        ("cli.add_to_cart", add_to_cart, 3),
+    ]
+
+
+def run_size(size, lookups, writes, workers, track_memory):
+    from db.database import configure, get_engine, get_session
+    from db.seed import seed_database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure(db_path=os.path.join(tmp, "bench.db"))
+        engine = get_engine()
+        n_users = max(size // 10, 1)
+        seed_database(engine, n_supplements=size, n_users=n_users, n_cart=size, workers=workers)
+
+        session = get_session()
+        counter = QueryCounter(engine)
+        results = {}
+        for name, fn, calls in benchmarks(session, size, n_users, lookups, writes):
+            session.expunge_all()
+            results[name] = measure(fn, calls, counter, track_memory)
+            line = f"  {name:<24} {results[name]['per_call_ms']:>12.3f} ms/call  {results[name]['queries']:>6} queries"
+            if track_memory:
+                line += f"  {results[name]['peak_mem_kb']:>10.1f} KB peak"
+            click.echo(line)
+        configure()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return human-readable regressions of results against a saved baseline run."""
+    regressions = []
+    for size, benches in results.items():
+        for name, current in benches.items():
+            previous = baseline.get("results", {}).get(size, {}).get(name)
+            if previous is None:
+                continue
+            if current["per_call_ms"] > previous["per_call_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{name} @ {size}: {previous['per_call_ms']:.3f} -> {current['per_call_ms']:.3f} ms/call"
+                )
+            if current["queries"] > previous["queries"]:
+                regressions.append(f"{name} @ {size}: {previous['queries']} -> {current['queries']} queries")
+    return regressions
+
+
+@click.command()
+@click.option('--sizes', default=DEFAULT_SIZES, show_default=True, help="Comma-separated dataset sizes (supplements and cart rows).")
+@click.option('--lookups', default=1000, show_default=True, help="Calls per lookup benchmark.")
+@click.option('--writes', default=200, show_default=True, help="Calls per create/delete benchmark.")
+@click.option('--workers', type=click.IntRange(min=1), default=os.cpu_count() or 1, show_default=True, help="Seeder worker processes.")
+@click.option('--memory/--no-memory', default=True, show_default=True, help="Track peak memory with tracemalloc (slows the run down).")
+@click.option('--output', type=click.Path(dir_okay=False), help="Write results to this JSON file.")
+@click.option('--compare', 'baseline_path', type=click.Path(exists=True, dir_okay=False), help="Saved results to check for regressions.")
+@click.option('--tolerance', default=0.25, show_default=True, help="Allowed slowdown before a benchmark counts as regressed.")
+def main(sizes, lookups, writes, workers, memory, output, baseline_path, tolerance):
+    """Benchmark the model layer and CLI flows at several dataset sizes."""
+    results = {}
+    for size in (int(value) for value in sizes.split(",")):
+        click.echo(f"\n=== {size} rows ===")
+        results[str(size)] = run_size(size, lookups, writes, workers, memory)
+
+    if output:
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "memory_tracked": memory,
+            "results": results,
+        }
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        click.echo(f"\nResults written to {output}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), tolerance)
+        if regressions:
+            click.echo("\nRegressions:")
+            for regression in regressions:
+                click.echo(f"  {regression}")
+            raise SystemExit(1)
+        click.echo("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,216 @@
-import os
 import click
-from db.models import Base 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, joinedload
-from db.models.supplement import Supplement
-from db.models.user import User
-from db.models.cart import Cart
+from db.database import PROFILES, configure, get_session, query_log, reconfigure, run_immediate
 
+# Models (and with them SQLAlchemy) are imported inside the commands that use
+# them, so --help and other cheap invocations never pay for the ORM.
 
-db_path = os.path.join(os.path.dirname(__file__), "db", 'nutrifit.db') 
-engine = create_engine(f'sqlite:///{db_path}', echo=True)
-
-Base.metadata.create_all(engine)
-
-Session = sessionmaker(bind=engine)
-session = Session()
+# Commands that only read, and so can run against a snapshot (--snapshot).
+SNAPSHOT_COMMANDS = frozenset({
+    "view-supplements", "view-users", "view-cart", "view-orders", "search", "category-stats", "cart-summary", "analytics",
+    "export",
+})
 
 @click.group()
-def cli():
+@click.option('--db', 'db_path', type=click.Path(dir_okay=False), help="SQLite database file (default: $NUTRIFIT_DB or db/nutrifit.db).")
+@click.option('--echo/--no-echo', default=None, help="Echo SQL statements (default: $NUTRIFIT_ECHO or off).")
+@click.option('--db-profile', type=click.Choice(sorted(PROFILES)), help="SQLite connection profile (default: $NUTRIFIT_DB_PROFILE or durable).")
+@click.option('--profile', 'timing', is_flag=True, help="Print query count, DB time and the slowest statements to stderr when the command ends.")
+@click.option('--slow-query-ms', type=click.FloatRange(min=0), help="Log statements taking at least this long (default: $NUTRIFIT_SLOW_QUERY_MS or off).")
+@click.option('--slow-log', type=click.Path(dir_okay=False), help="Slow-query log file, JSON lines (default: $NUTRIFIT_SLOW_LOG or stderr).")
+@click.option('--snapshot', help="Read from this snapshot of the database instead (see the snapshot command); read-only commands only.")
+@click.pass_context
+def cli(ctx, db_path, echo, db_profile, timing, slow_query_ms, slow_log, snapshot):
     """NutriFit CLI: Manage supplements, users, and carts."""
-    pass
+    reconfigure(db_path=db_path, echo=echo, profile=db_profile, slow_query_ms=slow_query_ms, slow_log=slow_log, timing=timing,
+                snapshot=snapshot)
+    if snapshot:
+        check_snapshot(snapshot, ctx.invoked_subcommand)
+    if timing:
+        query_log()  # start the wall clock now rather than at the first query
+        ctx.call_on_close(print_query_report)
+
+
+def check_snapshot(name, command):
+    import os
+    from db.database import engine_path
+
+    if command not in SNAPSHOT_COMMANDS:
+        raise click.UsageError(f"--snapshot only works with the read-only commands: {', '.join(sorted(SNAPSHOT_COMMANDS))}.")
+    try:
+        path = engine_path()
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    if not os.path.exists(path):
+        raise click.UsageError(f"No snapshot named '{name}' ({path}); take it with: python cli.py snapshot {name}")
+
+
+def print_query_report():
+    click.echo("\n--- Query Profile ---", err=True)
+    for line in query_log().report():
+        click.echo(line, err=True)
+
+PAGE_SIZE = 20
+
+
+def echo_rows(header, rows, describe, empty_message):
+    """Echo rows as they stream in and return the (first, last) id shown."""
+    first_id = last_id = None
+    for row in rows:
+        if first_id is None:
+            click.echo(f"\n{header}")
+            first_id = row.id
+        click.echo(describe(row))
+        last_id = row.id
+    if first_id is None:
+        click.echo(empty_message)
+    return first_id, last_id
+
+
+def page_through(view):
+    """Show a view PAGE_SIZE rows at a time with next/prev navigation."""
+    first_id, last_id = view(limit=PAGE_SIZE)
+    while first_id is not None:
+        choice = input("[n]ext page, [p]revious page, [q]uit: ").strip().lower()
+        if choice == "n":
+            page = view(after_id=last_id, limit=PAGE_SIZE)
+        elif choice == "p":
+            page = view(before_id=first_id, limit=PAGE_SIZE)
+        elif choice == "q":
+            break
+        else:
+            click.echo("Invalid choice. Please try again.")
+            continue
+        if page[0] is not None:
+            first_id, last_id = page
+
+
+def resolve_user(identifier):
+    """Look up a user by ID or Name (see db/resolver.py)."""
+    from db.models.user import User
+    from db import resolver
+    return resolver.resolve(get_session(), User, identifier)
+
+
+def resolve_supplement(identifier):
+    """Look up a supplement by ID or Name (see db/resolver.py)."""
+    from db.models.supplement import Supplement
+    from db import resolver
+    return resolver.resolve(get_session(), Supplement, identifier)
+
 
 # Command to view all supplements
 
-def view_supplements():
-    """View all supplements."""
-    supplements = session.query(Supplement).all()
-    if supplements:
-        click.echo("\n=== Supplements ===")
-        for sup in supplements:
-            click.echo(f"{sup.id}. {sup.name} - ${sup.price} ({sup.quantity} in stock, Category: {sup.category})")
+def describe_supplement(sup):
+    return f"{sup.id}. {sup.name} - ${sup.price} ({sup.quantity} in stock, Category: {sup.category})"
+
+def view_supplements(after_id=None, before_id=None, limit=None):
+    """View supplements in id order, streamed from the database in batches."""
+    from db.models.supplement import Supplement
+    session = get_session()
+    if before_id is not None:
+        supplements = Supplement.page_before(session, before_id, limit or PAGE_SIZE)
     else:
+        supplements = Supplement.stream(session, after_id=after_id, limit=limit)
+    empty_message = "No supplements found." if after_id is None and before_id is None else "No more supplements."
+    return echo_rows("=== Supplements ===", supplements, describe_supplement, empty_message)
+
+@cli.command(name="view-supplements")
+@click.option('--after-id', type=int, help="Only show supplements with an id greater than this.")
+@click.option('--limit', type=click.IntRange(min=1), help="Maximum number of supplements to show.")
+def view_supplements_command(after_id, limit):
+    """List supplements, optionally one page at a time."""
+    view_supplements(after_id=after_id, limit=limit)
+
+# Command to search supplements
+
+@cli.command()
+@click.argument('words', nargs=-1, required=True)
+@click.option('--limit', type=click.IntRange(min=1), default=PAGE_SIZE, show_default=True, help="Results per page.")
+@click.option('--page', type=click.IntRange(min=1), default=1, show_default=True, help="Page of results to show.")
+def search(words, limit, page):
+    """Search supplement names, descriptions and categories, best matches first."""
+    from db.models.supplement import Supplement
+    results = Supplement.search(get_session(), " ".join(words), limit=limit, offset=(page - 1) * limit)
+    empty_message = "No supplements match your search." if page == 1 else "No more matches."
+    echo_rows(f"=== Search results (page {page}) ===", results, describe_supplement, empty_message)
+
+# Commands for the per-category summary
+
+def describe_category(stats):
+    return (f"{stats.category or '(no category)'}: {stats.products} product(s), {stats.quantity} in stock, "
+            f"inventory value ${stats.value:,.2f}, price ${stats.min_price:.2f} - ${stats.max_price:.2f}")
+
+@cli.command(name="category-stats")
+def category_stats():
+    """Show product count, stock, inventory value and price range per category."""
+    from db.models.category_stats import CategoryStats
+    rows = CategoryStats.get_all(get_session())
+    if not rows:
         click.echo("No supplements found.")
+        return
+    click.echo("\n=== Category Stats ===")
+    for row in rows:
+        click.echo(describe_category(row))
+
+@cli.command(name="rebuild-category-stats")
+@click.option('--check', is_flag=True, help="Only compare the stored stats with a full scan; exit with status 1 if they differ.")
+def rebuild_category_stats(check):
+    """Verify or recompute the category stats from the supplements table."""
+    from db.models.category_stats import CategoryStats
+    session = get_session()
+    differences = CategoryStats.check(session)
+    for category, column, stored, actual in differences:
+        click.echo(f"{category or '(no category)'}: {column} is {stored}, should be {actual}")
+    if check:
+        if differences:
+            raise SystemExit(1)
+        click.echo("Category stats are up to date.")
+        return
+    CategoryStats.rebuild(session)
+    click.echo(f"Category stats rebuilt ({len(differences)} value(s) corrected).")
+
+@cli.command()
+@click.option('--low-stock', type=click.IntRange(min=0), default=10, show_default=True, help="Count products with fewer units in stock than this.")
+@click.option('--percentiles', default="50,90,99", show_default=True, help="Comma-separated price percentiles to show per category.")
+@click.option('--with-cart', is_flag=True, help="Also load cart lines and show units and value reserved in carts per category.")
+@click.option('--cache', type=click.Path(dir_okay=False), help="Snapshot file (default: the database path + .analytics.npz).")
+@click.option('--refresh', is_flag=True, help="Rebuild the snapshot even if the cached one looks current.")
+def analytics(low_stock, percentiles, with_cart, cache, refresh):
+    """Catalog aggregates computed over a cached NumPy snapshot (see db/analytics.py)."""
+    import time
+    from db.analytics import Snapshot
+    from db.database import engine_path, get_engine
+
+    try:
+        percentiles = [float(p) for p in percentiles.split(",")]
+    except ValueError:
+        raise click.BadParameter("expected numbers like 50,90,99", param_hint="--percentiles")
+    if any(not 0 <= p <= 100 for p in percentiles):
+        raise click.BadParameter("percentiles must be between 0 and 100", param_hint="--percentiles")
+    cache = cache or f"{engine_path()}.analytics.npz"
+
+    started = time.perf_counter()
+    snapshot, cached = Snapshot.cached(get_engine(), cache, with_cart=with_cart, refresh=refresh)
+    loaded = time.perf_counter()
+    rows = snapshot.by_category(percentiles, low_stock=low_stock)
+    total = snapshot.total_value()
+    done = time.perf_counter()
+    if not rows:
+        click.echo("No supplements found.")
+        return
+
+    click.echo("\n=== Catalog Analytics ===")
+    for row in rows:
+        prices = ", ".join(f"p{p:g} ${row['percentiles'][p]:.2f}" for p in percentiles)
+        line = (f"{row['category'] or '(no category)'}: {row['products']} product(s), {row['units']} in stock, "
+                f"value ${row['value']:,.2f}, {row['low_stock']} under {low_stock} units, price {prices}")
+        if with_cart:
+            line += f", {row['cart_units']} in carts (${row['cart_value']:,.2f})"
+        click.echo(line)
+    click.echo(f"Total stock value: ${total:,.2f} over {len(snapshot)} supplement(s); "
+               f"{sum(row['low_stock'] for row in rows)} under {low_stock} units.")
+    click.echo(f"Snapshot {'reused from' if cached else 'built into'} {cache} in {(loaded - started) * 1000:,.1f} ms; "
+               f"aggregates took {(done - loaded) * 1000:,.1f} ms.", err=True)
 
 # Command to add a supplement
 
@@ -42,6 +221,8 @@ def view_supplements():
 @click.option('--category', prompt="Category", help="Category of the supplement.")
 def add_supplement(name, description, price, quantity, category):
     """Add a new supplement."""
+    from db.models.supplement import Supplement
+    session = get_session()
     supplement = Supplement(name=name, description=description, price=price, quantity=quantity, category=category)
     session.add(supplement)
     session.commit()
@@ -50,38 +231,114 @@ def add_supplement(name, description, price, quantity, category):
 # Command to delete a supplement
 
 def delete_supplement(supplement_input):
-    """Delete a supplement by id or name."""
-    if supplement_input.isdigit():
-        supplement_id = int(supplement_input)
-        supplement = session.query(Supplement).get(supplement_id)
-        if supplement:
-            session.delete(supplement)
-            session.commit()
-            click.echo(f"Supplement with ID {supplement_id} has been deleted.")
-        else:
-            click.echo(f"No supplement found with ID {supplement_id}.")
+    """Delete a supplement by id or name; its cart lines go with it."""
+    from db.models.supplement import Supplement
+    session = get_session()
+    supplement = resolve_supplement(supplement_input)
+    if supplement:
+        name, supplement_id = supplement.name, supplement.id
+        run_immediate(session, lambda: Supplement.delete(session, supplement_id, commit=False))
+        click.echo(f"Supplement '{name}' (ID {supplement_id}) has been deleted.")
     else:
-        supplement_name = supplement_input.strip()
-        supplement = session.query(Supplement).filter(Supplement.name == supplement_name).first()
-        if supplement:
-            session.delete(supplement)
-            session.commit()
-            click.echo(f"Supplement '{supplement_name}' has been deleted.")
-        else:
-            click.echo(f"No supplement found with name '{supplement_name}'.")
+        click.echo(f"No supplement found with identifier '{supplement_input.strip()}'.")
+
+# Command to delete supplements in bulk
+
+@cli.command(name="delete-supplements")
+@click.option('--category', help="Only supplements in this category.")
+@click.option('--below-price', type=float, help="Only supplements priced under this.")
+@click.option('--out-of-stock', is_flag=True, help="Only supplements with no units left.")
+@click.option('--yes', is_flag=True, help="Do not ask for confirmation.")
+def delete_supplements(category, below_price, out_of_stock, yes):
+    """Delete every supplement matching all the given filters (and their cart lines) in one statement."""
+    from sqlalchemy import func
+    from db.models.supplement import Supplement
+    criteria = Supplement.filters(category=category, below_price=below_price, out_of_stock=out_of_stock)
+    if not criteria:
+        raise click.UsageError("Give at least one of --category, --below-price and --out-of-stock.")
+    session = get_session()
+    matching = session.query(func.count(Supplement.id)).filter(*criteria).scalar()
+    if not matching:
+        click.echo("No supplements match.")
+        return
+    if not yes:
+        click.confirm(f"Delete {matching} supplement(s) and every cart line holding them?", abort=True)
+    deleted = run_immediate(session, lambda: Supplement.delete_where(session, *criteria, commit=False))
+    click.echo(f"Deleted {deleted} supplement(s).")
+
+
+# Command to change prices and carry them into carts
+
+@cli.command()
+@click.option('--price', type=click.FloatRange(min=0, min_open=True), help="Set the price to this.")
+@click.option('--percent', type=click.FloatRange(min=-100, min_open=True), help="Change the price by this percentage (e.g. -15 for 15% off), rounded to cents.")
+@click.option('--category', help="Only reprice supplements in this category (with --price or --percent).")
+@click.option('--from-csv', 'csv_path', type=click.Path(exists=True, dir_okay=False), help="CSV file with id and price columns: set each listed supplement's price.")
+@click.option('--yes', is_flag=True, help="Do not ask for confirmation when repricing the whole catalog.")
+def reprice(price, percent, category, csv_path, yes):
+    """Change supplement prices and update the matching cart lines, in one transaction."""
+    import time
+    from db.models.supplement import Supplement
+
+    if sum(option is not None for option in (price, percent, csv_path)) != 1:
+        raise click.UsageError("Give exactly one of --price, --percent and --from-csv.")
+    if csv_path is not None and category is not None:
+        raise click.UsageError("--category cannot be combined with --from-csv.")
+    session = get_session()
+    started = time.perf_counter()
+    if csv_path is not None:
+        prices = read_prices(csv_path)
+        changed, missing, lines = run_immediate(session, lambda: Supplement.reprice_from(session, prices))
+    else:
+        if category is None and not yes:
+            click.confirm("Reprice every supplement in the catalog?", abort=True)
+        changed, lines = run_immediate(
+            session, lambda: Supplement.reprice(session, category=category, price=price, percent=percent))
+        missing = 0
+    click.echo(f"Repriced {changed} supplement(s) and {lines} cart line(s) in {time.perf_counter() - started:.2f}s.")
+    if missing:
+        click.echo(f"{missing} id(s) in {csv_path} matched no supplement.")
+
+def read_prices(path):
+    """(id, price) pairs from a CSV file with id and price columns."""
+    from db.importer import read_rows
+
+    prices = []
+    for location, row, error in read_rows(path, "csv"):
+        try:
+            supplement_id, price = int(row["id"]), float(row["price"])
+        except (KeyError, TypeError, ValueError):
+            raise click.UsageError(f"{path}, {location}: expected an integer id and a numeric price.")
+        if not 0 < price < float("inf"):
+            raise click.UsageError(f"{path}, {location}: price must be positive, got {row['price']!r}.")
+        prices.append((supplement_id, price))
+    if not prices:
+        raise click.UsageError(f"{path} has no prices to apply.")
+    return prices
 
 
 # Command to view users
 
-def view_users():
-    """View all users."""
-    users = session.query(User).all()
-    if users:
-        click.echo("\n=== Users ===")
-        for user in users:
-            click.echo(f"ID: {user.id}, Name: {user.name}, Email: {user.email}")
+def describe_user(user):
+    return f"ID: {user.id}, Name: {user.name}, Email: {user.email}"
+
+def view_users(after_id=None, before_id=None, limit=None):
+    """View users in id order, streamed from the database in batches."""
+    from db.models.user import User
+    session = get_session()
+    if before_id is not None:
+        users = User.page_before(session, before_id, limit or PAGE_SIZE)
     else:
-        click.echo("No users found.")
+        users = User.stream(session, after_id=after_id, limit=limit)
+    empty_message = "No users found." if after_id is None and before_id is None else "No more users."
+    return echo_rows("=== Users ===", users, describe_user, empty_message)
+
+@cli.command(name="view-users")
+@click.option('--after-id', type=int, help="Only show users with an id greater than this.")
+@click.option('--limit', type=click.IntRange(min=1), help="Maximum number of users to show.")
+def view_users_command(after_id, limit):
+    """List users, optionally one page at a time."""
+    view_users(after_id=after_id, limit=limit)
 
 # Command to add users
 
@@ -89,6 +346,8 @@ def view_users():
 @click.option('--email', prompt="User email", help="Email of the user.")
 def add_user(name, email):
     """Add a new user."""
+    from db.models.user import User
+    session = get_session()
     user = User(name=name, email=email)
     session.add(user)
     session.commit()
@@ -97,96 +356,87 @@ def add_user(name, email):
 # Command to delete users
 
 def delete_user(user_input):
-    """Delete a user by either user_id or username."""
-    try:
-        user_id = int(user_input)
-        user = session.query(User).filter_by(id=user_id).first()
-        if user:
-            session.delete(user)
-            session.commit()
-            click.echo(f"User with ID {user_id} has been deleted.")
-        else:
-            click.echo(f"No user found with ID {user_id}.")
-    except ValueError:
-        user = session.query(User).filter_by(name=user_input).first()
-        if user:
-            session.delete(user)
-            session.commit()
-            click.echo(f"User with username '{user_input}' has been deleted.")
-        else:
-            click.echo(f"No user found with username '{user_input}'.")
+    """Delete a user by either user_id or username; their cart is emptied back into stock."""
+    from db.models.user import User
+    session = get_session()
+    user = resolve_user(user_input)
+    if user:
+        name, user_id = user.name, user.id
+        run_immediate(session, lambda: User.delete(session, user_id, commit=False))
+        click.echo(f"User '{name}' (ID {user_id}) has been deleted.")
+    else:
+        click.echo(f"No user found with identifier '{user_input.strip()}'.")
 
 # Command to view all cart entries
 
-from sqlalchemy.orm import joinedload
-
-def view_cart():
-    """View the contents of the cart."""
-    cart_items = session.query(Cart).options(
-        joinedload(Cart.user),      
-        joinedload(Cart.supplement)  
-    ).all()
-
-    if not cart_items:
-        click.echo("The cart is empty.")
+def describe_cart_item(item):
+    user = item.user
+    supplement = item.supplement
+    if user and supplement:
+        return f"User: {user.name}, Supplement: {supplement.name}, Quantity: {item.quantity}, Price: {supplement.price}"
+    return f"Item with ID {item.id} is incomplete."
+
+def view_cart(after_id=None, before_id=None, limit=None):
+    """View the contents of the cart, streamed from the database in batches."""
+    from db.models.cart import Cart
+    from sqlalchemy.orm import joinedload
+    session = get_session()
+    cart_options = (joinedload(Cart.user), joinedload(Cart.supplement))
+    if before_id is not None:
+        cart_items = Cart.page_before(session, before_id, limit or PAGE_SIZE, options=cart_options)
     else:
-        click.echo("\n--- Cart Entries ---")
-        for item in cart_items:
-            user = item.user
-            supplement = item.supplement
-            
-            if user and supplement:
-                click.echo(f"User: {user.name}, Supplement: {supplement.name}, Quantity: {item.quantity}, Price: {supplement.price}")
-            else:
-                click.echo(f"Item with ID {item.id} is incomplete.")
+        cart_items = Cart.stream(session, after_id=after_id, limit=limit, options=cart_options)
+    empty_message = "The cart is empty." if after_id is None and before_id is None else "No more cart entries."
+    return echo_rows("--- Cart Entries ---", cart_items, describe_cart_item, empty_message)
+
+@cli.command(name="view-cart")
+@click.option('--after-id', type=int, help="Only show cart entries with an id greater than this.")
+@click.option('--limit', type=click.IntRange(min=1), help="Maximum number of cart entries to show.")
+def view_cart_command(after_id, limit):
+    """List cart entries, optionally one page at a time."""
+    view_cart(after_id=after_id, limit=limit)
 
 
 
 # Command to add an item to the cart
 @click.option('--user_name', prompt="User Name", type=str, help="Name of the user.")
 @click.option('--supplement_name', prompt="Supplement Name", type=str, help="Name of the supplement.")
-@click.option('--quantity', prompt="Quantity", type=int, default=1, help="Quantity of the supplement to add to the cart.")
+@click.option('--quantity', prompt="Quantity", type=click.IntRange(min=1), default=1, help="Quantity of the supplement to add to the cart.")
 def add_to_cart(user_name, supplement_name, quantity):
-    """Add a supplement to a user's cart by user identifier (ID or Name) and supplement identifier (ID or Name)."""
-    
-    if user_name.isdigit():  
-        user = session.query(User).filter_by(id=int(user_name)).first()
-    else: 
-        user = session.query(User).filter_by(name=user_name).first()
-    
+    """Add a supplement to a user's cart by user identifier (ID or Name) and supplement identifier (ID or Name); returns whether it was added."""
+    from db.models.cart import Cart
+    session = get_session()
+
+    user = resolve_user(user_name)
     if not user:
         click.echo(f"User with name '{user_name}' not found.")
-        return
-
-    if supplement_name.isdigit():  
-        supplement = session.query(Supplement).filter_by(id=int(supplement_name)).first()
-    else:  
-        supplement = session.query(Supplement).filter_by(name=supplement_name).first()
+        return False
 
+    supplement = resolve_supplement(supplement_name)
     if not supplement:
         click.echo(f"Supplement with name '{supplement_name}' not found.")
-        return
+        return False
+
+    try:
+        run_immediate(session, lambda: Cart.add(session, user, supplement, quantity, commit=False))
+    except ValueError as e:
+        click.echo(str(e))
+        return False
 
-    
-    cart_item = Cart(user_name=user.name, supplement_name=supplement.name, supplement_price=supplement.price, quantity=quantity, user_id=user.id, supplement_id=supplement.id)
-    session.add(cart_item)
-    session.commit()
-    
     click.echo(f"Added {quantity} of '{supplement.name}' (Price: {supplement.price} each) to {user.name}'s cart.")
     click.echo(f"User ID: {user.id}, Supplement ID: {supplement.id}")
-    view_cart() 
+    view_cart()
+    return True
 
 # Command to delete cart item
 def delete_from_cart():
     """Delete an item from the user's cart using supplement ID or name."""
+    from db.models.cart import Cart
+    session = get_session()
     user_identifier = input("Enter User Identifier (ID or Name) to confirm: ").strip()
 
     # Confirm the user's identity
-    if user_identifier.isdigit():
-        user = session.query(User).filter_by(id=int(user_identifier)).first()
-    else:
-        user = session.query(User).filter_by(name=user_identifier).first()
-
+    user = resolve_user(user_identifier)
     if not user:
         click.echo(f"No user found with identifier: {user_identifier}")
         return
@@ -194,38 +444,339 @@ def delete_from_cart():
     supplement_identifier = input("Enter Supplement Identifier (ID or Name) to remove: ").strip()
 
     # Find supplement by ID or Name
-    if supplement_identifier.isdigit():  
-        supplement = session.query(Supplement).filter_by(id=int(supplement_identifier)).first()
-    else:  
-        supplement = session.query(Supplement).filter_by(name=supplement_identifier).first()
-
+    supplement = resolve_supplement(supplement_identifier)
     if not supplement:
         click.echo(f"No supplement found with identifier '{supplement_identifier}'")
         return
 
    
-    cart_entries = session.query(Cart).filter_by(user_id=user.id, supplement_id=supplement.id).all()
+    cart_item = session.query(Cart).filter_by(user_id=user.id, supplement_id=supplement.id).first()
 
-    if not cart_entries:
+    if not cart_item:
         click.echo(f"No items found in cart for supplement '{supplement.name}' under user '{user.name}'.")
         return
 
-    # Display the found cart entries
-    click.echo(f"\nFound {len(cart_entries)} cart entry(ies) for supplement '{supplement.name}' by user '{user.name}':")
-    for entry in cart_entries:
-        click.echo(f"Cart Entry ID: {entry.id}, Quantity: {entry.quantity}")
+    # Display the found cart entry
+    click.echo(f"\nFound cart entry for supplement '{supplement.name}' by user '{user.name}':")
+    click.echo(f"Cart Entry ID: {cart_item.id}, Quantity: {cart_item.quantity}")
 
     # Confirm deletion
-    confirm = input(f"Are you sure you want to delete these entries? (y/n): ").strip().lower()
+    confirm = input(f"Are you sure you want to delete this entry? (y/n): ").strip().lower()
     if confirm == 'y':
-        for entry in cart_entries:
-            session.delete(entry)
-        session.commit()
-        click.echo(f"Deleted {len(cart_entries)} cart entry(ies) for supplement '{supplement.name}' by user '{user.name}'.")
+        cart_id = cart_item.id
+        run_immediate(session, lambda: Cart.delete(session, cart_id, commit=False))
+        click.echo(f"Deleted cart entry for supplement '{supplement.name}' by user '{user.name}'.")
     else:
         click.echo("Deletion canceled.")
 
-    view_cart()  
+    view_cart()
+
+@cli.command(name="clear-cart")
+@click.argument('user_identifier')
+def clear_cart(user_identifier):
+    """Remove every line from a user's cart (ID or Name) and return the units to stock."""
+    from db.models.cart import Cart
+    session = get_session()
+    user = resolve_user(user_identifier)
+    if not user:
+        click.echo(f"No user found with identifier: {user_identifier}")
+        return
+    user_id = user.id
+    removed = run_immediate(session, lambda: Cart.clear(session, user_id, commit=False))
+    click.echo(f"Removed {removed} line(s) from {user.name}'s cart.")
+
+
+# Command to summarize carts
+
+@cli.command(name="cart-summary")
+@click.option('--user', 'user_identifier', help="Only summarize this user's cart (ID or Name).")
+@click.option('--top', type=click.IntRange(min=1), help="Only show the top N carts.")
+@click.option('--order-by', type=click.Choice(["value", "quantity", "items"]), default="value", show_default=True, help="Sort carts by this total, largest first.")
+def cart_summary(user_identifier, top, order_by):
+    """Show item counts, quantities and value per cart, plus store totals."""
+    from db.models.cart import Cart
+    session = get_session()
+
+    user_id = None
+    if user_identifier is not None:
+        user = resolve_user(user_identifier)
+        if not user:
+            click.echo(f"No user found with identifier: {user_identifier}")
+            return
+        user_id = user.id
+
+    rows = Cart.summary(session, user_id=user_id, order_by=order_by, limit=top)
+    if not rows:
+        click.echo("The cart is empty.")
+        return
+    click.echo("\n--- Cart Summary ---")
+    for row in rows:
+        click.echo(f"User: {row.user_name} (ID {row.user_id}), Items: {row.items}, Quantity: {row.quantity}, Total: ${row.value:.2f}")
+
+    if user_id is None:
+        totals = Cart.totals(session)
+        click.echo(f"\nStore total: {totals.users} cart(s), {totals.items} item(s), quantity {totals.quantity}, value ${totals.value:.2f}")
+
+
+# Commands to turn carts into orders
+
+def describe_order(order):
+    user = f"ID {order.user_id}" if order.user_id is not None else "deleted"
+    return (f"Order #{order.id}: User: {order.user_name} ({user}), Items: {order.items}, "
+            f"Quantity: {order.quantity}, Total: ${order.total:.2f}, Placed: {order.created_at}")
+
+@cli.command()
+@click.argument('user_identifier', required=False)
+@click.option('--all', 'all_carts', is_flag=True, help="Check out every non-empty cart instead, in chunked transactions.")
+@click.option('--chunk-size', type=click.IntRange(min=1), default=1000, show_default=True, help="Carts per transaction with --all.")
+def checkout(user_identifier, all_carts, chunk_size):
+    """Turn USER's cart (ID or Name) into an order and empty it.
+
+    The units were already taken from stock when they were added to the cart.
+    """
+    from db.checkout import REJECTED_MESSAGE, checkout_carts
+    from db.models.cart import Cart
+    from db.models.order import Order
+    session = get_session()
+
+    if all_carts == (user_identifier is not None):
+        raise click.UsageError("Give either a USER or --all.")
+    if all_carts:
+        def progress(stats):
+            click.echo(f"{stats.orders} orders placed ({stats.orders_per_second:,.0f} orders/sec)", err=True)
+
+        stats = checkout_carts(session, chunk_size=chunk_size, progress=progress)
+        for error in stats.errors:
+            click.echo(f"Failed {error}")
+        if stats.failed > len(stats.errors):
+            click.echo(f"... and {stats.failed - len(stats.errors)} more failed carts.")
+        click.echo(
+            f"Checkout finished: {stats.orders} orders placed, {stats.failed} carts failed in {stats.chunks} "
+            f"transaction(s), {stats.elapsed:.2f}s ({stats.orders_per_second:,.0f} orders/sec)."
+        )
+        return
+
+    user = resolve_user(user_identifier)
+    if not user:
+        click.echo(f"No user found with identifier: {user_identifier}")
+        return
+    placed, rejected = run_immediate(session, lambda: Order.checkout(session, Cart.user_id == user.id))
+    if rejected:
+        click.echo(f"Cannot check out {user.name}'s cart: {REJECTED_MESSAGE}.")
+    elif not placed:
+        click.echo(f"{user.name}'s cart is empty.")
+    else:
+        click.echo(describe_order(Order.find_by_id(session, placed[0][0])))
+
+@cli.command(name="view-orders")
+@click.option('--user', 'user_identifier', help="Only show this user's orders (ID or Name).")
+@click.option('--after-id', type=int, help="Only show orders with an id greater than this.")
+@click.option('--limit', type=click.IntRange(min=1), help="Maximum number of orders to show.")
+@click.option('--lines', is_flag=True, help="Also list each order's items.")
+def view_orders(user_identifier, after_id, limit, lines):
+    """List orders, oldest first."""
+    from db.models.order import Order
+    from sqlalchemy.orm import selectinload
+    session = get_session()
+
+    query = session.query(Order).order_by(Order.id)
+    if user_identifier is not None:
+        user = resolve_user(user_identifier)
+        if not user:
+            click.echo(f"No user found with identifier: {user_identifier}")
+            return
+        query = query.filter(Order.user_id == user.id)
+    if after_id is not None:
+        query = query.filter(Order.id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    if lines:
+        query = query.options(selectinload(Order.lines))
+
+    def describe(order):
+        text = describe_order(order)
+        if lines:
+            text += "".join(f"\n    {line.quantity} x {line.supplement_name} @ ${line.price:.2f}" for line in order.lines)
+        return text
+
+    echo_rows("--- Orders ---", query.yield_per(1000), describe, "No orders found.")
+
+
+# Command to bulk import supplements or users
+
+@cli.command(name="import")
+@click.argument('kind', type=click.Choice(["supplements", "users"]))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(["csv", "jsonl"]), help="File format (default: from the file extension).")
+@click.option('--batch-size', type=click.IntRange(min=1), default=10000, show_default=True, help="Rows per transaction.")
+@click.option('--upsert', is_flag=True, help="Update rows whose supplement name / user email already exists instead of skipping them.")
+def import_data(kind, path, fmt, batch_size, upsert):
+    """Bulk load supplements or users from a CSV or JSONL file."""
+    from db.database import get_engine
+    from db.importer import detect_format, import_file
+
+    try:
+        fmt = fmt or detect_format(path)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    def progress(stats):
+        click.echo(f"{stats.processed} rows processed ({stats.rows_per_second:,.0f} rows/sec)", err=True)
+
+    stats = import_file(get_engine(), kind, path, fmt=fmt, batch_size=batch_size, upsert=upsert, progress=progress)
+    for error in stats.errors:
+        click.echo(f"Skipped invalid row at {error}")
+    if stats.invalid > len(stats.errors):
+        click.echo(f"... and {stats.invalid - len(stats.errors)} more invalid rows.")
+    click.echo(
+        f"Imported {kind}: {stats.inserted} inserted, {stats.updated} updated, "
+        f"{stats.skipped} skipped, {stats.invalid} invalid in {stats.elapsed:.2f}s "
+        f"({stats.rows_per_second:,.0f} rows/sec)."
+    )
+
+# Command to export a table
+
+@cli.command()
+@click.argument('kind', type=click.Choice(["supplements", "users", "cart"]))
+@click.option('--output', '-o', default="-", show_default=True, help="Output file, or - for stdout.")
+@click.option('--format', 'fmt', type=click.Choice(["csv", "jsonl"]), default="csv", show_default=True, help="Output format.")
+@click.option('--gzip', 'compress', is_flag=True, help="Gzip the output (implied by a .gz output name).")
+@click.option('--columns', help="Comma-separated columns to export (default: all).")
+@click.option('--category', help="Only export supplements in this category.")
+@click.option('--updated-since', type=click.DateTime(), help="Only export rows updated at or after this time.")
+@click.option('--batch-size', type=click.IntRange(min=1), default=10000, show_default=True, help="Rows fetched per round trip.")
+def export(kind, output, fmt, compress, columns, category, updated_since, batch_size):
+    """Stream supplements, users or cart rows to CSV or JSONL."""
+    import time
+    from db.database import get_engine
+    from db.exporter import export_table, open_output
+
+    columns = [name.strip() for name in columns.split(",")] if columns else None
+    compress = compress or output.endswith(".gz")
+    started = time.perf_counter()
+    try:
+        with open_output(output, compress) as out:
+            count = export_table(get_engine(), kind, out, fmt=fmt, columns=columns, category=category,
+                                 updated_since=updated_since, batch_size=batch_size)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed else 0.0
+    click.echo(f"Exported {count} {kind} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec).", err=True)
+
+
+# Command to run a script of operations
+
+@cli.command()
+@click.argument('script', type=click.File("r"), default="-")
+@click.option('--chunk-size', type=click.IntRange(min=1), default=1000, show_default=True, help="Operations per transaction.")
+def batch(script, chunk_size):
+    """Run JSONL operations from SCRIPT (or stdin) in chunked transactions.
+
+    One operation per line, e.g. {"op": "add_to_cart", "user": "Jane Doe", "supplement": 3, "qty": 2}.
+    Ops: add_supplement, add_user, add_to_cart, delete_from_cart, clear_cart, checkout, delete_user,
+    delete_supplement, delete_supplements.
+    """
+    from db.batch import run_batch
+
+    def progress(stats):
+        click.echo(f"{stats.processed} ops processed ({stats.ops_per_second:,.0f} ops/sec)", err=True)
+
+    stats = run_batch(get_session(), script, chunk_size=chunk_size, progress=progress)
+    for error in stats.errors:
+        click.echo(f"Failed {error}")
+    if stats.failed > len(stats.errors):
+        click.echo(f"... and {stats.failed - len(stats.errors)} more failed ops.")
+    click.echo(
+        f"Batch finished: {stats.succeeded} succeeded, {stats.failed} failed in {stats.chunks} transaction(s), "
+        f"{stats.elapsed:.2f}s ({stats.ops_per_second:,.0f} ops/sec)."
+    )
+
+
+# Command to take a read-only snapshot of the database
+
+@cli.command(name="snapshot")
+@click.argument('name', required=False)
+@click.option('--pages', type=click.IntRange(min=1), default=1024, show_default=True, help="Pages copied per step; writers wait for at most one step.")
+@click.option('--pause', type=click.FloatRange(min=0), default=0.0, show_default=True, help="Seconds to sleep between steps.")
+@click.option('--restarts', type=click.IntRange(min=0), default=3, show_default=True, help="Restarts caused by writers before the copy is finished in one step.")
+@click.option('--drop', is_flag=True, help="Delete the snapshot NAME instead of taking it.")
+def take_snapshot(name, pages, pause, restarts, drop):
+    """Copy the database into the read-only snapshot NAME, or list the snapshots (see db/snapshots.py).
+
+    Run read-only commands against it with: python cli.py --snapshot NAME <command>
+    """
+    import datetime
+    from db.database import db_path
+    from db.snapshots import drop as drop_snapshot, list_snapshots, take
+
+    source = db_path()
+    if name is None:
+        snapshots = list_snapshots(source)
+        if not snapshots:
+            click.echo(f"No snapshots of {source}.")
+        for snapshot_name, path, size, taken in snapshots:
+            click.echo(f"{snapshot_name}: {path}, {size / 1048576:,.1f} MB, taken {datetime.datetime.fromtimestamp(taken):%Y-%m-%d %H:%M:%S}")
+        return
+
+    reported = [0]
+
+    def progress(remaining, total):
+        percent = 100 * (total - remaining) // total if total else 100
+        if percent >= reported[0] + 10 or percent < reported[0]:
+            reported[0] = percent
+            click.echo(f"{total - remaining} of {total} pages copied ({percent}%)", err=True)
+
+    try:
+        if drop:
+            dropped = drop_snapshot(source, name)
+            click.echo(f"Snapshot '{name}' deleted." if dropped else f"No snapshot named '{name}'.")
+            return
+        path, copied, restarted, seconds = take(source, name, pages=pages, pause=pause, restarts=restarts, progress=progress)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo(f"Snapshot '{name}' taken in {seconds:.2f}s ({copied} pages, {restarted} restart(s)): {path}")
+
+
+# Command to serve the JSON HTTP API
+
+@cli.command()
+@click.option('--host', default="127.0.0.1", show_default=True, help="Address to listen on.")
+@click.option('--port', type=click.IntRange(min=0, max=65535), default=8000, show_default=True, help="Port to listen on.")
+@click.option('--pool-size', type=click.IntRange(min=1), default=16, show_default=True, help="Pooled database connections; requests beyond this wait for one.")
+@click.option('--access-log', is_flag=True, help="Log every request to stderr.")
+def serve(host, port, pool_size, access_log):
+    """Serve supplements, users and carts as a JSON HTTP API (see db/server.py)."""
+    from db.database import get_engine
+    from db.server import make_server
+
+    configure(pool_size=pool_size)
+    get_engine()
+    server = make_server(host, port, access_log=access_log)
+    click.echo(f"Serving on http://{server.server_address[0]}:{server.server_address[1]} (Ctrl+C to stop)", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# Command to keep the CLI loaded for client.py
+
+@cli.command()
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False), help="Unix socket to listen on (default: $NUTRIFIT_SOCKET, else nutrifit-<uid>.sock in the temp directory).")
+def daemon(socket_path):
+    """Run CLI invocations sent by client.py without restarting (see db/daemon.py)."""
+    from db.daemon import default_socket_path, serve
+
+    socket_path = socket_path or default_socket_path()
+    try:
+        serve(socket_path, cli, ready=lambda: click.echo(f"Daemon listening on {socket_path} (Ctrl+C to stop)", err=True))
+    except RuntimeError as e:
+        raise click.UsageError(str(e))
+    except KeyboardInterrupt:
+        pass
 
 
 # ----  Menus ----
@@ -242,7 +793,7 @@ def user_menu():
         choice = input("Enter your choice: ").strip()
 
         if choice == "1":
-            view_users()  
+            page_through(view_users)
         elif choice == "2":
             name = input("Enter User Name: ").strip()
             email = input("Enter User Email: ").strip()
@@ -267,7 +818,7 @@ def supplement_menu():
         choice = input("Enter your choice: ").strip()
 
         if choice == "1":
-            view_supplements()  
+            page_through(view_supplements)
         elif choice == "2":
             name = input("Enter Supplement Name: ").strip()
             description = input("Enter Supplement Description: ").strip()
@@ -296,83 +847,26 @@ def cart_menu():
         choice = input("Enter your choice: ").strip()
 
         if choice == "1":
-            view_cart()
+            page_through(view_cart)
 
         elif choice == "2":
             user_identifier = input("Enter User Identifier (ID or Name): ").strip()
-            if user_identifier.isdigit():  
-                user = session.query(User).filter_by(id=int(user_identifier)).first()
-            else:  
-                user = session.query(User).filter_by(name=user_identifier).first()
-
+            user = resolve_user(user_identifier)
             if not user:
                 click.echo(f"No user found with identifier: {user_identifier}")
                 continue
 
             supplement_identifier = input("Enter Supplement Identifier (ID or Name): ").strip()
-            if supplement_identifier.isdigit():  
-                supplement = session.query(Supplement).filter_by(id=int(supplement_identifier)).first()
-            else: 
-                supplement = session.query(Supplement).filter_by(name=supplement_identifier).first()
-
+            supplement = resolve_supplement(supplement_identifier)
             if not supplement:
                 click.echo(f"No supplement found with identifier: {supplement_identifier}")
                 continue
 
-            try:
-                quantity = int(input("Enter Quantity: ").strip())
-                add_to_cart(user_name=user.name, supplement_name=supplement.name, quantity=quantity)
-                click.echo(f"Added {quantity} of {supplement.name} to {user.name}'s cart.")
-            except ValueError:
-                click.echo("Invalid input. Please enter a valid quantity.")
+            quantity = click.prompt("Enter Quantity", type=click.IntRange(min=1))
+            add_to_cart(user_name=str(user.id), supplement_name=str(supplement.id), quantity=quantity)
 
         elif choice == "3":
-            user_identifier = input("Enter User Identifier (ID or Name) to confirm: ").strip()
-
-            if user_identifier.isdigit():
-                user = session.query(User).filter_by(id=int(user_identifier)).first()
-            else:
-                user = session.query(User).filter_by(name=user_identifier).first()
-
-            if not user:
-                click.echo(f"No user found with identifier: {user_identifier}")
-                continue
-
-            supplement_identifier = input("Enter Supplement Identifier (ID or Name) to remove: ").strip()
-
-          
-            if supplement_identifier.isdigit(): 
-                supplement = session.query(Supplement).filter_by(id=int(supplement_identifier)).first()
-            else:  
-                supplement = session.query(Supplement).filter_by(name=supplement_identifier).first()
-
-            if not supplement:
-                click.echo(f"No supplement found with identifier '{supplement_identifier}'")
-                continue
-
-          
-            cart_entries = session.query(Cart).filter_by(user_id=user.id, supplement_id=supplement.id).all()
-
-            if not cart_entries:
-                click.echo(f"No items found in cart for supplement '{supplement.name}' under user '{user.name}'.")
-                continue
-
-            
-            click.echo(f"\nFound {len(cart_entries)} cart entry(ies) for supplement '{supplement.name}' by user '{user.name}':")
-            for entry in cart_entries:
-                click.echo(f"Cart Entry ID: {entry.id}, Quantity: {entry.quantity}")
-
-           
-            confirm = input(f"Are you sure you want to delete these entries? (y/n): ").strip().lower()
-            if confirm == 'y':
-                for entry in cart_entries:
-                    session.delete(entry)
-                session.commit()
-                click.echo(f"Deleted {len(cart_entries)} cart entry(ies) for supplement '{supplement.name}' by user '{user.name}'.")
-            else:
-                click.echo("Deletion canceled.")
-
-            view_cart()
+            delete_from_cart()
 
         elif choice == "4":
             break
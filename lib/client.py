@@ -0,0 +1,32 @@
+"""Thin client for the CLI daemon: python client.py <cli.py arguments>.
+
+Sends the invocation to `python cli.py daemon` (see db/daemon.py) and
+streams its output back with the same exit status. When no daemon is
+listening, or for the interactive commands, it runs cli.py itself instead.
+It imports nothing outside the standard library, so it can also run as
+python -S client.py ..., which skips site-packages and saves a few more
+milliseconds per call.
+"""
+import os
+import sys
+
+from db.daemon import LOCAL_COMMANDS, command_args, default_socket_path, request
+
+CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+
+
+def main(argv):
+    if command_args(argv)[0] not in LOCAL_COMMANDS:
+        try:
+            status = request(default_socket_path(), argv)
+        except BrokenPipeError:
+            # Our reader (e.g. head) went away: stop quietly, like a killed pipeline.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+        if status is not None:
+            return status
+    os.execv(sys.executable, [sys.executable, CLI] + argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,169 @@
+"""Asyncio counterpart of the model layer.
+
+Every coroutine opens its own AsyncSession (sqlite+aiosqlite) from a shared
+async engine, so any number of them can run concurrently on one event loop.
+The work itself is done by the same model classmethods the CLI uses, run
+through AsyncSession.run_sync, so the two paths cannot drift apart.
+
+    from db import aio
+
+    supplement = await aio.create_supplement("Whey", "Vanilla whey", 29.99, 40, "Protein")
+    cart_id = await aio.add_to_cart("Jane Doe", supplement.id, 2)
+    await aio.dispose()
+
+The engine uses the same database file, echo setting, connection profile
+and query log as db.database (configure(), $NUTRIFIT_DB, ...).
+"""
+import asyncio
+import random
+from contextlib import asynccontextmanager
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from db.database import apply_profile, db_path, echo_enabled, ensure_schema, instrument, is_busy, profile_name, upgrade_schema
+from db.models.supplement import Supplement
+from db.models.user import User
+from db.models.cart import Cart
+from db import resolver
+
+_engine = None
+_write_lock = None
+
+
+async def get_async_engine():
+    """Build the async engine (and create missing tables) on first use."""
+    global _engine, _write_lock
+    if _engine is None:
+        upgrade_schema(db_path())
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path()}", echo=echo_enabled())
+        apply_profile(engine.sync_engine, profile_name())
+        instrument(engine.sync_engine)
+        async with engine.begin() as conn:
+            await conn.run_sync(ensure_schema)
+        if _engine is None:
+            _engine, _write_lock = engine, asyncio.Lock()
+        else:
+            # Another coroutine finished first while this one was awaiting.
+            await engine.dispose()
+    return _engine
+
+
+async def dispose():
+    """Close the pooled connections; the next call builds a new engine."""
+    global _engine
+    if _engine is not None:
+        engine, _engine = _engine, None
+        await engine.dispose()
+
+
+@asynccontextmanager
+async def session_scope():
+    """A new AsyncSession for one operation.
+
+    Loaded rows stay readable after commit (expire_on_commit=False), since
+    refreshing them would need IO outside the session.
+    """
+    async with AsyncSession(await get_async_engine(), expire_on_commit=False) as session:
+        yield session
+
+
+async def run_immediate(work, *args, retries=5, backoff=0.05):
+    """Async version of db.database.run_immediate: work(sync_session, *args) in BEGIN IMMEDIATE.
+
+    SQLite runs one writer at a time anyway, so writers from this process
+    queue on an asyncio lock instead of spinning in SQLite's busy handler,
+    whose sleeps (up to 100 ms each) would dominate under concurrency.
+    """
+    await get_async_engine()
+    for attempt in range(retries + 1):
+        async with _write_lock, session_scope() as session:
+            try:
+                await session.execute(text("BEGIN IMMEDIATE"))
+                result = await session.run_sync(work, *args)
+                await session.commit()
+                return result
+            except OperationalError as e:
+                await session.rollback()
+                if not is_busy(e) or attempt == retries:
+                    raise
+        await asyncio.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+# Supplements
+
+async def create_supplement(name, description, price, quantity, category):
+    return await run_immediate(Supplement.create, name, description, price, quantity, category, False)
+
+
+async def find_supplement(identifier):
+    """Supplement by ID or Name, or None."""
+    async with session_scope() as session:
+        return await session.run_sync(resolver.resolve, Supplement, identifier)
+
+
+async def list_supplements(after_id=None, limit=20):
+    async with session_scope() as session:
+        return await session.run_sync(lambda s: Supplement.stream(s, after_id=after_id, limit=limit).all())
+
+
+async def search_supplements(query, limit=20, offset=0):
+    async with session_scope() as session:
+        return await session.run_sync(Supplement.search, query, limit, offset)
+
+
+async def delete_supplement(supplement_id):
+    await run_immediate(Supplement.delete, supplement_id, False)
+
+
+# Users
+
+async def create_user(name, email):
+    return await run_immediate(User.create, name, email, False)
+
+
+async def find_user(identifier):
+    """User by ID or Name, or None."""
+    async with session_scope() as session:
+        return await session.run_sync(resolver.resolve, User, identifier)
+
+
+async def list_users(after_id=None, limit=20):
+    async with session_scope() as session:
+        return await session.run_sync(lambda s: User.stream(s, after_id=after_id, limit=limit).all())
+
+
+async def delete_user(user_id):
+    await run_immediate(User.delete, user_id, False)
+
+
+# Cart
+
+async def list_cart(after_id=None, limit=20):
+    async with session_scope() as session:
+        return await session.run_sync(lambda s: Cart.stream(s, after_id=after_id, limit=limit).all())
+
+
+def _add_to_cart(session, user_identifier, supplement_identifier, quantity):
+    user = resolver.resolve(session, User, user_identifier)
+    if user is None:
+        raise ValueError(f"User with identifier '{user_identifier}' not found.")
+    supplement = resolver.resolve(session, Supplement, supplement_identifier)
+    if supplement is None:
+        raise ValueError(f"Supplement with identifier '{supplement_identifier}' not found.")
+    return Cart.add(session, user, supplement, quantity, commit=False)
+
+
+async def add_to_cart(user_identifier, supplement_identifier, quantity=1):
+    """Reserve stock and add it to the user's cart; returns the cart line id.
+
+    Raises ValueError for an unknown user/supplement, a quantity below 1
+    or too little stock.
+    """
+    return await run_immediate(_add_to_cart, user_identifier, supplement_identifier, quantity)
+
+
+async def delete_cart_item(cart_id):
+    """Remove a cart line and put its units back in stock."""
+    await run_immediate(Cart.delete, cart_id, False)
@@ -0,0 +1,221 @@
+"""Columnar NumPy snapshot of the catalog for vectorized analytics.
+
+Snapshot.load() streams supplements (and optionally cart lines) out of the
+database in one pass, into one NumPy array per column. Categories become
+int32 codes into a sorted array of names, with '' for none, the same as
+category_stats. Aggregates over the snapshot are then a few vectorized
+passes instead of a Python loop over ORM objects.
+
+save() writes the arrays as an uncompressed .npz. open() memory-maps each
+array straight out of that file, which np.load cannot do for .npz, so
+reopening a cached snapshot costs a few milliseconds however big it is.
+Snapshot.cached() reuses the file while the database's fingerprint (row
+counts, max id, max updated_at) still matches, and rebuilds it otherwise.
+updated_at has one-second resolution, so a change made in the same second
+the snapshot was taken can go unnoticed until the next one; pass
+refresh=True to be sure.
+"""
+import os
+import struct
+import zipfile
+
+import numpy as np
+from sqlalchemy import func, select
+
+from db.models.cart import Cart
+from db.models.supplement import Supplement
+
+CART_ARRAYS = ("cart_supplement_ids", "cart_user_ids", "cart_quantities", "cart_prices")
+
+
+def fingerprint(conn, with_cart):
+    """A string that changes whenever the rows behind a snapshot do."""
+    parts = []
+    for model in (Supplement, Cart) if with_cart else (Supplement,):
+        count, max_id, max_updated = conn.execute(
+            select(func.count(model.id), func.max(model.id), func.max(model.updated_at))
+        ).one()
+        parts.append(f"{model.__tablename__}:{count}:{max_id}:{max_updated}")
+    return "|".join(parts)
+
+
+def stream_columns(conn, query, dtypes, batch_size):
+    """Run query and return one array per selected column, filled batch by batch."""
+    chunks = [[] for _ in dtypes]
+    result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+    for rows in result.partitions():
+        for chunk, values, dtype in zip(chunks, zip(*rows), dtypes):
+            chunk.append(np.array(values, dtype=dtype))
+    return [np.concatenate(chunk) if chunk else np.empty(0, dtype) for chunk, dtype in zip(chunks, dtypes)]
+
+
+def encode_categories(categories):
+    """(sorted names as a fixed-width str array, int32 code of each row).
+
+    A dict beats np.unique here: sorting an object array of a million strings
+    compares them one Python call at a time.
+    """
+    lookup = {}
+    codes = np.fromiter((lookup.setdefault(c, len(lookup)) for c in categories), np.int32, len(categories))
+    names = sorted(lookup)
+    remap = np.empty(len(names), np.int32)
+    remap[[lookup[name] for name in names]] = np.arange(len(names), dtype=np.int32)
+    return np.array(names, dtype=str) if names else np.empty(0, "U1"), remap[codes]
+
+
+def mmap_npz(path):
+    """Memory-map every array of an uncompressed .npz; returns {name: array}."""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: {info.filename} is compressed and cannot be memory-mapped")
+            # The local file header is 30 bytes plus the name and extra field.
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(f)
+            name = info.filename[:-len(".npy")]
+            if not np.prod(shape):
+                arrays[name] = np.empty(shape, dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                         order="F" if fortran_order else "C")
+    return arrays
+
+
+class Snapshot:
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.ids = arrays["ids"]
+        self.prices = arrays["prices"]
+        self.quantities = arrays["quantities"]
+        self.codes = arrays["codes"]
+        self.categories = arrays["categories"]
+        self.fingerprint = str(arrays["fingerprint"][0])
+        self.has_cart = "cart_supplement_ids" in arrays
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, engine, with_cart=False, batch_size=50000):
+        """Read supplements (and cart lines) in one streaming pass."""
+        with engine.connect() as conn:
+            arrays = {"fingerprint": np.array([fingerprint(conn, with_cart)])}
+            ids, prices, quantities, categories = stream_columns(conn, select(
+                Supplement.id, Supplement.price, func.coalesce(Supplement.quantity, 0),
+                func.coalesce(Supplement.category, ''),
+            ).order_by(Supplement.id), (np.int64, np.float64, np.int64, object), batch_size)
+            names, codes = encode_categories(categories)
+            arrays.update(ids=ids, prices=prices, quantities=quantities, codes=codes, categories=names)
+            if with_cart:
+                columns = stream_columns(conn, select(
+                    Cart.supplement_id, Cart.user_id, func.coalesce(Cart.quantity, 0), Cart.supplement_price,
+                ), (np.int64, np.int64, np.int64, np.float64), batch_size)
+                arrays.update(zip(CART_ARRAYS, columns))
+        return cls(arrays)
+
+    def save(self, path):
+        """Write an uncompressed .npz (atomically, through a temporary file)."""
+        partial = f"{path}.partial"
+        with open(partial, "wb") as f:
+            np.savez(f, **self.arrays)
+        os.replace(partial, path)
+
+    @classmethod
+    def open(cls, path):
+        return cls(mmap_npz(path))
+
+    @classmethod
+    def cached(cls, engine, path, with_cart=False, refresh=False):
+        """The snapshot in path if it is still current, else a fresh one saved there.
+
+        Returns (snapshot, loaded_from_cache).
+        """
+        if not refresh and os.path.exists(path):
+            snapshot = cls.open(path)
+            if with_cart <= snapshot.has_cart:
+                with engine.connect() as conn:
+                    if snapshot.fingerprint == fingerprint(conn, snapshot.has_cart):
+                        return snapshot, True
+        snapshot = cls.load(engine, with_cart=with_cart)
+        snapshot.save(path)
+        return snapshot, False
+
+    # Aggregates
+
+    def total_value(self):
+        return float(np.dot(self.prices, self.quantities))
+
+    def low_stock_ids(self, threshold):
+        """Ids of supplements with fewer than threshold units, in id order."""
+        return self.ids[self.quantities < threshold]
+
+    def price_percentiles(self, percentiles):
+        """{percentile: array of that price percentile per category code} (linear
+        interpolation, like np.percentile); NaN for empty categories.
+
+        One sort by (category, price), then every category's percentile is
+        read off at the same relative position of its slice.
+        """
+        counts = np.bincount(self.codes, minlength=len(self.categories))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        prices = self.prices[np.lexsort((self.prices, self.codes))]
+        filled = counts > 0
+        result = {}
+        for p in percentiles:
+            position = (counts - 1).clip(min=0) * (p / 100.0)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.minimum(lower + 1, (counts - 1).clip(min=0))
+            fraction = position - lower
+            values = np.full(len(counts), np.nan)
+            lo, hi = prices[(starts + lower)[filled]], prices[(starts + upper)[filled]]
+            values[filled] = lo + (hi - lo) * fraction[filled]
+            result[p] = values
+        return result
+
+    def by_category(self, percentiles=(50, 90, 99), low_stock=10):
+        """One dict per category: products, units, value, low_stock count,
+        price percentiles and, with cart lines loaded, units and value in carts."""
+        n = len(self.categories)
+        products = np.bincount(self.codes, minlength=n)
+        units = np.bincount(self.codes, weights=self.quantities, minlength=n)
+        values = np.bincount(self.codes, weights=self.prices * self.quantities, minlength=n)
+        low = np.bincount(self.codes[self.quantities < low_stock], minlength=n)
+        price_percentiles = self.price_percentiles(percentiles)
+        if self.has_cart:
+            positions, in_catalog = self.cart_positions()
+            cart_codes = self.codes[positions]
+            quantities = self.arrays["cart_quantities"][in_catalog]
+            # Lines saved without a price are valued at the current catalog price.
+            prices = self.arrays["cart_prices"][in_catalog]
+            prices = np.where(np.isnan(prices), self.prices[positions], prices)
+            cart_units = np.bincount(cart_codes, weights=quantities, minlength=n)
+            cart_values = np.bincount(cart_codes, weights=quantities * prices, minlength=n)
+        rows = []
+        for code in range(n):
+            row = {
+                "category": str(self.categories[code]),
+                "products": int(products[code]),
+                "units": int(units[code]),
+                "value": float(values[code]),
+                "low_stock": int(low[code]),
+                "percentiles": {p: float(price_percentiles[p][code]) for p in percentiles},
+            }
+            if self.has_cart:
+                row.update(cart_units=int(cart_units[code]), cart_value=float(cart_values[code]))
+            rows.append(row)
+        return rows
+
+    def cart_positions(self):
+        """Snapshot position of every cart line's supplement, for the lines whose
+        supplement is in the snapshot, and the mask of those lines (ids are
+        sorted, so this is one searchsorted)."""
+        supplement_ids = self.arrays["cart_supplement_ids"]
+        positions = np.searchsorted(self.ids, supplement_ids)
+        in_catalog = positions < len(self.ids)
+        in_catalog[in_catalog] = self.ids[positions[in_catalog]] == supplement_ids[in_catalog]
+        return positions[in_catalog], in_catalog
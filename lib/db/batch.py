@@ -0,0 +1,205 @@
+import json
+import time
+from sqlalchemy.exc import SQLAlchemyError
+
+from db.database import begin
+from db.importer import MAX_REPORTED_ERRORS, validate_supplement, validate_user
+from db.models.supplement import Supplement
+from db.models.user import User
+from db.models.cart import Cart
+from db.models.order import Order
+from db import resolver
+
+
+def lookup(session, model, op, field):
+    identifier = op.get(field)
+    if identifier is None or not str(identifier).strip():
+        raise ValueError(f"'{field}' is required")
+    row = resolver.resolve(session, model, identifier)
+    if row is None:
+        raise ValueError(f"no {model.__name__.lower()} with identifier {identifier!r}")
+    return row
+
+
+def positive_quantity(op, field="qty"):
+    value = op.get(field, 1)
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= resolver.MAX_ID:
+        raise ValueError(f"'{field}' must be a positive integer, got {value!r}")
+    return value
+
+
+def add_supplement(session, op):
+    Supplement.create(session, commit=False, **validate_supplement(op))
+
+
+def add_user(session, op):
+    User.create(session, commit=False, **validate_user(op))
+
+
+def add_to_cart(session, op):
+    user = lookup(session, User, op, "user")
+    supplement = lookup(session, Supplement, op, "supplement")
+    Cart.add(session, user, supplement, positive_quantity(op), commit=False)
+
+
+def delete_from_cart(session, op):
+    user = lookup(session, User, op, "user")
+    supplement = lookup(session, Supplement, op, "supplement")
+    cart_item = session.query(Cart).filter_by(user_id=user.id, supplement_id=supplement.id).first()
+    if not cart_item:
+        raise ValueError(f"no cart entry for '{supplement.name}' under '{user.name}'")
+    Cart.delete(session, cart_item.id, commit=False)
+
+
+def clear_cart(session, op):
+    Cart.clear(session, lookup(session, User, op, "user").id, commit=False)
+
+
+def checkout(session, op):
+    user = lookup(session, User, op, "user")
+    placed, rejected = Order.checkout(session, Cart.user_id == user.id)
+    if rejected:
+        raise ValueError(f"cart of '{user.name}' has a line without a positive quantity")
+    if not placed:
+        raise ValueError(f"cart of '{user.name}' is empty")
+
+
+def delete_user(session, op):
+    User.delete(session, lookup(session, User, op, "user").id, commit=False)
+
+
+def delete_supplement(session, op):
+    Supplement.delete(session, lookup(session, Supplement, op, "supplement").id, commit=False)
+
+
+def delete_supplements(session, op):
+    below_price = op.get("below_price")
+    if below_price is not None and (isinstance(below_price, bool) or not isinstance(below_price, (int, float))):
+        raise ValueError(f"'below_price' must be a number, got {below_price!r}")
+    criteria = Supplement.filters(category=op.get("category"), below_price=below_price,
+                                  out_of_stock=bool(op.get("out_of_stock")))
+    if not criteria:
+        raise ValueError("one of 'category', 'below_price' and 'out_of_stock' is required")
+    Supplement.delete_where(session, *criteria, commit=False)
+
+
+OPERATIONS = {
+    "add_supplement": add_supplement,
+    "add_user": add_user,
+    "add_to_cart": add_to_cart,
+    "delete_from_cart": delete_from_cart,
+    "clear_cart": clear_cart,
+    "checkout": checkout,
+    "delete_user": delete_user,
+    "delete_supplement": delete_supplement,
+    "delete_supplements": delete_supplements,
+}
+
+
+def read_ops(lines):
+    """Yield (line number, op, error) for every non-blank JSONL line."""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            op = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, None, e.msg
+            continue
+        if not isinstance(op, dict):
+            yield line_number, None, "expected a JSON object"
+        elif op.get("op") not in OPERATIONS:
+            yield line_number, None, f"unknown op {op.get('op')!r}"
+        else:
+            yield line_number, op, None
+
+
+class BatchStats:
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = 0
+        self.chunks = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    @property
+    def processed(self):
+        return self.succeeded + self.failed
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def ops_per_second(self):
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    def fail(self, line_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line_number}: {message}")
+
+
+# OverflowError: a number too large for SQLite that slipped past validation.
+OP_ERRORS = (ValueError, TypeError, OverflowError, SQLAlchemyError)
+
+
+def run_chunk(session, chunk, stats):
+    """Run one chunk of ops in a single transaction.
+
+    The chunk is first tried straight through. If any op fails it is rolled
+    back and replayed with every op in its own savepoint, so only the failing
+    ops are dropped; savepoints are skipped in the common all-good case since
+    they cost about as much as the ops themselves.
+    """
+    begin(session, "IMMEDIATE")
+    try:
+        for line_number, op in chunk:
+            OPERATIONS[op["op"]](session, op)
+    except OP_ERRORS:
+        session.rollback()
+    else:
+        session.commit()
+        stats.succeeded += len(chunk)
+        stats.chunks += 1
+        return
+
+    begin(session, "IMMEDIATE")
+    for line_number, op in chunk:
+        savepoint = session.begin_nested()
+        try:
+            OPERATIONS[op["op"]](session, op)
+            savepoint.commit()
+        except OP_ERRORS as e:
+            savepoint.rollback()
+            message = getattr(e, "orig", None) or e
+            stats.fail(line_number, f"{op['op']}: {message}")
+        else:
+            stats.succeeded += 1
+    session.commit()
+    stats.chunks += 1
+
+
+def run_batch(session, lines, chunk_size=1000, progress=None):
+    """Execute JSONL ops from lines, committing once per chunk_size ops.
+
+    A failing op is rolled back to its savepoint and reported; the rest of its
+    chunk still commits.
+    """
+    stats = BatchStats()
+    chunk = []
+    for line_number, op, error in read_ops(lines):
+        if error is not None:
+            stats.fail(line_number, error)
+            continue
+        chunk.append((line_number, op))
+        if len(chunk) >= chunk_size:
+            run_chunk(session, chunk, stats)
+            chunk = []
+            if progress:
+                progress(stats)
+    if chunk:
+        run_chunk(session, chunk, stats)
+    if progress:
+        progress(stats)
+    return stats
@@ -0,0 +1,93 @@
+"""Check out every cart into orders, a chunk of users per transaction.
+
+Each chunk covers the next chunk_size users with a cart, as one id range,
+and is checked out by Order.checkout's set-based statements in one BEGIN
+IMMEDIATE transaction. Carts with an invalid line are left in place and
+reported; they do not hold back the rest of their chunk. If a chunk fails
+outright, it is rolled back and replayed one user per savepoint, so only
+the failing users are skipped.
+"""
+import time
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from db.database import begin
+from db.importer import MAX_REPORTED_ERRORS
+from db.models.cart import Cart
+from db.models.order import Order
+
+REJECTED_MESSAGE = "cart has a line without a positive quantity"
+
+
+class CheckoutStats:
+    def __init__(self):
+        self.orders = 0
+        self.failed = 0
+        self.chunks = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def orders_per_second(self):
+        return self.orders / self.elapsed if self.elapsed else 0.0
+
+    def fail(self, user_id, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"user {user_id}: {message}")
+
+
+def cart_users(session):
+    """Ids of the users with at least one cart line, in order."""
+    return session.execute(select(Cart.user_id).distinct().order_by(Cart.user_id)).scalars().all()
+
+
+def record(stats, placed, rejected):
+    stats.orders += len(placed)
+    for user_id in rejected:
+        stats.fail(user_id, REJECTED_MESSAGE)
+
+
+def run_chunk(session, user_ids, stats):
+    """Check out the carts of user_ids (consecutive users with a cart) in one transaction."""
+    begin(session, "IMMEDIATE")
+    try:
+        placed, rejected = Order.checkout(session, Cart.user_id.between(user_ids[0], user_ids[-1]))
+        session.commit()
+    except SQLAlchemyError:
+        session.rollback()
+    else:
+        record(stats, placed, rejected)
+        stats.chunks += 1
+        return
+
+    begin(session, "IMMEDIATE")
+    results = []
+    for user_id in user_ids:
+        savepoint = session.begin_nested()
+        try:
+            results.append(Order.checkout(session, Cart.user_id == user_id))
+            savepoint.commit()
+        except SQLAlchemyError as e:
+            savepoint.rollback()
+            stats.fail(user_id, getattr(e, "orig", None) or e)
+    session.commit()
+    for placed, rejected in results:
+        record(stats, placed, rejected)
+    stats.chunks += 1
+
+
+def checkout_carts(session, chunk_size=1000, progress=None):
+    """Turn every non-empty cart into an order, committing once per chunk_size users."""
+    stats = CheckoutStats()
+    user_ids = cart_users(session)
+    session.rollback()  # end the read before the first BEGIN IMMEDIATE
+    for start in range(0, len(user_ids), chunk_size):
+        run_chunk(session, user_ids[start:start + chunk_size], stats)
+        if progress:
+            progress(stats)
+    return stats
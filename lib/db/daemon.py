@@ -0,0 +1,245 @@
+"""A long-running CLI process behind a Unix domain socket.
+
+Every `python cli.py ...` starts an interpreter, imports click, SQLAlchemy
+and the models, configures the mappers and opens the database before it
+does any work, and for a short command that is most of its latency.
+`python cli.py daemon` pays for all of that once. It then runs the CLI
+invocations sent to its socket in-process, on an engine and pooled
+connection that stay open between them: db.database.reconfigure only
+rebuilds the engine when an invocation's --db, profile or environment
+differ from the last one. client.py is the other end.
+
+Protocol: both directions are frames of a one-byte channel, a 4-byte
+big-endian length and a UTF-8 payload. The client sends its working
+directory (b"c"), one frame per argument (b"a"), its NUTRIFIT_* variables
+as NAME=value (b"e"), its piped input if the command reads it (b"i") and
+an empty b"." to finish. The daemon runs the invocation in that directory
+and environment, and answers with output frames (b"1" stdout, b"2" stderr)
+line by line as the command produces it, and the exit status (b"x") last.
+Frames rather than JSON keep the client's imports down to a few
+milliseconds.
+
+Invocations run one at a time in the order they connect, since the CLI keeps
+its settings and session in module globals. Interactive commands (the menus,
+serve, the daemon itself) are never forwarded; the client runs them
+locally. A command that prompts gets end-of-file in the daemon, so pass
+--yes where there is one.
+"""
+import io
+import os
+import socket
+import struct
+import sys
+
+ENV_PREFIX = "NUTRIFIT_"
+LOCAL_COMMANDS = frozenset({"user-menu", "supplement-menu", "cart-menu", "serve", "daemon"})
+# Options of the cli group that take a value, to find the command name in argv.
+VALUE_OPTIONS = frozenset({"--db", "--db-profile", "--slow-query-ms", "--slow-log", "--snapshot"})
+FRAME = struct.Struct(">cI")
+
+
+def default_socket_path():
+    return os.environ.get("NUTRIFIT_SOCKET") or os.path.join(
+        os.environ.get("TMPDIR", "/tmp"), f"nutrifit-{os.getuid()}.sock")
+
+
+def command_args(argv):
+    """(command name, its arguments) from cli.py's argv; (None, []) if there is no command."""
+    args = iter(argv)
+    for arg in args:
+        if arg in VALUE_OPTIONS:
+            next(args, None)
+        elif not arg.startswith("-"):
+            return arg, list(args)
+    return None, []
+
+
+def wants_stdin(argv):
+    """True if the invocation reads standard input: batch without a script, or a "-" file."""
+    command, args = command_args(argv)
+    return "-" in args or (command == "batch" and all(arg.startswith("-") for arg in args))
+
+
+def encode_frame(channel, payload):
+    return FRAME.pack(channel, len(payload)) + payload
+
+
+def send_frame(sock, channel, payload):
+    sock.sendall(encode_frame(channel, payload))
+
+
+def read_frames(stream):
+    """Yield (channel, payload) frames from a binary file object until it closes."""
+    while True:
+        header = stream.read(FRAME.size)
+        if len(header) < FRAME.size:
+            return
+        channel, length = FRAME.unpack(header)
+        yield channel, stream.read(length)
+
+
+class FrameWriter(io.RawIOBase):
+    """Raw stream that sends whatever is written to it as frames on one channel."""
+
+    def __init__(self, sock, channel):
+        self.sock = sock
+        self.channel = channel
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        send_frame(self.sock, self.channel, bytes(data))
+        return len(data)
+
+
+def frame_stream(sock, channel):
+    return io.TextIOWrapper(io.BufferedWriter(FrameWriter(sock, channel)), encoding="utf-8",
+                            errors="replace", line_buffering=True)
+
+
+# Client side
+
+def request(path, argv):
+    """Run argv in the daemon listening at path, copying its output to ours.
+
+    Returns the exit status, or None when no daemon is listening (the
+    caller then runs the command itself).
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+    with sock:
+        frames = [(b"c", os.getcwd())] + [(b"a", arg) for arg in argv]
+        frames += [(b"e", f"{name}={value}") for name, value in os.environ.items() if name.startswith(ENV_PREFIX)]
+        if wants_stdin(argv):
+            frames.append((b"i", sys.stdin.read()))
+        frames.append((b".", ""))
+        sock.sendall(b"".join(encode_frame(channel, text.encode("utf-8", "surrogateescape")) for channel, text in frames))
+        outputs = {b"1": sys.stdout.buffer, b"2": sys.stderr.buffer}
+        for channel, payload in read_frames(sock.makefile("rb")):
+            if channel == b"x":
+                return int(payload)
+            outputs[channel].write(payload)
+            outputs[channel].flush()
+    sys.stderr.write("Lost the connection to the daemon before the command finished.\n")
+    return 1
+
+
+# Daemon side
+
+def run(group, argv):
+    """Run one CLI invocation in-process; returns its exit status."""
+    try:
+        group.main(args=argv, prog_name="cli.py", standalone_mode=True)
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except Exception:
+        import traceback
+
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def read_request(stream):
+    """(cwd, argv, env, stdin) from the client's frames."""
+    cwd, argv, env, stdin = None, [], {}, None
+    for channel, payload in read_frames(stream):
+        text = payload.decode("utf-8", "surrogateescape")
+        if channel == b".":
+            return cwd, argv, env, stdin
+        if channel == b"c":
+            cwd = text
+        elif channel == b"a":
+            argv.append(text)
+        elif channel == b"e":
+            name, _, value = text.partition("=")
+            env[name] = value
+        elif channel == b"i":
+            stdin = text
+    raise ConnectionResetError("client closed the connection mid-request")
+
+
+def handle(conn, group):
+    cwd, argv, env, stdin = read_request(conn.makefile("rb"))
+    stdout, stderr = frame_stream(conn, b"1"), frame_stream(conn, b"2")
+    saved_streams = sys.stdin, sys.stdout, sys.stderr
+    saved_cwd = os.getcwd()
+    saved_env = {name: value for name, value in os.environ.items() if name.startswith(ENV_PREFIX)}
+    try:
+        sys.stdin = io.StringIO(stdin or "")
+        sys.stdout, sys.stderr = stdout, stderr
+        os.chdir(cwd)
+        set_env(env)
+        status = run(group, argv)
+        for stream in (stdout, stderr):
+            stream.flush()
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = saved_streams
+        os.chdir(saved_cwd)
+        set_env(saved_env)
+    send_frame(conn, b"x", str(status).encode())
+
+
+def set_env(env):
+    """Make the NUTRIFIT_* environment exactly env."""
+    for name in [name for name in os.environ if name.startswith(ENV_PREFIX)]:
+        del os.environ[name]
+    os.environ.update(env)
+
+
+def listen(path):
+    """Bind the socket, replacing a stale one left by a daemon that died."""
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+        else:
+            raise RuntimeError(f"A daemon is already listening on {path}.")
+        finally:
+            probe.close()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)  # only the owner may connect
+    try:
+        sock.bind(path)
+    finally:
+        os.umask(old_umask)
+    sock.listen(64)
+    return sock
+
+
+def serve(path, group, ready=None):
+    """Accept invocations on path until interrupted (Ctrl+C or SIGTERM)."""
+    import signal
+
+    from sqlalchemy.orm import configure_mappers
+
+    from db.database import get_engine
+    import db.models.cart, db.models.category_stats, db.resolver  # noqa: F401 (load models and mappers)
+
+    configure_mappers()
+    get_engine()
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    sock = listen(path)
+    if ready:
+        ready()
+    try:
+        while True:
+            conn, _ = sock.accept()
+            with conn:
+                try:
+                    handle(conn, group)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client went away; its command ran to the end or failed on output
+    finally:
+        sock.close()
+        os.unlink(path)
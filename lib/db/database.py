@@ -0,0 +1,372 @@
+import os
+import random
+import time
+
+# SQLAlchemy is imported lazily below so that importing this module (and the
+# CLI, e.g. for --help) stays cheap until a database is actually needed.
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), 'nutrifit.db')
+
+# Latest Alembic revision; bump it together with every new migration.
+HEAD_REVISION = 'd81f5c2e6a07'
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+
+# Named SQLite connection profiles. The pragmas are applied to every new
+# connection through an engine "connect" event.
+PROFILES = {
+    # WAL so readers never block the writer; full fsync on every commit.
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+    # WAL with fsync only at checkpoints: a power loss can drop the last
+    # commits, but the database never corrupts.
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # For seeding/imports that can be rerun from scratch: no fsync at all.
+    "bulk-load": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -262144,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+}
+DEFAULT_PROFILE = "durable"
+
+# Pragmas for read-only snapshots (db.snapshots), which are opened with
+# immutable=1: no journal, no locks, and as much of the file mmapped as fits.
+SNAPSHOT_PRAGMAS = {
+    "query_only": "ON",
+    "cache_size": -64000,
+    "mmap_size": 1073741824,
+    "temp_store": "MEMORY",
+}
+
+_settings = {
+    "db_path": None, "echo": None, "profile": None, "pool_size": None,
+    "slow_query_ms": None, "slow_log": None, "timing": False, "snapshot": None,
+}
+_engine = None
+_engine_key = None
+_session = None
+_query_log = None
+
+
+def configure(db_path=None, echo=None, profile=None, pool_size=None, slow_query_ms=None, slow_log=None, timing=None,
+              snapshot=None):
+    """Override engine settings before the engine is built.
+
+    slow_query_ms/slow_log turn on the slow-query log and timing=True the
+    per-statement summary (see db.querylog). snapshot names a snapshot of
+    the database (see db.snapshots) to open read-only instead of the
+    database itself; pass "" to go back to the database.
+    """
+    global _engine, _session, _query_log
+    if db_path is not None:
+        _settings["db_path"] = db_path
+    if echo is not None:
+        _settings["echo"] = echo
+    if profile is not None:
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown connection profile '{profile}'.")
+        _settings["profile"] = profile
+    if pool_size is not None:
+        _settings["pool_size"] = pool_size
+    if slow_query_ms is not None:
+        _settings["slow_query_ms"] = slow_query_ms
+    if slow_log is not None:
+        _settings["slow_log"] = slow_log
+    if timing is not None:
+        _settings["timing"] = timing
+    if snapshot is not None:
+        _settings["snapshot"] = snapshot or None
+    _reset()
+
+
+def reconfigure(**settings):
+    """Replace every setting at once: the given ones, defaults for the rest.
+
+    Unlike configure(), this keeps the engine (and its pooled connection)
+    when the effective settings, environment included, come out the same, so
+    a process that runs one CLI invocation after another (db.daemon) stays
+    warm. The shared session is closed either way, so rows loaded by one
+    invocation are re-read by the next. With timing on, the engine is always
+    rebuilt so that each invocation's report covers only its own queries.
+    """
+    global _session
+    if settings.get("profile") is not None and settings["profile"] not in PROFILES:
+        raise ValueError(f"Unknown connection profile '{settings['profile']}'.")
+    _settings.update(dict.fromkeys(_settings), timing=False)
+    _settings.update((name, value) for name, value in settings.items() if value is not None)
+    if _engine is not None and _engine_key == effective_settings() and not _settings["timing"]:
+        if _session is not None:
+            _session.close()
+        _session = None
+    else:
+        _reset()
+
+
+def _reset():
+    global _engine, _engine_key, _session, _query_log
+    if _session is not None:
+        _session.close()
+    if _engine is not None:
+        _engine.dispose()
+    if _query_log is not None:
+        _query_log.close()
+    _engine = _engine_key = _session = _query_log = None
+
+
+def db_path():
+    """The database file, made absolute against the current directory.
+
+    A daemon (db.daemon) serves clients from different directories, so a
+    relative --db must name the same file however it is reached, both in the
+    warm engine's key and for the connections the engine opens later.
+    """
+    return os.path.abspath(_settings["db_path"] or os.environ.get("NUTRIFIT_DB") or DEFAULT_DB_PATH)
+
+
+def echo_enabled():
+    if _settings["echo"] is not None:
+        return _settings["echo"]
+    return os.environ.get("NUTRIFIT_ECHO", "").lower() in ("1", "true", "yes", "on")
+
+
+def engine_path():
+    """The file the engine reads: the named snapshot's, or the database's."""
+    if _settings["snapshot"]:
+        from db.snapshots import snapshot_path
+
+        return snapshot_path(db_path(), _settings["snapshot"])
+    return db_path()
+
+
+def profile_name():
+    return _settings["profile"] or os.environ.get("NUTRIFIT_DB_PROFILE") or DEFAULT_PROFILE
+
+
+def effective_settings():
+    """The settings the engine is built from, after environment defaults."""
+    return (db_path(), echo_enabled(), profile_name(), _settings["pool_size"], slow_query_ms(),
+            _settings["slow_log"] or os.environ.get("NUTRIFIT_SLOW_LOG"), _settings["timing"], _settings["snapshot"],
+            snapshot_identity())
+
+
+def snapshot_identity():
+    """(inode, mtime) of the snapshot file in use, or None.
+
+    Re-taking a snapshot swaps in a new file, which a warm engine's pooled
+    connections (opened immutable) would never notice; a changed identity
+    makes reconfigure() build a new engine instead.
+    """
+    if not _settings["snapshot"]:
+        return None
+    try:
+        stat = os.stat(engine_path())
+    except (OSError, ValueError):
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def slow_query_ms():
+    if _settings["slow_query_ms"] is not None:
+        return _settings["slow_query_ms"]
+    value = os.environ.get("NUTRIFIT_SLOW_QUERY_MS")
+    return float(value) if value else None
+
+
+def query_log():
+    """The QueryLog timing the engine's statements, or None when timing is off."""
+    global _query_log
+    if _query_log is None and (_settings["timing"] or slow_query_ms() is not None):
+        from db.querylog import QueryLog
+
+        _query_log = QueryLog(
+            slow_ms=slow_query_ms(),
+            slow_log=_settings["slow_log"] or os.environ.get("NUTRIFIT_SLOW_LOG"),
+            summary=_settings["timing"],
+        )
+    return _query_log
+
+
+def instrument(engine):
+    """Attach the query log to engine, if timing is on."""
+    log = query_log()
+    if log is not None:
+        log.attach(engine)
+
+
+def apply_profile(engine, name, foreign_keys=True):
+    """Run the profile's PRAGMAs on every connection the engine opens.
+
+    Foreign keys are enforced (so deleting a user or supplement cascades to
+    its cart lines) whatever the profile; SQLite leaves them off by default.
+    """
+    apply_pragmas(engine, dict(PROFILES[name], foreign_keys="ON" if foreign_keys else "OFF"))
+
+
+def apply_pragmas(engine, pragmas):
+    """Run PRAGMA name=value for each of pragmas on every connection the engine opens."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
+
+def schema_revision(conn):
+    """Return the Alembic revision stamped in the database, or None."""
+    from sqlalchemy.exc import OperationalError
+
+    try:
+        return conn.exec_driver_sql("SELECT version_num FROM alembic_version").scalar()
+    except OperationalError:
+        return None
+
+
+def upgrade_schema(path):
+    """Run the Alembic migrations on the database at path if it is stamped
+    with an older revision than HEAD_REVISION.
+
+    Files without a stamp (e.g. new ones) are left to ensure_schema. The
+    migrations run on a plain connection of their own, without the profile's
+    foreign_keys=ON, as `alembic upgrade head` would: table rebuilds must not
+    cascade.
+    """
+    import sqlite3
+
+    if not os.path.exists(path):
+        return
+    conn = sqlite3.connect(path)
+    try:
+        revision = conn.execute("SELECT version_num FROM alembic_version").fetchone()
+    except sqlite3.OperationalError:
+        revision = None
+    finally:
+        conn.close()
+    if revision is None or revision[0] == HEAD_REVISION:
+        return
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    config.set_main_option("sqlalchemy.url", f"sqlite:///{path}".replace("%", "%%"))
+    command.upgrade(config, "head")
+
+
+def ensure_schema(conn):
+    """Create missing tables unless the database is already at the Alembic head."""
+    if schema_revision(conn) == HEAD_REVISION:
+        return
+    from db.models import Base
+    import db.models.supplement, db.models.user, db.models.cart, db.models.order  # noqa: F401 (register tables)
+    Base.metadata.create_all(conn)
+
+
+def get_engine():
+    """Build the engine on first use."""
+    global _engine, _engine_key
+    if _engine is None:
+        from sqlalchemy import create_engine
+
+        pool = {}
+        if _settings["pool_size"] is not None:
+            # A fixed pool: callers beyond pool_size wait for a free connection.
+            pool = {"pool_size": _settings["pool_size"], "max_overflow": 0}
+        if _settings["snapshot"]:
+            from urllib.parse import quote
+            from sqlalchemy.engine import URL
+
+            # Read-only and immutable: nothing may (or needs to) touch its schema.
+            url = URL.create("sqlite", database=f"file:{quote(os.path.abspath(engine_path()))}",
+                             query={"mode": "ro", "immutable": "1", "uri": "true"})
+            _engine = create_engine(url, echo=echo_enabled(), **pool)
+            apply_pragmas(_engine, SNAPSHOT_PRAGMAS)
+            instrument(_engine)
+        else:
+            upgrade_schema(db_path())
+            _engine = create_engine(f'sqlite:///{db_path()}', echo=echo_enabled(), **pool)
+            apply_profile(_engine, profile_name())
+            instrument(_engine)
+            with _engine.begin() as conn:
+                ensure_schema(conn)
+        _engine_key = effective_settings()
+    return _engine
+
+
+def get_session():
+    """Return the shared session, opening it on first use."""
+    global _session
+    if _session is None:
+        from sqlalchemy.orm import sessionmaker
+
+        _session = sessionmaker(bind=get_engine())()
+    return _session
+
+
+def new_session():
+    """Open a session of its own on the shared engine (one per request or
+    thread); the caller closes it. Connections come from the engine's pool."""
+    from sqlalchemy.orm import Session
+
+    return Session(bind=get_engine())
+
+
+def begin(session, mode="DEFERRED"):
+    """Open the session's SQLite transaction explicitly (BEGIN DEFERRED/IMMEDIATE).
+
+    pysqlite only sends BEGIN ahead of the first INSERT/UPDATE/DELETE, so
+    without this SAVEPOINTs issued earlier run in autocommit mode and every
+    RELEASE commits on its own.
+    """
+    session.connection().exec_driver_sql(f"BEGIN {mode}")
+
+
+def is_busy(error):
+    """True if a DBAPI error means another connection holds the write lock."""
+    message = str(getattr(error, "orig", error))
+    return "database is locked" in message or "database is busy" in message
+
+
+def run_immediate(session, work, retries=5, backoff=0.05):
+    """Run work() in a BEGIN IMMEDIATE transaction and commit, retrying on SQLITE_BUSY.
+
+    IMMEDIATE takes the write lock up front, so a transaction never fails
+    halfway through when it upgrades from reading to writing. If the lock is
+    still held after busy_timeout, the attempt is rolled back and retried up
+    to retries times with jittered exponential backoff. Other errors roll
+    back and propagate.
+    """
+    from sqlalchemy.exc import OperationalError
+
+    for attempt in range(retries + 1):
+        try:
+            begin(session, "IMMEDIATE")
+            result = work()
+            session.commit()
+            return result
+        except OperationalError as e:
+            session.rollback()
+            if not is_busy(e) or attempt == retries:
+                raise
+        except Exception:
+            session.rollback()
+            raise
+        time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
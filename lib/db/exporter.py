@@ -0,0 +1,84 @@
+import csv
+import gzip
+import json
+import sys
+from contextlib import contextmanager
+from sqlalchemy import select
+
+from db.models.supplement import Supplement
+from db.models.user import User
+from db.models.cart import Cart
+
+
+EXPORT_TABLES = {
+    "supplements": Supplement.__table__,
+    "users": User.__table__,
+    "cart": Cart.__table__,
+}
+
+
+def build_query(table, columns=None, category=None, updated_since=None):
+    """Core select over one table with optional projection and filters, in id order."""
+    if columns:
+        unknown = [name for name in columns if name not in table.c]
+        if unknown:
+            raise ValueError(f"Unknown column(s) for {table.name}: {', '.join(unknown)}")
+        query = select(*(table.c[name] for name in columns))
+    else:
+        query = select(table)
+    if category is not None:
+        if "category" not in table.c:
+            raise ValueError(f"{table.name} has no category column")
+        query = query.where(table.c.category == category)
+    if updated_since is not None:
+        query = query.where(table.c.updated_at >= updated_since)
+    return query.order_by(table.c.id)
+
+
+@contextmanager
+def open_output(path, compress):
+    """Open path (or stdout for '-') for text writing, gzip-compressed if asked."""
+    if path == "-":
+        if compress:
+            with gzip.open(sys.stdout.buffer, "wt", compresslevel=6, newline="") as f:
+                yield f
+        else:
+            yield sys.stdout
+        return
+    if compress:
+        with gzip.open(path, "wt", compresslevel=6, encoding="utf-8", newline="") as f:
+            yield f
+    else:
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            yield f
+
+
+def write_csv(out, keys, partitions):
+    writer = csv.writer(out)
+    writer.writerow(keys)
+    count = 0
+    for rows in partitions:
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+
+def write_jsonl(out, keys, partitions):
+    count = 0
+    for rows in partitions:
+        out.write("".join(
+            json.dumps(dict(zip(keys, row)), default=str) + "\n" for row in rows
+        ))
+        count += len(rows)
+    return count
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
+
+
+def export_table(engine, kind, out, fmt="csv", columns=None, category=None, updated_since=None, batch_size=10000):
+    """Stream a table into out batch_size rows at a time; returns the number of rows written."""
+    query = build_query(EXPORT_TABLES[kind], columns, category, updated_since)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        return WRITERS[fmt](out, list(result.keys()), result.partitions())
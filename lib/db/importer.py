@@ -0,0 +1,231 @@
+import csv
+import json
+import math
+import time
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from db.models.supplement import Supplement
+from db.models.user import User
+
+
+# SQLite caps the number of bound parameters per statement, so key lookups
+# are split into chunks of this size.
+LOOKUP_CHUNK = 900
+
+# Only the first few validation errors are kept for the report.
+MAX_REPORTED_ERRORS = 100
+
+
+def clean_text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def validate_supplement(row):
+    name = clean_text(row.get("name"))
+    if not name:
+        raise ValueError("name is required")
+    try:
+        price = float(row.get("price"))
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid price {row.get('price')!r}")
+    if not math.isfinite(price):
+        raise ValueError(f"invalid price {row.get('price')!r}")
+    if price < 0:
+        raise ValueError("price must not be negative")
+    quantity = row.get("quantity")
+    try:
+        quantity = int(quantity) if clean_text(quantity) is not None else 0
+    except ValueError:
+        raise ValueError(f"invalid quantity {quantity!r}")
+    if quantity < 0:
+        raise ValueError("quantity must not be negative")
+    return {
+        "name": name,
+        "description": clean_text(row.get("description")),
+        "price": price,
+        "quantity": quantity,
+        "category": clean_text(row.get("category")),
+    }
+
+
+def validate_user(row):
+    name = clean_text(row.get("name"))
+    email = clean_text(row.get("email"))
+    if not name:
+        raise ValueError("name is required")
+    if not email or "@" not in email:
+        raise ValueError(f"invalid email {row.get('email')!r}")
+    return {"name": name, "email": email}
+
+
+# kind -> (table, natural key column, row validator)
+IMPORTERS = {
+    "supplements": (Supplement.__table__, "name", validate_supplement),
+    "users": (User.__table__, "email", validate_user),
+}
+
+
+def detect_format(path):
+    lowered = path.lower()
+    if lowered.endswith(".csv"):
+        return "csv"
+    if lowered.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of '{path}'; pass --format csv or --format jsonl.")
+
+
+def read_rows(path, fmt):
+    """Yield (location, row, error) triples from a CSV or JSONL file, one line at a time."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield f"line {reader.line_num}", row, None
+            return
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            location = f"line {line_number}"
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield location, None, e.msg
+                continue
+            if not isinstance(row, dict):
+                yield location, None, "expected a JSON object"
+                continue
+            yield location, row, None
+
+
+class ImportStats:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    @property
+    def processed(self):
+        return self.inserted + self.updated + self.skipped + self.invalid
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+
+def existing_keys(conn, table, key, values):
+    """Map natural key -> id for the keys that are already in the table."""
+    column = table.c[key]
+    found = {}
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        chunk = values[start:start + LOOKUP_CHUNK]
+        for row_id, value in conn.execute(select(table.c.id, column).where(column.in_(chunk))):
+            found[value] = row_id
+    return found
+
+
+def write_rows(conn, table, key, by_key, upsert):
+    """Insert (and in upsert mode update) by_key's rows; returns (inserted, updated, skipped)."""
+    found = existing_keys(conn, table, key, list(by_key))
+    new_rows = [row for value, row in by_key.items() if value not in found]
+    if new_rows:
+        conn.execute(insert(table), new_rows)
+
+    if not found:
+        return len(new_rows), 0, 0
+    if not upsert:
+        return len(new_rows), 0, len(found)
+    columns = [name for name in by_key[next(iter(found))] if name != key]
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values({name: bindparam(f"b_{name}") for name in columns})
+    )
+    params = [
+        dict({f"b_{name}": by_key[value][name] for name in columns}, b_id=row_id)
+        for value, row_id in found.items()
+    ]
+    conn.execute(statement, params)
+    return len(new_rows), len(params), 0
+
+
+def count(stats, inserted, updated, skipped):
+    stats.inserted += inserted
+    stats.updated += updated
+    stats.skipped += skipped
+
+
+def write_batch(engine, table, key, batch, upsert, stats):
+    """Insert (and in upsert mode update) one batch of (location, row) pairs in a single transaction.
+
+    If the database rejects the batch (e.g. a constraint the validator does
+    not check), it is replayed one row per savepoint and only the rejected
+    rows are reported as invalid.
+    """
+    # Later rows win when the same key shows up twice in a batch.
+    by_key = {row[key]: (location, row) for location, row in batch}
+    stats.skipped += len(batch) - len(by_key)
+
+    try:
+        with engine.begin() as conn:
+            counts = write_rows(conn, table, key, {value: row for value, (_, row) in by_key.items()}, upsert)
+    except IntegrityError:
+        pass
+    else:
+        count(stats, *counts)
+        return
+
+    with engine.begin() as conn:
+        results = []
+        for value, (location, row) in by_key.items():
+            savepoint = conn.begin_nested()
+            try:
+                results.append(write_rows(conn, table, key, {value: row}, upsert))
+                savepoint.commit()
+            except IntegrityError as e:
+                savepoint.rollback()
+                stats.invalid += 1
+                if len(stats.errors) < MAX_REPORTED_ERRORS:
+                    stats.errors.append(f"{location}: rejected by the database ({e.orig})")
+    for counts in results:
+        count(stats, *counts)
+
+
+def import_file(engine, kind, path, fmt=None, batch_size=10000, upsert=False, progress=None):
+    """Stream rows from path into the kind table in batch_size transactions."""
+    table, key, validate = IMPORTERS[kind]
+    fmt = fmt or detect_format(path)
+    stats = ImportStats()
+    batch = []
+
+    for location, row, error in read_rows(path, fmt):
+        if error is None:
+            try:
+                batch.append((location, validate(row)))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            stats.invalid += 1
+            if len(stats.errors) < MAX_REPORTED_ERRORS:
+                stats.errors.append(f"{location}: {error}")
+        if len(batch) >= batch_size:
+            write_batch(engine, table, key, batch, upsert, stats)
+            batch = []
+            if progress:
+                progress(stats)
+
+    if batch:
+        write_batch(engine, table, key, batch, upsert, stats)
+    if progress:
+        progress(stats)
+    return stats
@@ -1,6 +1,6 @@
 import sys
 import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "lib")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
 
 from logging.config import fileConfig
@@ -10,6 +10,7 @@ from sqlalchemy import pool
 from db.models.supplement import Supplement
 from db.models.user import User
 from db.models.cart import Cart
+from db.models.order import Order, OrderItem
 
 
 
@@ -19,6 +19,11 @@ depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade():
+    # The bundled nutrifit.db already has this cart table (user_id and
+    # supplement_id included), created before this revision was stamped.
+    if 'cart' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
     # Create the cart table without foreign keys initially
     op.create_table(
         'cart',
@@ -0,0 +1,32 @@
+"""add lookup indexes
+
+Revision ID: 3f2a9c1d7b64
+Revises: 1258db81ee53
+Create Date: 2026-10-18 09:12:41.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c1d7b64'
+down_revision: Union[str, None] = '1258db81ee53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_supplements_name', 'supplements', ['name'], if_not_exists=True)
+    op.create_index('ix_users_name', 'users', ['name'], if_not_exists=True)
+    op.create_index('ix_cart_user_id_supplement_id', 'cart', ['user_id', 'supplement_id'], if_not_exists=True)
+    op.create_index('ix_cart_supplement_id', 'cart', ['supplement_id'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cart_supplement_id', table_name='cart', if_exists=True)
+    op.drop_index('ix_cart_user_id_supplement_id', table_name='cart', if_exists=True)
+    op.drop_index('ix_users_name', table_name='users', if_exists=True)
+    op.drop_index('ix_supplements_name', table_name='supplements', if_exists=True)
@@ -0,0 +1,96 @@
+"""add trigger-maintained category_stats table
+
+Revision ID: 5c8f2a61d9e0
+Revises: e4a90c3b7f21
+Create Date: 2026-10-18 17:05:52.640187
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c8f2a61d9e0'
+down_revision: Union[str, None] = 'e4a90c3b7f21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'category_stats',
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('products', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.Column('min_price', sa.Float(), nullable=True),
+        sa.Column('max_price', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('category'),
+    )
+    op.drop_index('ix_supplements_category', table_name='supplements')
+    op.create_index('ix_supplements_category_price', 'supplements', ['category', 'price'])
+
+    op.execute(
+        "CREATE TRIGGER category_stats_insert AFTER INSERT ON supplements BEGIN "
+        "INSERT INTO category_stats (category, products, quantity, value, min_price, max_price) "
+        "VALUES (COALESCE(new.category, ''), 1, COALESCE(new.quantity, 0), "
+        "new.price * COALESCE(new.quantity, 0), new.price, new.price) "
+        "ON CONFLICT (category) DO UPDATE SET "
+        "products = products + 1, quantity = quantity + excluded.quantity, value = value + excluded.value, "
+        "min_price = MIN(min_price, excluded.min_price), max_price = MAX(max_price, excluded.max_price); END"
+    )
+    op.execute(
+        "CREATE TRIGGER category_stats_delete AFTER DELETE ON supplements BEGIN "
+        "UPDATE category_stats SET "
+        "products = products - 1, quantity = quantity - COALESCE(old.quantity, 0), "
+        "value = value - old.price * COALESCE(old.quantity, 0), "
+        "min_price = CASE WHEN old.price <= min_price "
+        "THEN (SELECT MIN(price) FROM supplements WHERE category IS old.category) ELSE min_price END, "
+        "max_price = CASE WHEN old.price >= max_price "
+        "THEN (SELECT MAX(price) FROM supplements WHERE category IS old.category) ELSE max_price END "
+        "WHERE category = COALESCE(old.category, ''); "
+        "DELETE FROM category_stats WHERE category = COALESCE(old.category, '') AND products <= 0; END"
+    )
+    op.execute(
+        "CREATE TRIGGER category_stats_update_stock AFTER UPDATE OF quantity ON supplements "
+        "WHEN new.category IS old.category AND new.price = old.price BEGIN "
+        "UPDATE category_stats SET "
+        "quantity = quantity + COALESCE(new.quantity, 0) - COALESCE(old.quantity, 0), "
+        "value = value + new.price * (COALESCE(new.quantity, 0) - COALESCE(old.quantity, 0)) "
+        "WHERE category = COALESCE(new.category, ''); END"
+    )
+    op.execute(
+        "CREATE TRIGGER category_stats_update AFTER UPDATE OF category, price, quantity ON supplements "
+        "WHEN new.category IS NOT old.category OR new.price != old.price BEGIN "
+        "UPDATE category_stats SET "
+        "products = products - 1, quantity = quantity - COALESCE(old.quantity, 0), "
+        "value = value - old.price * COALESCE(old.quantity, 0), "
+        "min_price = (SELECT MIN(price) FROM supplements WHERE category IS old.category), "
+        "max_price = (SELECT MAX(price) FROM supplements WHERE category IS old.category) "
+        "WHERE category = COALESCE(old.category, ''); "
+        "DELETE FROM category_stats WHERE category = COALESCE(old.category, '') AND products <= 0; "
+        "INSERT INTO category_stats (category, products, quantity, value, min_price, max_price) "
+        "VALUES (COALESCE(new.category, ''), 1, COALESCE(new.quantity, 0), "
+        "new.price * COALESCE(new.quantity, 0), new.price, new.price) "
+        "ON CONFLICT (category) DO UPDATE SET "
+        "products = products + 1, quantity = quantity + excluded.quantity, value = value + excluded.value, "
+        "min_price = MIN(min_price, excluded.min_price), max_price = MAX(max_price, excluded.max_price); END"
+    )
+
+    # Fill it from the existing catalog.
+    op.execute(
+        "INSERT INTO category_stats (category, products, quantity, value, min_price, max_price) "
+        "SELECT COALESCE(category, ''), COUNT(*), COALESCE(SUM(quantity), 0), "
+        "COALESCE(SUM(price * quantity), 0.0), MIN(price), MAX(price) "
+        "FROM supplements GROUP BY COALESCE(category, '')"
+    )
+
+
+def downgrade() -> None:
+    for trigger in ('category_stats_update', 'category_stats_update_stock', 'category_stats_delete', 'category_stats_insert'):
+        op.execute(f"DROP TRIGGER {trigger}")
+    op.drop_index('ix_supplements_category_price', table_name='supplements')
+    op.create_index('ix_supplements_category', 'supplements', ['category'])
+    op.drop_table('category_stats')
@@ -0,0 +1,36 @@
+"""add updated_at columns
+
+Revision ID: 8d41e6b0a2c9
+Revises: 3f2a9c1d7b64
+Create Date: 2026-10-18 10:02:17.884305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41e6b0a2c9'
+down_revision: Union[str, None] = '3f2a9c1d7b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # SQLite cannot add a column with a non-constant default, so the column
+    # is added empty and backfilled; new values come from the model default.
+    for table in ('supplements', 'users', 'cart'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP")
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'])
+    op.create_index('ix_supplements_category', 'supplements', ['category'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_supplements_category', table_name='supplements')
+    for table in ('cart', 'users', 'supplements'):
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
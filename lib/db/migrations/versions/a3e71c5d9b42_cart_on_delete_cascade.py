@@ -0,0 +1,60 @@
+"""cart lines cascade with their user and supplement
+
+Orphaned cart lines are deleted first, without returning their quantities
+to stock, since lines from before stock reservation never held any.
+
+Revision ID: a3e71c5d9b42
+Revises: 5c8f2a61d9e0
+Create Date: 2026-10-18 19:12:08.314560
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3e71c5d9b42'
+down_revision: Union[str, None] = '5c8f2a61d9e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "id, quantity, user_name, supplement_name, supplement_price, user_id, supplement_id, updated_at"
+
+
+def rebuild_cart(ondelete, nullable):
+    # SQLite cannot alter a foreign key in place: copy into a new table.
+    op.create_table(
+        'cart_new',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=True),
+        sa.Column('user_name', sa.String(), nullable=True),
+        sa.Column('supplement_name', sa.String(), nullable=True),
+        sa.Column('supplement_price', sa.Float(), nullable=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete=ondelete), nullable=nullable),
+        sa.Column('supplement_id', sa.Integer(), sa.ForeignKey('supplements.id', ondelete=ondelete), nullable=nullable),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.execute(f"INSERT INTO cart_new ({COLUMNS}) SELECT {COLUMNS} FROM cart")
+    op.drop_table('cart')
+    op.rename_table('cart_new', 'cart')
+    op.create_index('ix_cart_supplement_id', 'cart', ['supplement_id'])
+    op.create_index('ix_cart_updated_at', 'cart', ['updated_at'])
+    op.create_index('uq_cart_user_id_supplement_id', 'cart', ['user_id', 'supplement_id'], unique=True)
+
+
+def upgrade() -> None:
+    # Orphaned lines (no user or supplement, or one that no longer exists)
+    # are dropped. Their quantities are not put back in stock: lines added
+    # before Cart.add reserved stock never took any out of it.
+    op.execute(
+        "DELETE FROM cart WHERE user_id IS NULL OR user_id NOT IN (SELECT id FROM users) "
+        "OR supplement_id IS NULL OR supplement_id NOT IN (SELECT id FROM supplements)"
+    )
+    rebuild_cart(ondelete='CASCADE', nullable=False)
+
+
+def downgrade() -> None:
+    rebuild_cart(ondelete=None, nullable=True)
@@ -0,0 +1,38 @@
+"""one cart line per user and supplement
+
+Revision ID: b52e7d9f14a3
+Revises: 8d41e6b0a2c9
+Create Date: 2026-10-18 14:21:40.512093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b52e7d9f14a3'
+down_revision: Union[str, None] = '8d41e6b0a2c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Fold duplicate lines into the oldest one (keeping its price), then drop
+    # the rest so the unique index can be built.
+    op.execute(
+        "UPDATE cart SET "
+        "quantity = (SELECT SUM(c.quantity) FROM cart AS c "
+        "            WHERE c.user_id = cart.user_id AND c.supplement_id = cart.supplement_id), "
+        "updated_at = CURRENT_TIMESTAMP "
+        "WHERE id IN (SELECT MIN(id) FROM cart GROUP BY user_id, supplement_id HAVING COUNT(*) > 1)"
+    )
+    op.execute("DELETE FROM cart WHERE id NOT IN (SELECT MIN(id) FROM cart GROUP BY user_id, supplement_id)")
+    op.drop_index('ix_cart_user_id_supplement_id', table_name='cart')
+    op.create_index('uq_cart_user_id_supplement_id', 'cart', ['user_id', 'supplement_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_cart_user_id_supplement_id', table_name='cart')
+    op.create_index('ix_cart_user_id_supplement_id', 'cart', ['user_id', 'supplement_id'])
@@ -0,0 +1,55 @@
+"""add orders and order_items
+
+Revision ID: d81f5c2e6a07
+Revises: a3e71c5d9b42
+Create Date: 2026-10-18 21:40:52.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81f5c2e6a07'
+down_revision: Union[str, None] = 'a3e71c5d9b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'orders',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('user_name', sa.String(), nullable=True),
+        sa.Column('items', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_orders_user_id', 'orders', ['user_id'])
+    op.create_index('ix_orders_created_at', 'orders', ['created_at'])
+    op.create_table(
+        'order_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), sa.ForeignKey('orders.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('supplement_id', sa.Integer(), sa.ForeignKey('supplements.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('supplement_name', sa.String(), nullable=True),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_order_items_order_id', 'order_items', ['order_id'])
+    op.create_index('ix_order_items_supplement_id', 'order_items', ['supplement_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_items_supplement_id', table_name='order_items')
+    op.drop_index('ix_order_items_order_id', table_name='order_items')
+    op.drop_table('order_items')
+    op.drop_index('ix_orders_created_at', table_name='orders')
+    op.drop_index('ix_orders_user_id', table_name='orders')
+    op.drop_table('orders')
@@ -0,0 +1,51 @@
+"""add full-text search over supplements
+
+Revision ID: e4a90c3b7f21
+Revises: b52e7d9f14a3
+Create Date: 2026-10-18 15:47:03.219544
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a90c3b7f21'
+down_revision: Union[str, None] = 'b52e7d9f14a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE VIRTUAL TABLE supplements_fts USING fts5("
+        "name, description, category, content='supplements', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    )
+    op.execute(
+        "CREATE TRIGGER supplements_fts_insert AFTER INSERT ON supplements BEGIN "
+        "INSERT INTO supplements_fts (rowid, name, description, category) "
+        "VALUES (new.id, new.name, new.description, new.category); END"
+    )
+    op.execute(
+        "CREATE TRIGGER supplements_fts_delete AFTER DELETE ON supplements BEGIN "
+        "INSERT INTO supplements_fts (supplements_fts, rowid, name, description, category) "
+        "VALUES ('delete', old.id, old.name, old.description, old.category); END"
+    )
+    op.execute(
+        "CREATE TRIGGER supplements_fts_update AFTER UPDATE OF name, description, category ON supplements BEGIN "
+        "INSERT INTO supplements_fts (supplements_fts, rowid, name, description, category) "
+        "VALUES ('delete', old.id, old.name, old.description, old.category); "
+        "INSERT INTO supplements_fts (rowid, name, description, category) "
+        "VALUES (new.id, new.name, new.description, new.category); END"
+    )
+    # Index the rows that are already there.
+    op.execute("INSERT INTO supplements_fts (supplements_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    for trigger in ('supplements_fts_update', 'supplements_fts_delete', 'supplements_fts_insert'):
+        op.execute(f"DROP TRIGGER {trigger}")
+    op.execute("DROP TABLE supplements_fts")
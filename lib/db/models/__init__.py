@@ -1,3 +1,39 @@
 from sqlalchemy.orm import declarative_base
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+class KeysetPagination:
+    """Keyset (id-ordered) paging helpers shared by the models."""
+
+    @classmethod
+    def stream(cls, session, after_id=None, limit=None, batch_size=1000, options=()):
+        """Yield rows in id order, fetching them from the cursor batch_size at a time."""
+        query = session.query(cls).options(*options).order_by(cls.id)
+        if after_id is not None:
+            query = query.filter(cls.id > after_id)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.yield_per(batch_size)
+
+    @classmethod
+    def page_before(cls, session, before_id, limit, options=()):
+        """Return up to limit rows preceding before_id, in id order."""
+        rows = (
+            session.query(cls).options(*options)
+            .filter(cls.id < before_id)
+            .order_by(cls.id.desc())
+            .limit(limit)
+            .all()
+        )
+        rows.reverse()
+        return rows
+
+
+# Import every model so relationship() targets referenced by name can always
+# be resolved, whichever model module a caller imports first.
+from db.models.supplement import Supplement  # noqa: E402,F401
+from db.models.user import User  # noqa: E402,F401
+from db.models.cart import Cart  # noqa: E402,F401
+from db.models.category_stats import CategoryStats  # noqa: E402,F401
+from db.models.order import Order, OrderItem  # noqa: E402,F401
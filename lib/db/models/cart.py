@@ -1,20 +1,28 @@
-from db.models import Base
+from db.models import Base, KeysetPagination
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, bindparam, delete, func, Index, or_, select, update
+from sqlalchemy.dialects.sqlite import insert
 from db.models.supplement import Supplement
 from db.models.user import User
 
 
-class Cart(Base):
+class Cart(Base, KeysetPagination):
     __tablename__ = 'cart'
+    __table_args__ = (
+        # One line per user and supplement; adding again merges into it.
+        Index('uq_cart_user_id_supplement_id', 'user_id', 'supplement_id', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
-    user_name = Column(String, ForeignKey('users.id'))
-    supplement_name = Column(String, ForeignKey('supplements.id'))
+    user_name = Column(String)
+    supplement_name = Column(String)
     supplement_price = Column(Float,)
     quantity = Column(Integer, default=1)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)  
-    supplement_id = Column(Integer, ForeignKey('supplements.id'), nullable=False) 
+    # Lines go with their user or supplement (PRAGMA foreign_keys is turned
+    # on by db.database.apply_profile).
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    supplement_id = Column(Integer, ForeignKey('supplements.id', ondelete='CASCADE'), nullable=False, index=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)
     
     
 
@@ -25,7 +33,7 @@ class Cart(Base):
         return  f"<Cart(user_name={self.user_name}, supplement_name={self.supplement_name}, supplement_price={self.supplement_price}, quantity={self.quantity})>"
     
     @classmethod
-    def create(cls, session, user_name, supplement_name, supplement_price, quantity, user_id, supplement_id):
+    def create(cls, session, user_name, supplement_name, supplement_price, quantity, user_id, supplement_id, commit=True):
         cart_item = cls(user_name=user_name,
             supplement_name=supplement_name,
             supplement_price=supplement_price,
@@ -33,22 +41,142 @@ class Cart(Base):
             user_id=user_id,
             supplement_id=supplement_id)
         session.add(cart_item)
-        session.commit()
+        if commit:
+            session.commit()
+        else:
+            session.flush()
         return cart_item
 
     @classmethod
-    def delete(cls, session, cart_id):
-        cart_item = session.query(cls).get(cart_id)
-        if cart_item:
-            session.delete(cart_item)
+    def merge_statement(cls):
+        """INSERT ... ON CONFLICT DO UPDATE ... RETURNING id, built once and reused."""
+        if "_merge_statement" not in cls.__dict__:
+            columns = ("user_name", "supplement_name", "supplement_price", "quantity", "user_id", "supplement_id")
+            statement = insert(cls).values(dict({name: bindparam(name) for name in columns}, updated_at=func.now()))
+            cls._merge_statement = statement.on_conflict_do_update(
+                index_elements=[cls.user_id, cls.supplement_id],
+                set_={"quantity": cls.quantity + statement.excluded.quantity, "updated_at": func.now()},
+            ).returning(cls.id)
+        return cls._merge_statement
+
+    @classmethod
+    def merge(cls, session, user_name, supplement_name, supplement_price, quantity, user_id, supplement_id):
+        """Insert a cart line, or add quantity to the user's existing line for the supplement.
+
+        A single INSERT ... ON CONFLICT DO UPDATE; returns the line's id.
+        """
+        params = {
+            "user_name": user_name,
+            "supplement_name": supplement_name,
+            "supplement_price": supplement_price,
+            "quantity": quantity,
+            "user_id": user_id,
+            "supplement_id": supplement_id,
+        }
+        return session.execute(cls.merge_statement(), params).scalar_one()
+
+    @classmethod
+    def add(cls, session, user, supplement, quantity, commit=True):
+        """Reserve quantity units of supplement and put them in user's cart; returns the line's id."""
+        if not Supplement.reserve(session, supplement.id, quantity):
+            raise ValueError(f"Not enough stock of '{supplement.name}' to add {quantity}.")
+        cart_id = cls.merge(session, user.name, supplement.name, supplement.price, quantity,
+                            user.id, supplement.id)
+        if commit:
             session.commit()
-        else:
+        return cart_id
+
+    @classmethod
+    def delete(cls, session, cart_id, commit=True):
+        if not cls.delete_where(session, cls.id == cart_id, commit=commit):
             raise ValueError("Cart item not found.")
 
+    @classmethod
+    def release_where(cls, session, *criteria):
+        """Put the units of every cart line matching criteria back in stock.
+
+        One UPDATE ... FROM over the lines' per-supplement totals, however
+        many lines match.
+        """
+        lines = (
+            select(cls.supplement_id, func.sum(cls.quantity).label("quantity"))
+            .where(*criteria)
+            .group_by(cls.supplement_id)
+            .subquery()
+        )
+        session.execute(
+            update(Supplement)
+            .where(Supplement.id == lines.c.supplement_id)
+            .values(quantity=Supplement.quantity + lines.c.quantity)
+        )
+
+    @classmethod
+    def delete_where(cls, session, *criteria, commit=True):
+        """Delete every cart line matching criteria and return their units to
+        stock, in two statements; returns the number of lines deleted."""
+        cls.release_where(session, *criteria)
+        deleted = session.execute(delete(cls).where(*criteria)).rowcount
+        if commit:
+            session.commit()
+        return deleted
+
+    @classmethod
+    def clear(cls, session, user_id, commit=True):
+        """Empty a user's cart; returns the number of lines removed."""
+        return cls.delete_where(session, cls.user_id == user_id, commit=commit)
+
+    @classmethod
+    def refresh_prices(cls, session, *criteria):
+        """Copy the current price and name of every supplement matching
+        criteria into its cart lines, in one UPDATE ... FROM; returns the
+        number of lines that changed."""
+        return session.execute(
+            update(cls)
+            .where(
+                cls.supplement_id == Supplement.id, *criteria,
+                or_(cls.supplement_price.is_distinct_from(Supplement.price),
+                    cls.supplement_name.is_distinct_from(Supplement.name)),
+            )
+            .values(supplement_price=Supplement.price, supplement_name=Supplement.name),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+
     @classmethod
     def get_all(cls, session):
         return session.query(cls).all()
 
     @classmethod
     def find_by_id(cls, session, cart_id):
-        return session.query(cls).get(cart_id)
\ No newline at end of file
+        return session.query(cls).get(cart_id)
+
+    # Sort keys accepted by summary().
+    SUMMARY_ORDERS = ("value", "quantity", "items")
+
+    @classmethod
+    def summary(cls, session, user_id=None, order_by="value", limit=None):
+        """Per-user item count, total quantity and cart value from a single GROUP BY."""
+        items = func.count(cls.id).label("items")
+        quantity = func.coalesce(func.sum(cls.quantity), 0).label("quantity")
+        value = func.coalesce(func.sum(cls.quantity * cls.supplement_price), 0.0).label("value")
+        query = (
+            session.query(cls.user_id, User.name.label("user_name"), items, quantity, value)
+            .join(User, User.id == cls.user_id)
+            .group_by(cls.user_id, User.name)
+        )
+        if user_id is not None:
+            query = query.filter(cls.user_id == user_id)
+        sort_key = {"value": value, "quantity": quantity, "items": items}[order_by]
+        query = query.order_by(sort_key.desc(), cls.user_id)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    @classmethod
+    def totals(cls, session):
+        """Store-wide cart totals: users with a cart, lines, quantity and value."""
+        return session.query(
+            func.count(func.distinct(cls.user_id)).label("users"),
+            func.count(cls.id).label("items"),
+            func.coalesce(func.sum(cls.quantity), 0).label("quantity"),
+            func.coalesce(func.sum(cls.quantity * cls.supplement_price), 0.0).label("value"),
+        ).one()
@@ -0,0 +1,129 @@
+from db.models import Base
+from sqlalchemy import Column, Integer, String, Float, DDL, event, func, text
+from db.models.supplement import Supplement
+
+# category_stats holds one row of totals per supplement category and is kept
+# up to date by triggers on supplements, so dashboards read a handful of rows
+# instead of scanning the catalog. Supplements without a category are counted
+# under ''. Counts, stock and value are adjusted by deltas; the min/max price
+# is only recomputed (one index seek on supplements (category, price)) when
+# the row that held it goes away or changes price.
+CATEGORY_STATS_TRIGGERS = {
+    "category_stats_insert":
+        "CREATE TRIGGER category_stats_insert AFTER INSERT ON supplements BEGIN "
+        "INSERT INTO category_stats (category, products, quantity, value, min_price, max_price) "
+        "VALUES (COALESCE(new.category, ''), 1, COALESCE(new.quantity, 0), "
+        "new.price * COALESCE(new.quantity, 0), new.price, new.price) "
+        "ON CONFLICT (category) DO UPDATE SET "
+        "products = products + 1, quantity = quantity + excluded.quantity, value = value + excluded.value, "
+        "min_price = MIN(min_price, excluded.min_price), max_price = MAX(max_price, excluded.max_price); END",
+    "category_stats_delete":
+        "CREATE TRIGGER category_stats_delete AFTER DELETE ON supplements BEGIN "
+        "UPDATE category_stats SET "
+        "products = products - 1, quantity = quantity - COALESCE(old.quantity, 0), "
+        "value = value - old.price * COALESCE(old.quantity, 0), "
+        "min_price = CASE WHEN old.price <= min_price "
+        "THEN (SELECT MIN(price) FROM supplements WHERE category IS old.category) ELSE min_price END, "
+        "max_price = CASE WHEN old.price >= max_price "
+        "THEN (SELECT MAX(price) FROM supplements WHERE category IS old.category) ELSE max_price END "
+        "WHERE category = COALESCE(old.category, ''); "
+        "DELETE FROM category_stats WHERE category = COALESCE(old.category, '') AND products <= 0; END",
+    # Stock changes (reservations, restocking) only move quantity and value.
+    "category_stats_update_stock":
+        "CREATE TRIGGER category_stats_update_stock AFTER UPDATE OF quantity ON supplements "
+        "WHEN new.category IS old.category AND new.price = old.price BEGIN "
+        "UPDATE category_stats SET "
+        "quantity = quantity + COALESCE(new.quantity, 0) - COALESCE(old.quantity, 0), "
+        "value = value + new.price * (COALESCE(new.quantity, 0) - COALESCE(old.quantity, 0)) "
+        "WHERE category = COALESCE(new.category, ''); END",
+    # A new category or price is handled as removing the old row and adding the new one.
+    "category_stats_update":
+        "CREATE TRIGGER category_stats_update AFTER UPDATE OF category, price, quantity ON supplements "
+        "WHEN new.category IS NOT old.category OR new.price != old.price BEGIN "
+        "UPDATE category_stats SET "
+        "products = products - 1, quantity = quantity - COALESCE(old.quantity, 0), "
+        "value = value - old.price * COALESCE(old.quantity, 0), "
+        "min_price = (SELECT MIN(price) FROM supplements WHERE category IS old.category), "
+        "max_price = (SELECT MAX(price) FROM supplements WHERE category IS old.category) "
+        "WHERE category = COALESCE(old.category, ''); "
+        "DELETE FROM category_stats WHERE category = COALESCE(old.category, '') AND products <= 0; "
+        "INSERT INTO category_stats (category, products, quantity, value, min_price, max_price) "
+        "VALUES (COALESCE(new.category, ''), 1, COALESCE(new.quantity, 0), "
+        "new.price * COALESCE(new.quantity, 0), new.price, new.price) "
+        "ON CONFLICT (category) DO UPDATE SET "
+        "products = products + 1, quantity = quantity + excluded.quantity, value = value + excluded.value, "
+        "min_price = MIN(min_price, excluded.min_price), max_price = MAX(max_price, excluded.max_price); END",
+}
+
+CATEGORY_STATS_REBUILD = (
+    "DELETE FROM category_stats",
+    "INSERT INTO category_stats (category, products, quantity, value, min_price, max_price) "
+    "SELECT COALESCE(category, ''), COUNT(*), COALESCE(SUM(quantity), 0), "
+    "COALESCE(SUM(price * quantity), 0.0), MIN(price), MAX(price) "
+    "FROM supplements GROUP BY COALESCE(category, '')",
+)
+
+
+class CategoryStats(Base):
+    __tablename__ = 'category_stats'
+
+    category = Column(String, primary_key=True)
+    products = Column(Integer, nullable=False, default=0)
+    quantity = Column(Integer, nullable=False, default=0)
+    value = Column(Float, nullable=False, default=0.0)
+    min_price = Column(Float)
+    max_price = Column(Float)
+
+    def __repr__(self):
+        return f"<CategoryStats(category='{self.category}', products={self.products}, quantity={self.quantity}, value={self.value})>"
+
+    @classmethod
+    def get_all(cls, session):
+        return session.query(cls).order_by(cls.category).all()
+
+    @classmethod
+    def computed(cls, session):
+        """Totals per category aggregated from supplements (a full scan), keyed by category."""
+        category = func.coalesce(Supplement.category, '')
+        rows = session.query(
+            category.label("category"),
+            func.count(Supplement.id).label("products"),
+            func.coalesce(func.sum(Supplement.quantity), 0).label("quantity"),
+            func.coalesce(func.sum(Supplement.price * Supplement.quantity), 0.0).label("value"),
+            func.min(Supplement.price).label("min_price"),
+            func.max(Supplement.price).label("max_price"),
+        ).group_by(category)
+        return {row.category: row for row in rows}
+
+    @classmethod
+    def check(cls, session):
+        """Return (category, column, stored, actual) for every value that differs from a fresh scan."""
+        stored = {row.category: row for row in cls.get_all(session)}
+        actual = cls.computed(session)
+        differences = []
+        for category in sorted(set(stored) | set(actual)):
+            for column in ("products", "quantity", "value", "min_price", "max_price"):
+                have = getattr(stored[category], column) if category in stored else None
+                want = getattr(actual[category], column) if category in actual else None
+                if have is None or want is None:
+                    matches = have == want
+                else:
+                    # value is a running float sum, so allow rounding drift.
+                    matches = abs(have - want) <= 1e-6 * max(1.0, abs(want))
+                if not matches:
+                    differences.append((category, column, have, want))
+        return differences
+
+    @classmethod
+    def rebuild(cls, session, commit=True):
+        """Recompute every row from supplements."""
+        for statement in CATEGORY_STATS_REBUILD:
+            session.execute(text(statement))
+        if commit:
+            session.commit()
+
+
+# The triggers reference category_stats only when they fire, so they can be
+# created along with supplements whichever table create_all makes first.
+for statement in CATEGORY_STATS_TRIGGERS.values():
+    event.listen(Supplement.__table__, "after_create", DDL(statement))
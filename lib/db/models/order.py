@@ -0,0 +1,101 @@
+from db.models import Base, KeysetPagination
+from sqlalchemy.orm import aliased, relationship
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, and_, delete, exists, func, insert, or_, select
+from db.models.cart import Cart
+from db.models.supplement import Supplement
+from db.models.user import User
+
+
+class Order(Base, KeysetPagination):
+    __tablename__ = 'orders'
+
+    id = Column(Integer, primary_key=True)
+    # Orders are kept when their user is deleted; the name is copied in.
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='SET NULL'), index=True)
+    user_name = Column(String)
+    items = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=func.now(), index=True)
+
+    lines = relationship('OrderItem', back_populates='order', passive_deletes=True, order_by='OrderItem.id')
+
+    def __repr__(self):
+        return f"<Order(id={self.id}, user_name={self.user_name}, items={self.items}, total={self.total})>"
+
+    @classmethod
+    def checkout(cls, session, *criteria):
+        """Turn the carts of every user with cart lines matching criteria
+        (e.g. Cart.user_id == 5) into one order each; returns (placed, rejected).
+
+        placed lists (order id, user id). A cart with a line that has no
+        positive quantity is left alone and its user id is listed in
+        rejected. Set-based whatever the number of carts: one INSERT ...
+        SELECT for the orders, one for their lines and one DELETE for the
+        cart. Stock is not touched, since Cart.add already took the units
+        out of Supplement.quantity; checkout only turns that reservation
+        into a sale.
+        """
+        rejected = session.execute(
+            select(Cart.user_id).where(*criteria, or_(Cart.quantity.is_(None), Cart.quantity < 1))
+            .distinct().order_by(Cart.user_id)
+        ).scalars().all()
+        if rejected:
+            bad = aliased(Cart)
+            criteria += (~exists().where(bad.user_id == Cart.user_id, or_(bad.quantity.is_(None), bad.quantity < 1)),)
+
+        price = func.coalesce(Cart.supplement_price, Supplement.price)
+        totals = (
+            select(Cart.user_id, User.name, func.count(Cart.id), func.sum(Cart.quantity),
+                   func.sum(Cart.quantity * price), func.now())
+            .select_from(Cart)
+            .join(User, User.id == Cart.user_id)
+            .join(Supplement, Supplement.id == Cart.supplement_id)
+            .where(*criteria)
+            .group_by(Cart.user_id)
+            .order_by(Cart.user_id)
+        )
+        placed = session.execute(
+            insert(cls)
+            .from_select(["user_id", "user_name", "items", "quantity", "total", "created_at"], totals)
+            .returning(cls.id, cls.user_id)
+        ).all()
+        if not placed:
+            return [], rejected
+
+        # Nothing else can insert orders before this transaction ends, so the
+        # ones from the first new id on are exactly those just placed.
+        first_id = min(order_id for order_id, _ in placed)
+        lines = (
+            select(cls.id, Cart.supplement_id, Supplement.name, price, Cart.quantity)
+            .select_from(Cart)
+            .join(cls, and_(cls.user_id == Cart.user_id, cls.id >= first_id))
+            .join(Supplement, Supplement.id == Cart.supplement_id)
+            .where(*criteria)
+            .order_by(Cart.id)
+        )
+        session.execute(insert(OrderItem).from_select(
+            ["order_id", "supplement_id", "supplement_name", "price", "quantity"], lines))
+        session.execute(delete(Cart).where(*criteria))
+        return [tuple(row) for row in placed], rejected
+
+    @classmethod
+    def find_by_id(cls, session, order_id):
+        return session.query(cls).get(order_id)
+
+
+class OrderItem(Base):
+    __tablename__ = 'order_items'
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey('orders.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Lines are kept when their supplement is deleted; name and price are copied in.
+    supplement_id = Column(Integer, ForeignKey('supplements.id', ondelete='SET NULL'), index=True)
+    supplement_name = Column(String)
+    price = Column(Float, nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+    order = relationship('Order', back_populates='lines')
+
+    def __repr__(self):
+        return f"<OrderItem(order_id={self.order_id}, supplement_name={self.supplement_name}, price={self.price}, quantity={self.quantity})>"
@@ -1,19 +1,76 @@
-from db.models import Base
+import re
+from db.models import Base, KeysetPagination
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import (Column, Integer, String, Float, ForeignKey, DateTime, DDL, Index, MetaData, Table, delete, event, func,
+                        insert, or_, select, text, update)
 
+# Full-text index over name, description and category. supplements_fts is an
+# FTS5 external-content table (it stores only the index; the text stays in
+# supplements) kept in sync by triggers. The update trigger only fires for
+# the indexed columns, so stock changes do not touch the index.
+SEARCH_TABLE_DDL = (
+    "CREATE VIRTUAL TABLE supplements_fts USING fts5("
+    "name, description, category, content='supplements', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+SEARCH_TRIGGERS = {
+    "supplements_fts_insert":
+        "CREATE TRIGGER supplements_fts_insert AFTER INSERT ON supplements BEGIN "
+        "INSERT INTO supplements_fts (rowid, name, description, category) "
+        "VALUES (new.id, new.name, new.description, new.category); END",
+    "supplements_fts_delete":
+        "CREATE TRIGGER supplements_fts_delete AFTER DELETE ON supplements BEGIN "
+        "INSERT INTO supplements_fts (supplements_fts, rowid, name, description, category) "
+        "VALUES ('delete', old.id, old.name, old.description, old.category); END",
+    "supplements_fts_update":
+        "CREATE TRIGGER supplements_fts_update AFTER UPDATE OF name, description, category ON supplements BEGIN "
+        "INSERT INTO supplements_fts (supplements_fts, rowid, name, description, category) "
+        "VALUES ('delete', old.id, old.name, old.description, old.category); "
+        "INSERT INTO supplements_fts (rowid, name, description, category) "
+        "VALUES (new.id, new.name, new.description, new.category); END",
+}
+SEARCH_REBUILD = "INSERT INTO supplements_fts (supplements_fts) VALUES ('rebuild')"
 
-class Supplement(Base):
+SEARCH_QUERY = text(
+    # Rank inside the FTS table and join only the requested page, instead of
+    # joining every match before sorting. bm25 weights are for name,
+    # description and category: name hits rank highest.
+    "SELECT supplements.* FROM ("
+    "SELECT rowid, bm25(supplements_fts, 10.0, 1.0, 4.0) AS score FROM supplements_fts "
+    "WHERE supplements_fts MATCH :match ORDER BY score, rowid LIMIT :limit OFFSET :offset"
+    ") AS hits JOIN supplements ON supplements.id = hits.rowid "
+    "ORDER BY hits.score, hits.rowid"
+)
+
+# Per-connection scratch table for Supplement.reprice_from: the new prices
+# are loaded into it with one executemany and joined in UPDATE ... FROM.
+reprice_prices = Table(
+    "reprice_prices", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("price", Float, nullable=False),
+    prefixes=["TEMPORARY"],
+)
+
+
+class Supplement(Base, KeysetPagination):
     __tablename__ = 'supplements'
+    __table_args__ = (
+        # Category filters, and the min/max price lookups of category_stats.
+        Index('ix_supplements_category_price', 'category', 'price'),
+    )
 
     id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     description = Column(String)
     price = Column(Float, nullable=False)
     quantity = Column(Integer, default=0)
     category = Column(String)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)
 
-    cart_items = relationship('Cart', back_populates='supplement', foreign_keys='Cart.supplement_id')
+    # The database deletes a supplement's cart lines (ON DELETE CASCADE); lines
+    # already loaded are deleted by the ORM rather than having supplement_id nulled.
+    cart_items = relationship('Cart', back_populates='supplement', foreign_keys='Cart.supplement_id',
+                              cascade="all", passive_deletes=True)
 
     def __repr__(self):
         return f"<Supplement(name='{self.name}', description={self.description}, price={self.price}, quantity={self.quantity}, category={self.category})>"
@@ -24,23 +81,151 @@ class Supplement(Base):
 
     # ORM Methods
     @classmethod
-    def create(cls, session, name, description, price, quantity, category):
+    def create(cls, session, name, description, price, quantity, category, commit=True):
         supplement = cls(
             name=name, description=description, price=price, quantity=quantity, category=category
         )
         session.add(supplement)
-        session.commit()
+        if commit:
+            session.commit()
+        else:
+            session.flush()
         return supplement
 
     @classmethod
-    def delete(cls, session, supplement_id):
+    def delete(cls, session, supplement_id, commit=True):
         supplement = session.query(cls).get(supplement_id)
         if supplement:
             session.delete(supplement)
-            session.commit()
+            if commit:
+                session.commit()
+            else:
+                session.flush()
         else:
             raise ValueError("Supplement not found.")
 
+    @classmethod
+    def filters(cls, category=None, below_price=None, out_of_stock=False):
+        """WHERE clauses for delete_where: in category, priced under below_price,
+        and/or with no units left (all given ones must match)."""
+        criteria = []
+        if category is not None:
+            criteria.append(cls.category == category)
+        if below_price is not None:
+            criteria.append(cls.price < below_price)
+        if out_of_stock:
+            criteria.append(or_(cls.quantity.is_(None), cls.quantity <= 0))
+        return criteria
+
+    @classmethod
+    def delete_where(cls, session, *criteria, commit=True):
+        """Delete every supplement matching criteria with one DELETE; returns the count.
+
+        Their cart lines cascade in the database, and the search index and
+        category_stats triggers fire per row as for any delete.
+        """
+        if not criteria:
+            raise ValueError("Refusing to delete every supplement; give at least one filter.")
+        deleted = session.execute(delete(cls).where(*criteria)).rowcount
+        if commit:
+            session.commit()
+        return deleted
+
+    @classmethod
+    def reserve(cls, session, supplement_id, quantity):
+        """Take quantity units out of stock; False (and no change) if fewer are left.
+
+        The stock check and the decrement are one conditional UPDATE, so
+        concurrent reservations can never oversell. Run it inside a write
+        transaction (see db.database.run_immediate) together with the cart
+        change it pays for. A quantity below 1 raises ValueError.
+        """
+        if quantity < 1:
+            raise ValueError(f"Quantity must be a positive integer, got {quantity}.")
+        result = session.execute(
+            update(cls)
+            .where(cls.id == supplement_id, cls.quantity >= quantity)
+            .values(quantity=cls.quantity - quantity)
+        )
+        return result.rowcount == 1
+
+    @classmethod
+    def release(cls, session, supplement_id, quantity):
+        """Put reserved units back in stock."""
+        session.execute(
+            update(cls).where(cls.id == supplement_id).values(quantity=cls.quantity + quantity)
+        )
+
+    @classmethod
+    def reprice(cls, session, category=None, price=None, percent=None):
+        """Set every supplement's price (or only category's) to price, or
+        change it by percent (rounded to cents); returns (supplements
+        changed, cart lines changed).
+
+        One UPDATE for the supplements and one UPDATE ... FROM bringing their
+        cart lines' copied price and name up to date, in the caller's
+        transaction. Rows already at the new price are not rewritten.
+        """
+        from db.models.cart import Cart
+
+        if (price is None) == (percent is None):
+            raise ValueError("Give either a price or a percent.")
+        new_price = price if price is not None else func.round(cls.price * (1 + percent / 100.0), 2)
+        criteria = [cls.category == category] if category is not None else []
+        changed = session.execute(
+            update(cls).where(*criteria, cls.price.is_distinct_from(new_price)).values(price=new_price),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        return changed, Cart.refresh_prices(session, *criteria)
+
+    @classmethod
+    def reprice_from(cls, session, prices):
+        """Set the price of each supplement id in prices ((id, price) pairs;
+        the last one wins for a repeated id); returns (supplements changed,
+        ids not found, cart lines changed).
+
+        The pairs go into the reprice_prices temporary table, and two
+        UPDATE ... FROM statements join it to the supplements and their cart
+        lines, however many there are.
+        """
+        from db.models.cart import Cart
+
+        if not prices:
+            return 0, 0, 0
+        # Created inside the transaction, so a rollback drops it too.
+        connection = session.connection()
+        reprice_prices.create(connection)
+        connection.execute(insert(reprice_prices).prefix_with("OR REPLACE"),
+                           [{"id": supplement_id, "price": price} for supplement_id, price in prices])
+        changed = session.execute(
+            update(cls)
+            .where(cls.id == reprice_prices.c.id, cls.price.is_distinct_from(reprice_prices.c.price))
+            .values(price=reprice_prices.c.price),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        missing = session.execute(
+            select(func.count()).select_from(reprice_prices)
+            .where(reprice_prices.c.id.not_in(select(cls.id)))
+        ).scalar()
+        lines = Cart.refresh_prices(session, cls.id.in_(select(reprice_prices.c.id)))
+        reprice_prices.drop(connection)
+        return changed, missing, lines
+
+    @classmethod
+    def search(cls, session, query, limit=20, offset=0):
+        """Best matches first for supplements whose name, description or category
+        contain every word of query (each word also matches as a prefix)."""
+        words = re.findall(r"\w+", query)
+        if not words:
+            return []
+        match = " ".join(f'"{word}"*' for word in words)
+        return (
+            session.query(cls)
+            .from_statement(SEARCH_QUERY)
+            .params(match=match, limit=limit, offset=offset)
+            .all()
+        )
+
     @classmethod
     def get_all(cls, session):
         return session.query(cls).all()
@@ -52,6 +237,7 @@ class Supplement(Base):
     @classmethod
     def find_by_name(cls, session, name):
         return session.query(cls).filter(cls.name == name).first()
-    
 
 
+for statement in (SEARCH_TABLE_DDL, *SEARCH_TRIGGERS.values()):
+    event.listen(Supplement.__table__, "after_create", DDL(statement))
@@ -1,33 +1,48 @@
-from db.models import Base
+from db.models import Base, KeysetPagination
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, func
 
 
-class User(Base):
+class User(Base, KeysetPagination):
     __tablename__ = 'users'
 
     id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     email = Column(String, nullable=False, unique=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)
 
-    carts = relationship('Cart', back_populates='user', foreign_keys="[Cart.user_id]")
+    # The database deletes a user's cart lines (ON DELETE CASCADE); lines
+    # already loaded are deleted by the ORM rather than having user_id nulled.
+    carts = relationship('Cart', back_populates='user', foreign_keys="[Cart.user_id]",
+                         cascade="all", passive_deletes=True)
 
     def __repr__(self):
         return f"<User(name='{self.name}', email='{self.email}')>"
     
     @classmethod
-    def create(cls, session, name, email):
+    def create(cls, session, name, email, commit=True):
         user = cls(name=name, email=email)
         session.add(user)
-        session.commit()
+        if commit:
+            session.commit()
+        else:
+            session.flush()
         return user
 
     @classmethod
-    def delete(cls, session, user_id):
+    def delete(cls, session, user_id, commit=True):
+        """Delete a user; their cart's units go back to stock and the lines
+        themselves cascade with the user."""
+        from db.models.cart import Cart
+
         user = session.query(cls).get(user_id)
         if user:
+            Cart.release_where(session, Cart.user_id == user_id)
             session.delete(user)
-            session.commit()
+            if commit:
+                session.commit()
+            else:
+                session.flush()
         else:
             raise ValueError("User not found.")
 
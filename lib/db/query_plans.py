@@ -0,0 +1,69 @@
+import os
+import sys
+import click
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from db.models import Base
+from db.models.supplement import Supplement
+from db.models.user import User
+from db.models.cart import Cart
+
+
+default_db_path = os.path.join(os.path.dirname(__file__), 'nutrifit.db')
+
+
+def cli_queries(session):
+    """The lookups issued by cli.py, keyed by a short description."""
+    return {
+        "supplement by id": session.query(Supplement).filter_by(id=1),
+        "supplement by name": session.query(Supplement).filter_by(name="Whey Pro"),
+        "user by id": session.query(User).filter_by(id=1),
+        "user by name": session.query(User).filter_by(name="Jane Doe"),
+        "cart by user and supplement": session.query(Cart).filter_by(user_id=1, supplement_id=1),
+        "cart by user (User.carts)": session.query(Cart).filter_by(user_id=1),
+        "cart by supplement (Supplement.cart_items)": session.query(Cart).filter_by(supplement_id=1),
+    }
+
+
+def explain(session, query):
+    """Return the EXPLAIN QUERY PLAN detail lines for a query."""
+    sql = str(query.statement.compile(
+        dialect=session.bind.dialect, compile_kwargs={"literal_binds": True}
+    ))
+    rows = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return [row[-1] for row in rows]
+
+
+def is_scan(detail):
+    return detail.startswith("SCAN ")
+
+
+@click.command()
+@click.option('--db', 'db_path', default=default_db_path, show_default=True, help="SQLite database to check.")
+@click.option('--fresh', is_flag=True, help="Check a throwaway in-memory schema built from the models instead.")
+def main(db_path, fresh):
+    """Fail if any of the CLI's lookups falls back to a table scan."""
+    url = 'sqlite://' if fresh else f'sqlite:///{db_path}'
+    engine = create_engine(url)
+    if fresh:
+        Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    failures = 0
+    for name, query in cli_queries(session).items():
+        details = explain(session, query)
+        scans = [detail for detail in details if is_scan(detail)]
+        status = "SCAN" if scans else "ok"
+        click.echo(f"[{status:>4}] {name}: {'; '.join(details)}")
+        failures += bool(scans)
+
+    session.close()
+    if failures:
+        click.echo(f"{failures} quer(ies) fall back to a full scan. Run 'alembic upgrade head' and re-check.")
+        sys.exit(1)
+    click.echo("All lookups use an index.")
+
+
+if __name__ == "__main__":
+    main()
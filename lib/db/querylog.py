@@ -0,0 +1,120 @@
+"""Per-statement timing from SQLAlchemy's cursor execute events.
+
+A QueryLog attached to an engine times every statement the engine runs. For
+each one it records the duration, the rows written and the call site, which
+is the innermost frame in this project's code. It then:
+
+  * appends statements slower than slow_ms to a slow-query log, one JSON
+    object per line: {"at", "ms", "rows", "site", "statement"};
+  * with summary=True, aggregates calls, total and max time per (statement,
+    call site) for report().
+
+db.database attaches one when --profile / --slow-query-ms (or
+$NUTRIFIT_SLOW_QUERY_MS) is given; otherwise no listener is installed and
+queries pay nothing.
+
+rows is the DBAPI rowcount. SQLite only knows it for INSERT/UPDATE/DELETE,
+so it is None for SELECTs, whose rows have not been fetched yet when the
+event fires. For the same reason the time covers executing the statement
+(for SQLite: up to the first row), not fetching the rest of a large result.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+LIB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+THIS_FILE = os.path.abspath(__file__)
+
+
+class QueryLog:
+    def __init__(self, slow_ms=None, slow_log=None, summary=False):
+        self.slow_ms = slow_ms
+        self.summary = summary
+        self.count = 0
+        self.total = 0.0
+        self.slow = 0
+        # (statement, call site) -> [calls, total seconds, max seconds, rows]
+        self.statements = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._slow_out = None
+        if slow_ms is not None:
+            self._slow_out = open(slow_log, "a", encoding="utf-8") if slow_log and slow_log != "-" else sys.stderr
+
+    def attach(self, engine):
+        from sqlalchemy import event
+
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def close(self):
+        if self._slow_out not in (None, sys.stderr):
+            self._slow_out.close()
+
+    @staticmethod
+    def call_site():
+        """file:line function of the innermost caller in this project's code."""
+        frame = sys._getframe(2)
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            # Skip generated code ("<string>", ...), which abspath would place in the cwd.
+            if not filename.startswith("<"):
+                filename = os.path.abspath(filename)
+            if filename.startswith(LIB_DIR) and filename != THIS_FILE:
+                return f"{filename[len(LIB_DIR):]}:{frame.f_lineno} {frame.f_code.co_name}"
+            frame = frame.f_back
+        return "?"
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        slow = self.slow_ms is not None and elapsed * 1000 >= self.slow_ms
+        if not (slow or self.summary):
+            with self._lock:
+                self.count += 1
+                self.total += elapsed
+            return
+        rows = cursor.rowcount if cursor.rowcount >= 0 else None
+        site = self.call_site()
+        statement = " ".join(statement.split())
+        with self._lock:
+            self.count += 1
+            self.total += elapsed
+            if self.summary:
+                entry = self.statements.setdefault((statement, site), [0, 0.0, 0.0, None])
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] = max(entry[2], elapsed)
+                if rows is not None:
+                    entry[3] = (entry[3] or 0) + rows
+            if slow:
+                self.slow += 1
+                self._slow_out.write(json.dumps({
+                    "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "ms": round(elapsed * 1000, 3),
+                    "rows": rows,
+                    "site": site,
+                    "statement": statement,
+                }) + "\n")
+                self._slow_out.flush()
+
+    def report(self, top=10):
+        """Lines summarizing the queries run so far, the most expensive statements first."""
+        wall = time.perf_counter() - self.started
+        lines = [
+            f"Queries: {self.count}, DB time {self.total * 1000:,.1f} ms "
+            f"({self.total / wall:.0%} of {wall * 1000:,.1f} ms wall)"
+            + (f", {self.slow} slow (>= {self.slow_ms:g} ms)" if self.slow_ms is not None else "")
+        ]
+        hottest = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        if hottest:
+            lines.append(f"{'calls':>7} {'total ms':>10} {'max ms':>9} {'rows':>7}  call site / statement")
+        for (statement, site), (calls, total, longest, rows) in hottest:
+            rows = "-" if rows is None else str(rows)
+            lines.append(f"{calls:>7} {total * 1000:>10.2f} {longest * 1000:>9.2f} {rows:>7}  {site}")
+            lines.append(f"{'':>37}{statement[:100]}{'...' if len(statement) > 100 else ''}")
+        return lines
@@ -0,0 +1,30 @@
+"""Resolves "ID or Name" identifiers to User/Supplement rows.
+
+Every CLI path, batch op, the HTTP server and the async API look users and
+supplements up through resolve(), so an all-digit identifier is always an
+id and anything else a name. Both are one indexed query. There is no
+cache: each HTTP request, daemon invocation and batch chunk starts with a
+fresh session, so a cached name -> id would still need a query to load or
+check the row, and trusting it unchecked could hand back a row another
+process has since renamed or deleted.
+"""
+
+# SQLite's largest INTEGER; a bigger Python int cannot even be bound.
+MAX_ID = 2**63 - 1
+
+
+def to_id(identifier):
+    """identifier as a row id, or None if it is not all digits or too large for SQLite."""
+    identifier = str(identifier).strip()
+    if identifier.isdigit() and int(identifier) <= MAX_ID:
+        return int(identifier)
+    return None
+
+
+def resolve(session, model, identifier):
+    """Return the row whose id (all digits) or name is identifier, or None."""
+    identifier = str(identifier).strip()
+    if identifier.isdigit():
+        row_id = to_id(identifier)
+        return None if row_id is None else session.get(model, row_id)
+    return session.query(model).filter_by(name=identifier).first()
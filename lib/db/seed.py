@@ -1,97 +1,299 @@
-from db.models import Base
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from faker import Faker
-import random
+import bisect
+import json
 import os
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+from multiprocessing import Pool
 
+import click
+from faker.providers.lorem.en_US import Provider as LoremProvider
+from faker.providers.person.en_US import Provider as PersonProvider
+from sqlalchemy import delete, func, insert, select, text
 
-from db.models.supplement import Supplement
+from db.database import PROFILES, configure, get_engine, query_log
+from db.models.supplement import SEARCH_REBUILD, SEARCH_TRIGGERS, Supplement
+from db.models.category_stats import CATEGORY_STATS_REBUILD, CATEGORY_STATS_TRIGGERS
 from db.models.user import User
 from db.models.cart import Cart
+from db.models.order import Order, OrderItem
 
-fake = Faker()
-
-db_path = os.path.join(os.path.dirname(__file__), 'nutrifit.db')
-engine = create_engine(f'sqlite:///{db_path}', echo=True)
-Base.metadata.create_all(engine)
-
-Session = sessionmaker(bind=engine)
-session = Session()
-
-def seed_supplements(n=10):
-    categories = ["Protein", "Vitamins", "Performance", "Energy", "Recovery"]
-    supplements = []
-    for _ in range(n):
-        supplement = Supplement(
-            name=fake.unique.word().capitalize() + " " + random.choice(["Boost", "Max", "Pro", "Flex", "Ultra"]),
-            description=fake.sentence(nb_words=10),
-            price=round(random.uniform(10.0, 100.0), 2),
-            quantity=random.randint(10, 200),
-            category=random.choice(categories)
-        )
-        supplements.append(supplement)
-    session.add_all(supplements)
-    print(f"Seeded {n} supplements.")
-
-def seed_users(n=5):
-    users = []
-    for _ in range(n):
-        user = User(
-            name=fake.name(),
-            email=fake.unique.email()
-        )
-        users.append(user)
-    session.add_all(users)
-    print(f"Seeded {n} users.")
-
-def seed_cart_entries(n=5):
-    users = session.query(User).all()
-    supplements = session.query(Supplement).all()
-
-    if not users or not supplements:
-        print("Ensure that users and supplements are seeded before adding cart entries.")
-        return
-
-    cart_entries = []
-    for _ in range(n):
-        user = random.choice(users)
-        supplement = random.choice(supplements)
-
-        # Ensure both user and supplement are valid
-        if not user or not supplement:
-            continue
-
-        entry = Cart(
-            user_name=user.name,
-            supplement_name=supplement.id,
-            user_id=user.id,
-            supplement_id=supplement.id,
-            quantity=random.randint(1, 5)
-        )
-        cart_entries.append(entry)
-
-    session.add_all(cart_entries)
-    session.commit()  
-    print(f"Seeded {n} cart entries.")
-
-
-def main():
-    session.query(Cart).delete()
-    session.query(User).delete()
-    session.query(Supplement).delete()
-    session.commit()
-
-    seed_supplements(10)
-    seed_users(5)
-    seed_cart_entries(5)
-
-    session.commit()
-    print("Database seeding completed successfully!")
+# Word lists are taken from Faker's providers once and sampled with a seeded
+# random.Random, which is both reproducible and far faster than calling the
+# Faker generators per row.
+WORDS = list(LoremProvider.word_list)
+FIRST_NAMES = list(PersonProvider.first_names)
+LAST_NAMES = list(PersonProvider.last_names)
+CATEGORIES = ["Protein", "Vitamins", "Performance", "Energy", "Recovery"]
+SUFFIXES = ["Boost", "Max", "Pro", "Flex", "Ultra"]
 
-if __name__ == "__main__":
-    main()
-    
+CART_INSERT = text(
+    "INSERT INTO cart (user_name, supplement_name, supplement_price, quantity, user_id, supplement_id, updated_at) "
+    "SELECT users.name, supplements.name, supplements.price, :quantity, users.id, supplements.id, CURRENT_TIMESTAMP "
+    "FROM users, supplements WHERE users.id = :user_id AND supplements.id = :supplement_id "
+    "ON CONFLICT (user_id, supplement_id) DO UPDATE SET quantity = quantity + excluded.quantity"
+)
+# Cart lines reserve their units like Cart.add does (checkout and clearing a
+# cart rely on it): one UPDATE ... FROM takes each supplement's total for the
+# batch (a JSON object of supplement id -> units) out of stock, and returns the
+# supplements that had enough. Lines of the others are skipped.
+RESERVE_STOCK = text(
+    "UPDATE supplements SET quantity = supplements.quantity - demand.quantity "
+    "FROM (SELECT CAST(key AS INTEGER) AS supplement_id, value AS quantity FROM json_each(:demand)) AS demand "
+    "WHERE supplements.id = demand.supplement_id AND supplements.quantity >= demand.quantity "
+    "RETURNING supplements.id"
+)
+
+
+def chunk_rng(seed, kind, start):
+    """Each chunk gets its own RNG so workers produce the same rows in any order."""
+    return random.Random(f"{seed}:{kind}:{start}")
+
+
+def generate_supplements(seed, first_id, count):
+    rng = chunk_rng(seed, "supplements", first_id)
+    rows = []
+    for supplement_id in range(first_id, first_id + count):
+        rows.append({
+            "id": supplement_id,
+            "name": f"{rng.choice(WORDS).capitalize()} {rng.choice(SUFFIXES)} {supplement_id}",
+            "description": " ".join(rng.choices(WORDS, k=10)).capitalize() + ".",
+            "price": round(rng.uniform(10.0, 100.0), 2),
+            "quantity": rng.randint(10, 200),
+            "category": rng.choice(CATEGORIES),
+        })
+    return rows
+
+
+def generate_users(seed, first_id, count):
+    rng = chunk_rng(seed, "users", first_id)
+    rows = []
+    for user_id in range(first_id, first_id + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        rows.append({
+            "id": user_id,
+            "name": f"{first} {last}",
+            "email": f"{first}.{last}.{user_id}@example.com".lower(),
+        })
+    return rows
+
+
+def run_offsets(runs):
+    offsets, total = [], 0
+    for first, last in runs:
+        offsets.append(total)
+        total += last - first + 1
+    return offsets, total
+
+
+def pick_id(rng, runs, offsets, total):
+    """Pick an existing id uniformly from contiguous (first, last) id runs."""
+    position = rng.randrange(total)
+    index = bisect.bisect_right(offsets, position) - 1
+    return runs[index][0] + position - offsets[index]
+
+
+def generate_cart(seed, first_index, count, user_runs, supplement_runs):
+    rng = chunk_rng(seed, "cart", first_index)
+    user_offsets, user_total = run_offsets(user_runs)
+    supplement_offsets, supplement_total = run_offsets(supplement_runs)
+    return [
+        {
+            "user_id": pick_id(rng, user_runs, user_offsets, user_total),
+            "supplement_id": pick_id(rng, supplement_runs, supplement_offsets, supplement_total),
+            "quantity": rng.randint(1, 5),
+        }
+        for _ in range(count)
+    ]
+
+
+GENERATORS = {
+    "supplements": generate_supplements,
+    "users": generate_users,
+    "cart": generate_cart,
+}
+
+
+def generate_chunk(task):
+    kind, args = task
+    return GENERATORS[kind](*args)
+
+
+def id_runs(conn, table):
+    """Contiguous (first_id, last_id) runs of the ids present in table."""
+    return [tuple(row) for row in conn.execute(text(
+        f"SELECT MIN(id), MAX(id) FROM "
+        f"(SELECT id, id - ROW_NUMBER() OVER (ORDER BY id) AS grp FROM {table}) "
+        f"GROUP BY grp ORDER BY 1"
+    ))]
+
+
+def next_id(conn, table):
+    return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def chunks(total, batch_size):
+    for start in range(0, total, batch_size):
+        yield start, min(batch_size, total - start)
 
 
+def run_phase(label, mapper, tasks, write, count=None):
+    """Generate chunks through mapper (in order) and write each one as it arrives.
 
+    count, if given, returns the number of rows in the target table, and the
+    phase reports how many it added (rows merged into existing ones do not
+    count); otherwise every generated row counts.
+    """
+    started = time.perf_counter()
+    before = count() if count else 0
+    total = 0
+    for rows in mapper(generate_chunk, tasks):
+        write(rows)
+        total += len(rows)
+    if count:
+        total = count() - before
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed else 0.0
+    click.echo(f"Seeded {total} {label} in {elapsed:.2f}s ({rate:,.0f} rows/sec).")
+    return total
+
+
+def insert_rows(engine, statement):
+    def write(rows):
+        with engine.begin() as conn:
+            conn.execute(statement, rows)
+    return write
+
+
+def insert_cart(engine):
+    """Like insert_rows(engine, CART_INSERT), but the batch first takes its units out of stock."""
+    def write(rows):
+        demand = Counter()
+        for row in rows:
+            demand[row["supplement_id"]] += row["quantity"]
+        with engine.begin() as conn:
+            reserved = set(conn.execute(RESERVE_STOCK, {"demand": json.dumps(demand)}).scalars())
+            rows = [row for row in rows if row["supplement_id"] in reserved]
+            if rows:
+                conn.execute(CART_INSERT, rows)
+    return write
+
+
+def count_rows(engine, table):
+    def count():
+        with engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(table)).scalar()
+    return count
+
+
+def reset(engine):
+    with engine.begin() as conn:
+        for model in (OrderItem, Order, Cart, User, Supplement):
+            conn.execute(delete(model.__table__))
+
+
+# Tables kept up to date by triggers on supplements: (triggers, statements
+# that rebuild the table from scratch).
+DERIVED_TABLES = (
+    (SEARCH_TRIGGERS, (SEARCH_REBUILD,)),
+    (CATEGORY_STATS_TRIGGERS, CATEGORY_STATS_REBUILD),
+)
+
+
+@contextmanager
+def derived_tables_deferred(engine):
+    """Drop the triggers behind the search index and category stats while seeding,
+    and rebuild those tables once at the end.
+
+    One rebuild is several times faster than maintaining them row by row.
+    """
+    with engine.begin() as conn:
+        existing = {name for name, in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+        deferred = [(triggers, rebuild) for triggers, rebuild in DERIVED_TABLES if set(triggers) <= existing]
+        for triggers, _ in deferred:
+            for name in triggers:
+                conn.exec_driver_sql(f"DROP TRIGGER {name}")
+    try:
+        yield
+    finally:
+        with engine.begin() as conn:
+            for triggers, rebuild in deferred:
+                for statement in triggers.values():
+                    conn.exec_driver_sql(statement)
+                for statement in rebuild:
+                    conn.exec_driver_sql(statement)
+
+
+def seed_database(engine, n_supplements=10, n_users=5, n_cart=5, seed=42, workers=1, batch_size=10000, reset_data=True):
+    """Generate and insert the dataset; returns the number of rows written."""
+    started = time.perf_counter()
+    total = 0
+    with derived_tables_deferred(engine):
+        if reset_data:
+            reset(engine)
+
+        pool = Pool(workers) if workers > 1 else None
+        mapper = pool.imap if pool else map
+        try:
+            with engine.connect() as conn:
+                first_supplement_id = next_id(conn, Supplement.__table__)
+                first_user_id = next_id(conn, User.__table__)
+
+            total += run_phase(
+                "supplements", mapper,
+                [("supplements", (seed, first_supplement_id + start, count)) for start, count in chunks(n_supplements, batch_size)],
+                insert_rows(engine, insert(Supplement.__table__)),
+            )
+            total += run_phase(
+                "users", mapper,
+                [("users", (seed, first_user_id + start, count)) for start, count in chunks(n_users, batch_size)],
+                insert_rows(engine, insert(User.__table__)),
+            )
+
+            if n_cart:
+                with engine.connect() as conn:
+                    user_runs = id_runs(conn, User.__tablename__)
+                    supplement_runs = id_runs(conn, Supplement.__tablename__)
+                if not user_runs or not supplement_runs:
+                    click.echo("Ensure that users and supplements are seeded before adding cart entries.")
+                else:
+                    total += run_phase(
+                        "cart entries", mapper,
+                        [("cart", (seed, start, count, user_runs, supplement_runs)) for start, count in chunks(n_cart, batch_size)],
+                        insert_cart(engine), count_rows(engine, Cart.__table__),
+                    )
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed else 0.0
+    click.echo(f"Database seeding completed successfully! {total} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec).")
+    return total
+
+
+@click.command()
+@click.option('--db', 'db_path', type=click.Path(dir_okay=False), help="SQLite database file (default: $NUTRIFIT_DB or db/nutrifit.db).")
+@click.option('--supplements', 'n_supplements', type=click.IntRange(min=0), default=10, show_default=True, help="Supplements to generate.")
+@click.option('--users', 'n_users', type=click.IntRange(min=0), default=5, show_default=True, help="Users to generate.")
+@click.option('--cart', 'n_cart', type=click.IntRange(min=0), default=5, show_default=True, help="Cart entries to generate.")
+@click.option('--seed', type=int, default=42, show_default=True, help="Random seed; the same seed and sizes give the same dataset.")
+@click.option('--workers', type=click.IntRange(min=1), default=os.cpu_count() or 1, show_default=True, help="Generator processes.")
+@click.option('--batch-size', type=click.IntRange(min=1), default=10000, show_default=True, help="Rows per chunk and per insert transaction.")
+@click.option('--reset/--append', 'reset_data', default=True, show_default=True, help="Delete existing data first, or add to it.")
+@click.option('--db-profile', type=click.Choice(sorted(PROFILES)), default="bulk-load", show_default=True, help="SQLite connection profile.")
+@click.option('--profile', 'timing', is_flag=True, help="Print query count, DB time and the slowest statements when done.")
+def main(db_path, n_supplements, n_users, n_cart, seed, workers, batch_size, reset_data, db_profile, timing):
+    """Seed the database with a reproducible synthetic dataset."""
+    configure(db_path=db_path, profile=db_profile, timing=timing)
+    seed_database(get_engine(), n_supplements, n_users, n_cart, seed, workers, batch_size, reset_data)
+    if timing:
+        click.echo("\n--- Query Profile ---")
+        for line in query_log().report():
+            click.echo(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""JSON over HTTP for the supplement, user and cart operations.
+
+Run it with python cli.py serve. Every request gets a session of its own
+from the shared, pooled engine, so requests served by different threads read
+in parallel (WAL lets readers run alongside the single writer). Writes go
+through the same model classmethods as the CLI, in BEGIN IMMEDIATE
+transactions.
+
+    GET    /supplements?after_id=&limit=   catalog page, id order
+    GET    /supplements/<id or name>
+    POST   /supplements                    {"name", "description", "price", "quantity", "category"}
+    DELETE /supplements/<id or name>
+    GET    /search?q=&limit=&offset=       full-text search, best matches first
+    GET    /users?after_id=&limit=
+    GET    /users/<id or name>
+    POST   /users                          {"name", "email"}
+    DELETE /users/<id or name>
+    GET    /cart?after_id=&limit=
+    POST   /cart                           {"user", "supplement", "qty"}: reserves stock
+    DELETE /cart/<id>                      puts the units back in stock
+    GET    /category-stats
+
+Errors come back as {"error": message} with a 4xx/5xx status.
+"""
+import json
+import re
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from db.batch import lookup, positive_quantity
+from db.database import is_busy, new_session, run_immediate
+from db.importer import validate_supplement, validate_user
+from db.models.cart import Cart
+from db.models.category_stats import CategoryStats
+from db.models.supplement import Supplement
+from db.models.user import User
+from db import resolver
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 1000
+
+# SQLite runs one writer at a time anyway; request threads queue for it here
+# instead of polling in SQLite's busy handler, whose sleeps (up to 100 ms)
+# would otherwise dominate write latency under load.
+_write_lock = threading.Lock()
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def to_dict(row):
+    return {column.name: getattr(row, column.name) for column in row.__table__.columns}
+
+
+def int_param(query, name, default=None, minimum=0, maximum=resolver.MAX_ID):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise HTTPError(400, f"'{name}' must be an integer, got {values[0]!r}")
+    if value < minimum:
+        raise HTTPError(400, f"'{name}' must be at least {minimum}")
+    if value > maximum:
+        raise HTTPError(400, f"'{name}' must be at most {maximum}")
+    return value
+
+
+def page(model, session, query):
+    limit = int_param(query, "limit", DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+    rows = model.stream(session, after_id=int_param(query, "after_id"), limit=limit)
+    return [to_dict(row) for row in rows]
+
+
+def resolve(session, model, identifier):
+    row = resolver.resolve(session, model, unquote(identifier))
+    if row is None:
+        raise HTTPError(404, f"no {model.__name__.lower()} with identifier {unquote(identifier)!r}")
+    return row
+
+
+def immediate(session, work):
+    """run_immediate, one request thread at a time."""
+    with _write_lock:
+        return run_immediate(session, work)
+
+
+def write(session, work):
+    """Run work() in BEGIN IMMEDIATE, turning model errors into HTTP errors."""
+    try:
+        return immediate(session, work)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    except IntegrityError as e:
+        raise HTTPError(409, str(e.orig))
+
+
+# Handlers: (session, path match, query string dict, JSON body) -> (status, payload)
+
+def list_supplements(session, match, query, body):
+    return 200, page(Supplement, session, query)
+
+
+def get_supplement(session, match, query, body):
+    return 200, to_dict(resolve(session, Supplement, match["key"]))
+
+
+def create_supplement(session, match, query, body):
+    fields = validate_supplement(body)
+    supplement = write(session, lambda: Supplement.create(session, commit=False, **fields))
+    return 201, to_dict(supplement)
+
+
+def delete_supplement(session, match, query, body):
+    supplement_id = resolve(session, Supplement, match["key"]).id
+    write(session, lambda: Supplement.delete(session, supplement_id, commit=False))
+    return 200, {"deleted": supplement_id}
+
+
+def search_supplements(session, match, query, body):
+    limit = int_param(query, "limit", DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+    offset = int_param(query, "offset", 0)
+    words = " ".join(query.get("q", []))
+    return 200, [to_dict(row) for row in Supplement.search(session, words, limit=limit, offset=offset)]
+
+
+def list_users(session, match, query, body):
+    return 200, page(User, session, query)
+
+
+def get_user(session, match, query, body):
+    return 200, to_dict(resolve(session, User, match["key"]))
+
+
+def create_user(session, match, query, body):
+    fields = validate_user(body)
+    user = write(session, lambda: User.create(session, commit=False, **fields))
+    return 201, to_dict(user)
+
+
+def delete_user(session, match, query, body):
+    user_id = resolve(session, User, match["key"]).id
+    write(session, lambda: User.delete(session, user_id, commit=False))
+    return 200, {"deleted": user_id}
+
+
+def list_cart(session, match, query, body):
+    return 200, page(Cart, session, query)
+
+
+def add_to_cart(session, match, query, body):
+    quantity = positive_quantity(body)
+    try:
+        user = lookup(session, User, body, "user")
+        supplement = lookup(session, Supplement, body, "supplement")
+    except ValueError as e:
+        raise HTTPError(404, str(e))
+    try:
+        cart_id = immediate(session, lambda: Cart.add(session, user, supplement, quantity, commit=False))
+    except ValueError as e:
+        # Not enough stock left: a conflict with the current state.
+        raise HTTPError(409, str(e))
+    return 201, {"id": cart_id}
+
+
+def delete_cart_item(session, match, query, body):
+    cart_id = resolver.to_id(match["key"])
+    if cart_id is None:
+        raise HTTPError(404, f"no cart item with id {match['key']}")
+    try:
+        immediate(session, lambda: Cart.delete(session, cart_id, commit=False))
+    except ValueError as e:
+        raise HTTPError(404, str(e))
+    return 200, {"deleted": cart_id}
+
+
+def category_stats(session, match, query, body):
+    return 200, [to_dict(row) for row in CategoryStats.get_all(session)]
+
+
+ROUTES = [
+    ("GET", r"/supplements", list_supplements),
+    ("POST", r"/supplements", create_supplement),
+    ("GET", r"/supplements/(?P<key>[^/]+)", get_supplement),
+    ("DELETE", r"/supplements/(?P<key>[^/]+)", delete_supplement),
+    ("GET", r"/search", search_supplements),
+    ("GET", r"/users", list_users),
+    ("POST", r"/users", create_user),
+    ("GET", r"/users/(?P<key>[^/]+)", get_user),
+    ("DELETE", r"/users/(?P<key>[^/]+)", delete_user),
+    ("GET", r"/cart", list_cart),
+    ("POST", r"/cart", add_to_cart),
+    ("DELETE", r"/cart/(?P<key>\d+)", delete_cart_item),
+    ("GET", r"/category-stats", category_stats),
+]
+ROUTES = [(method, re.compile(pattern + r"/?"), handler) for method, pattern, handler in ROUTES]
+
+
+def parse_body(raw):
+    if not raw:
+        return {}
+    try:
+        body = json.loads(raw)
+    except ValueError:
+        raise HTTPError(400, "request body is not valid JSON")
+    if not isinstance(body, dict):
+        raise HTTPError(400, "request body must be a JSON object")
+    return body
+
+
+def route(method, path):
+    """Return (handler, match) for a request, or raise 404/405."""
+    allowed = False
+    for route_method, pattern, handler in ROUTES:
+        match = pattern.fullmatch(path)
+        if match:
+            if route_method == method:
+                return handler, match
+            allowed = True
+    raise HTTPError(405 if allowed else 404, f"{method} {path} is not supported")
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients can reuse one connection for many requests.
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, the body
+    # waits for the client's delayed ACK (~40 ms per request).
+    disable_nagle_algorithm = True
+    access_log = False
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        try:
+            # Read the body before routing, so a 404/405 does not leave it in
+            # the socket to be parsed as the next keep-alive request.
+            raw = self.read_raw_body()
+            handler, match = route(method, url.path)
+            body = parse_body(raw)
+            session = new_session()
+            try:
+                status, payload = handler(session, match, parse_qs(url.query), body)
+            finally:
+                session.close()
+        except HTTPError as e:
+            status, payload = e.status, {"error": str(e)}
+        except (ValueError, TypeError) as e:
+            status, payload = 400, {"error": str(e)}
+        except OperationalError as e:
+            if is_busy(e):
+                status, payload = 503, {"error": "database is busy, try again"}
+            else:
+                status, payload = self.internal_error()
+        except Exception:
+            status, payload = self.internal_error()
+        self.send_json(status, payload)
+
+    def read_raw_body(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # Without a usable length the body cannot be skipped: end the connection.
+            self.close_connection = True
+            raise HTTPError(400, "invalid Content-Length")
+        return self.rfile.read(length) if length else b""
+
+    def internal_error(self):
+        traceback.print_exc()
+        return 500, {"error": "internal server error"}
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.access_log:
+            super().log_message(format, *args)
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for many clients connecting at once (the default backlog is 5).
+    request_queue_size = 128
+
+
+def make_server(host="127.0.0.1", port=8000, access_log=False):
+    handler = type("RequestHandler", (RequestHandler,), {"access_log": access_log})
+    return Server((host, port), handler)
@@ -0,0 +1,427 @@
+"""Users and carts partitioned across several SQLite files.
+
+SQLite lets one connection write to a file at a time, so with a single
+nutrifit.db every add-to-cart in every process queues for the same lock.
+ShardRouter keeps the catalog (supplements and everything derived from them)
+in one file and spreads users and their cart lines over N shard files, with
+user id % N picking the shard. Writes for users on different shards then
+run in parallel.
+
+Adding to a cart still has to reserve stock, and supplements.quantity lives
+in the catalog. Taking it there on every add would put the single lock back
+in the path, so each shard holds stock allotments instead. These are units
+of a supplement moved out of the catalog, DEFAULT_ALLOTMENT or more at a
+time. Reservations come out of the local allotment inside the shard's own
+transaction, and removed cart lines go back into it. The catalog is only
+written when an allotment runs dry. When the catalog runs dry as well, the
+other shards' allotments are pulled back before an add is refused. So for a
+supplement:
+
+    units for sale = catalog quantity + allotments on every shard
+                   = starting stock - units in carts
+
+Units always leave one file before they are added to another, so a crash
+between the two commits can strand a few units (undersell) but never
+duplicate them (oversell). return_allotments() moves all allotments back,
+e.g. before reading exact stock figures from the catalog alone.
+
+New users get the next free id that routes to their shard (picked by a hash
+of the email), so ids stay unique without a central counter. Email
+uniqueness is enforced per shard only. reshard() moves users and cart lines
+from a single database or an older set of shards to a new shard count.
+
+This is an experiment, not a storage mode: the CLI, batch mode, the HTTP
+service and the async API all read and write the single database, and only
+benchmarks/shards.py drives a ShardRouter. Shard files written by reshard()
+(python -m db.sharding --shards N) are copies that nothing else reads, and
+they drift from the main database as soon as it changes.
+"""
+import heapq
+import os
+import time
+import zlib
+from itertools import islice
+
+import click
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, delete, func, insert, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as upsert
+from sqlalchemy.orm import Session
+
+from db.database import (apply_profile, configure, db_path as current_db_path, ensure_schema, instrument, profile_name,
+                         run_immediate, upgrade_schema)
+from db.models import Base
+from db.models.cart import Cart
+from db.models.supplement import Supplement
+from db.models.user import User
+
+# Units moved from the catalog to a shard whenever its allotment runs dry.
+DEFAULT_ALLOTMENT = 50
+
+SHARD_TABLES = (User.__table__, Cart.__table__)
+
+shard_metadata = MetaData()
+stock_allotments = Table(
+    "stock_allotments", shard_metadata,
+    Column("supplement_id", Integer, primary_key=True),
+    Column("quantity", Integer, nullable=False),
+)
+
+
+def shard_paths(catalog_path, n):
+    """The shard files of an n-way layout next to catalog_path."""
+    base, ext = os.path.splitext(catalog_path)
+    return [f"{base}-shard-{i}-of-{n}{ext or '.db'}" for i in range(n)]
+
+
+def next_user_id(max_id, shard, n):
+    """Smallest id above max_id with id % n == shard."""
+    return max_id + (shard - max_id - 1) % n + 1
+
+
+def credit_allotment(session, supplement_id, quantity):
+    session.execute(
+        upsert(stock_allotments)
+        .values(supplement_id=supplement_id, quantity=quantity)
+        .on_conflict_do_update(
+            index_elements=[stock_allotments.c.supplement_id],
+            set_={"quantity": stock_allotments.c.quantity + quantity},
+        )
+    )
+
+
+def take_allotment(session, supplement_id, quantity):
+    """Take quantity units from the shard's allotment; False (and no change) if fewer are left.
+
+    A quantity below 1 raises ValueError.
+    """
+    if quantity < 1:
+        raise ValueError(f"Quantity must be a positive integer, got {quantity}.")
+    result = session.execute(
+        update(stock_allotments)
+        .where(stock_allotments.c.supplement_id == supplement_id, stock_allotments.c.quantity >= quantity)
+        .values(quantity=stock_allotments.c.quantity - quantity)
+    )
+    return result.rowcount == 1
+
+
+class ShardRouter:
+    def __init__(self, catalog_path, shard_paths, profile=None, allotment=DEFAULT_ALLOTMENT):
+        self.catalog_path = catalog_path
+        self.shard_paths = list(shard_paths)
+        self.profile = profile or profile_name()
+        self.allotment = allotment
+        self._catalog = None
+        self._shards = [None] * len(self.shard_paths)
+
+    @property
+    def n(self):
+        return len(self.shard_paths)
+
+    def _engine(self, path, foreign_keys=True):
+        upgrade_schema(path)
+        engine = create_engine(f"sqlite:///{path}")
+        apply_profile(engine, self.profile, foreign_keys=foreign_keys)
+        instrument(engine)
+        return engine
+
+    def catalog_engine(self):
+        if self._catalog is None:
+            engine = self._engine(self.catalog_path)
+            with engine.begin() as conn:
+                ensure_schema(conn)
+            self._catalog = engine
+        return self._catalog
+
+    def shard_engine(self, index):
+        if self._shards[index] is None:
+            # Cart lines reference supplements, which live in the catalog
+            # file, so SQLite cannot check their foreign keys here; the router
+            # deletes a user's lines itself.
+            engine = self._engine(self.shard_paths[index], foreign_keys=False)
+            with engine.begin() as conn:
+                Base.metadata.create_all(conn, tables=SHARD_TABLES)
+                shard_metadata.create_all(conn)
+            self._shards[index] = engine
+        return self._shards[index]
+
+    def dispose(self):
+        for engine in [self._catalog, *self._shards]:
+            if engine is not None:
+                engine.dispose()
+        self._catalog = None
+        self._shards = [None] * self.n
+
+    def shard_of(self, user_id):
+        return user_id % self.n
+
+    # Sessions keep loaded rows readable after commit and close, since the
+    # router hands them out after its short-lived sessions are gone.
+
+    def catalog_session(self):
+        return Session(bind=self.catalog_engine(), expire_on_commit=False)
+
+    def shard_session(self, index):
+        return Session(bind=self.shard_engine(index), expire_on_commit=False)
+
+    def session_for_user(self, user_id):
+        return self.shard_session(self.shard_of(user_id))
+
+    # Users
+
+    def create_user(self, name, email):
+        index = zlib.crc32(email.encode()) % self.n
+        with self.shard_session(index) as session:
+            def work():
+                max_id = session.execute(select(func.max(User.id))).scalar() or 0
+                user = User(id=next_user_id(max_id, index, self.n), name=name, email=email)
+                session.add(user)
+                session.flush()
+                return user
+            return run_immediate(session, work)
+
+    def find_user(self, user_id):
+        with self.session_for_user(user_id) as session:
+            return session.get(User, user_id)
+
+    def find_user_by_name(self, name):
+        """The lowest-id user with this name on any shard, or None."""
+        found = []
+        for index in range(self.n):
+            with self.shard_session(index) as session:
+                user = session.query(User).filter_by(name=name).order_by(User.id).first()
+            if user is not None:
+                found.append(user)
+        return min(found, key=lambda user: user.id, default=None)
+
+    def delete_user(self, user_id):
+        """Delete a user and their cart lines; the lines' units go back to the shard's allotments."""
+        with self.session_for_user(user_id) as session:
+            def work():
+                user = session.get(User, user_id)
+                if user is None:
+                    raise ValueError("User not found.")
+                for supplement_id, quantity in session.execute(
+                        select(Cart.supplement_id, Cart.quantity).where(Cart.user_id == user_id)):
+                    credit_allotment(session, supplement_id, quantity)
+                session.execute(delete(Cart).where(Cart.user_id == user_id))
+                session.delete(user)
+                session.flush()
+            run_immediate(session, work)
+
+    def _stream_users(self, index, after_id, limit):
+        with self.shard_session(index) as session:
+            yield from User.stream(session, after_id=after_id, limit=limit)
+
+    def list_users(self, after_id=None, limit=20):
+        """Users in id order across every shard (keyset paging on id)."""
+        streams = [self._stream_users(index, after_id, limit) for index in range(self.n)]
+        return list(islice(heapq.merge(*streams, key=lambda user: user.id), limit))
+
+    # Cart
+
+    def list_cart(self, user_id):
+        """A user's cart lines: one shard, no fan-out."""
+        with self.session_for_user(user_id) as session:
+            return session.query(Cart).filter_by(user_id=user_id).order_by(Cart.supplement_id).all()
+
+    def _stream_cart(self, index, after, limit):
+        with self.shard_session(index) as session:
+            query = session.query(Cart).order_by(Cart.user_id, Cart.supplement_id)
+            if after is not None:
+                query = query.filter(tuple_(Cart.user_id, Cart.supplement_id) > tuple_(*after))
+            yield from query.limit(limit).yield_per(1000)
+
+    def list_all_cart(self, after=None, limit=20):
+        """Cart lines of every user, ordered by (user_id, supplement_id); page with
+        after=(user_id, supplement_id) of the last line seen. Cart line ids are
+        per shard, so this pair is the line's global key."""
+        streams = [self._stream_cart(index, after, limit) for index in range(self.n)]
+        merged = heapq.merge(*streams, key=lambda line: (line.user_id, line.supplement_id))
+        return list(islice(merged, limit))
+
+    def add_to_cart(self, user_id, supplement_id, quantity=1):
+        """Reserve stock and add it to the user's cart; returns the line's (shard-local) id.
+
+        Raises ValueError for an unknown user/supplement, a quantity below 1
+        or too little stock.
+        """
+        if quantity < 1:
+            raise ValueError(f"Quantity must be a positive integer, got {quantity}.")
+        with self.catalog_session() as catalog:
+            supplement = catalog.get(Supplement, supplement_id)
+        if supplement is None:
+            raise ValueError(f"Supplement with identifier '{supplement_id}' not found.")
+        index = self.shard_of(user_id)
+        with self.shard_session(index) as session:
+            user = session.get(User, user_id)
+            if user is None:
+                raise ValueError(f"User with identifier '{user_id}' not found.")
+
+            def work():
+                if not take_allotment(session, supplement.id, quantity):
+                    return None
+                return Cart.merge(session, user.name, supplement.name, supplement.price, quantity,
+                                  user.id, supplement.id)
+
+            while True:
+                cart_id = run_immediate(session, work)
+                if cart_id is not None:
+                    return cart_id
+                # Raises ValueError once neither the catalog nor any shard can cover quantity.
+                self._refill(index, supplement, quantity)
+
+    def delete_from_cart(self, user_id, supplement_id):
+        """Remove the user's line for a supplement; its units go back to the shard's allotment."""
+        with self.session_for_user(user_id) as session:
+            def work():
+                line = session.query(Cart).filter_by(user_id=user_id, supplement_id=supplement_id).first()
+                if line is None:
+                    raise ValueError("Cart item not found.")
+                credit_allotment(session, supplement_id, line.quantity)
+                session.delete(line)
+                session.flush()
+            run_immediate(session, work)
+
+    # Stock
+
+    def _take_from_catalog(self, supplement_id, minimum, wanted):
+        """Take up to wanted units (at least minimum) out of supplements.quantity; None if fewer than minimum are left."""
+        with self.catalog_session() as session:
+            def work():
+                left = session.execute(select(Supplement.quantity).where(Supplement.id == supplement_id)).scalar()
+                if left is None or left < minimum:
+                    return None
+                taken = min(left, wanted)
+                session.execute(update(Supplement).where(Supplement.id == supplement_id)
+                                .values(quantity=Supplement.quantity - taken))
+                return taken
+            return run_immediate(session, work)
+
+    def _refill(self, index, supplement, quantity):
+        """Move at least quantity units of supplement from the catalog to shard index."""
+        taken = self._take_from_catalog(supplement.id, quantity, max(quantity, self.allotment))
+        if taken is None:
+            self.return_allotments(supplement.id)
+            taken = self._take_from_catalog(supplement.id, quantity, quantity)
+            if taken is None:
+                raise ValueError(f"Not enough stock of '{supplement.name}' to add {quantity}.")
+        with self.shard_session(index) as session:
+            try:
+                run_immediate(session, lambda: credit_allotment(session, supplement.id, taken))
+            except Exception:
+                with self.catalog_session() as catalog:
+                    run_immediate(catalog, lambda: Supplement.release(catalog, supplement.id, taken))
+                raise
+
+    def return_allotments(self, supplement_id=None):
+        """Move allotted units (of one supplement, or all) from every shard back to the catalog."""
+        for index in range(self.n):
+            with self.shard_session(index) as session:
+                def work():
+                    query = select(stock_allotments).where(stock_allotments.c.quantity > 0)
+                    if supplement_id is not None:
+                        query = query.where(stock_allotments.c.supplement_id == supplement_id)
+                    rows = session.execute(query).all()
+                    session.execute(update(stock_allotments)
+                                    .where(stock_allotments.c.supplement_id.in_([row.supplement_id for row in rows]))
+                                    .values(quantity=0))
+                    return rows
+                rows = run_immediate(session, work)
+            if rows:
+                with self.catalog_session() as catalog:
+                    def give_back():
+                        for row in rows:
+                            Supplement.release(catalog, row.supplement_id, row.quantity)
+                    run_immediate(catalog, give_back)
+
+    def available(self, supplement_id):
+        """Units of a supplement for sale: the catalog's plus every shard's allotment."""
+        with self.catalog_session() as session:
+            total = session.execute(select(Supplement.quantity).where(Supplement.id == supplement_id)).scalar() or 0
+        for index in range(self.n):
+            with self.shard_session(index) as session:
+                total += session.execute(
+                    select(stock_allotments.c.quantity).where(stock_allotments.c.supplement_id == supplement_id)
+                ).scalar() or 0
+        return total
+
+
+def reshard(catalog_path, source_paths, target_paths, batch_size=10000, profile="bulk-load", progress=None):
+    """Copy users and cart lines from source_paths into len(target_paths) new shards.
+
+    The sources are either the catalog itself (splitting a single database)
+    or the files of an older shard layout; their allotments are returned to
+    the catalog first. Users keep their ids and go to shard id % n. Cart
+    lines get new shard-local ids. The targets must hold no users yet. The
+    sources are left as they were, so point the application at the new
+    layout and then delete them. Returns (users, cart lines) copied.
+    """
+    old_shards = [path for path in source_paths if os.path.abspath(path) != os.path.abspath(catalog_path)]
+    if old_shards:
+        old = ShardRouter(catalog_path, old_shards, profile=profile)
+        old.return_allotments()
+        old.dispose()
+    router = ShardRouter(catalog_path, target_paths, profile=profile)
+    targets = [router.shard_engine(index) for index in range(router.n)]
+    for engine in targets:
+        with engine.connect() as conn:
+            if conn.execute(select(func.count()).select_from(User.__table__)).scalar():
+                raise ValueError(f"{engine.url.database} already holds users; reshard into new files.")
+
+    cart_columns = [column for column in Cart.__table__.c if column.name != "id"]
+    copied = {"users": 0, "cart": 0}
+    for path in source_paths:
+        source = router._engine(path)
+        for table, columns in ((User.__table__, list(User.__table__.c)), (Cart.__table__, cart_columns)):
+            key = table.c.id if table is User.__table__ else table.c.user_id
+            with source.connect() as conn:
+                result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+                    select(*columns).order_by(table.c.id))
+                for rows in result.partitions():
+                    by_shard = {}
+                    for row in rows:
+                        by_shard.setdefault(row._mapping[key.name] % router.n, []).append(dict(row._mapping))
+                    for index, shard_rows in by_shard.items():
+                        with targets[index].begin() as target:
+                            target.execute(insert(table), shard_rows)
+                    copied[table.name] += len(rows)
+                    if progress:
+                        progress(copied)
+        source.dispose()
+    router.dispose()
+    return copied["users"], copied["cart"]
+
+
+@click.command()
+@click.option('--db', 'db_path', type=click.Path(dir_okay=False), help="Catalog database (default: $NUTRIFIT_DB or db/nutrifit.db).")
+@click.option('--shards', type=click.IntRange(min=1), required=True, help="Number of shards to split users and carts into.")
+@click.option('--from-shards', type=click.IntRange(min=0), default=0, show_default=True, help="Current number of shards (0: users and carts are still in the main database).")
+@click.option('--batch-size', type=click.IntRange(min=1), default=10000, show_default=True, help="Rows per copy transaction.")
+def main(db_path, shards, from_shards, batch_size):
+    """Copy users and cart lines into SHARDS files next to the database, by user id % SHARDS.
+
+    Experimental: nothing but benchmarks/shards.py reads the shard files.
+    """
+    configure(db_path=db_path)
+    catalog = current_db_path()
+    sources = shard_paths(catalog, from_shards) if from_shards else [catalog]
+    targets = shard_paths(catalog, shards)
+    if from_shards == shards or any(not os.path.exists(path) for path in sources):
+        raise click.UsageError(f"No {from_shards}-shard layout to reshard from next to {catalog}.")
+
+    def progress(copied):
+        click.echo(f"{copied['users']} users, {copied['cart']} cart lines copied", err=True)
+
+    started = time.perf_counter()
+    try:
+        users, lines = reshard(catalog, sources, targets, batch_size=batch_size, progress=progress)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo(f"Copied {users} users and {lines} cart lines into {shards} shard(s) in {time.perf_counter() - started:.2f}s:")
+    for path in targets:
+        click.echo(f"  {path}")
+    click.echo("These are copies for experiments: the CLI and services keep using the main database.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Named read-only copies of the database for long reads.
+
+A long read on the live nutrifit.db (a full export, a report over every
+cart line) holds its read lock for as long as it streams rows. In
+rollback-journal mode that blocks every writer for the whole time. In WAL
+mode writers still proceed, but the WAL cannot be checkpointed past the
+reader and keeps growing. take() copies the database instead, with SQLite's
+online backup API. It copies `pages` pages per step and releases the lock
+between steps, so a writer waits for at most one step. If another
+connection writes to the database mid-copy, SQLite restarts the copy from
+the beginning, so the snapshot is always one consistent point in time.
+Under a steady stream of writes that would never finish, so after
+`restarts` restarts the copy is done in a single step instead, which holds
+the read lock for the length of one copy of the file. The copy goes to a
+.partial file that replaces the old snapshot only once it is complete.
+
+Snapshots live next to the database as nutrifit-snapshot-<name>.db. Nothing
+writes to them after take(), so db.database opens them read-only with
+immutable=1. SQLite then takes no locks and never checks for changes, and
+reads go through a large mmap (SNAPSHOT_PRAGMAS). Re-taking a snapshot
+swaps in a new file, and readers that already have the old one open keep
+reading it.
+"""
+import glob
+import os
+import re
+import sqlite3
+import time
+
+NAME_PATTERN = re.compile(r"[A-Za-z0-9_.-]+")
+DEFAULT_PAGES = 1024
+DEFAULT_RESTARTS = 3
+
+
+class _Restarted(Exception):
+    """The stepped copy restarted more often than allowed."""
+
+
+def snapshot_path(source, name):
+    """The file of the snapshot called name, next to source."""
+    if not NAME_PATTERN.fullmatch(name):
+        raise ValueError(f"Invalid snapshot name '{name}': use letters, digits, '.', '_' and '-'.")
+    base, ext = os.path.splitext(source)
+    return f"{base}-snapshot-{name}{ext or '.db'}"
+
+
+def list_snapshots(source):
+    """(name, path, size in bytes, taken at) for every snapshot of source, by name."""
+    base, ext = os.path.splitext(source)
+    prefix, suffix = f"{base}-snapshot-", ext or ".db"
+    snapshots = []
+    for path in sorted(glob.glob(f"{glob.escape(prefix)}*{glob.escape(suffix)}")):
+        name = path[len(prefix):len(path) - len(suffix)]
+        if NAME_PATTERN.fullmatch(name):
+            stat = os.stat(path)
+            snapshots.append((name, path, stat.st_size, stat.st_mtime))
+    return snapshots
+
+
+def take(source, name, pages=DEFAULT_PAGES, pause=0.0, restarts=DEFAULT_RESTARTS, progress=None):
+    """Copy source into the snapshot called name; returns (path, pages, restarts, seconds).
+
+    pages is the number of pages copied per step, and pause the seconds to
+    sleep between steps to leave writers more room. After restarts restarts
+    the rest is copied in one step. progress(remaining, total) is called
+    after every step.
+    """
+    path = snapshot_path(source, name)
+    if not os.path.exists(source):
+        raise ValueError(f"No database at {source}.")
+    partial = f"{path}.partial"
+    if os.path.exists(partial):
+        os.unlink(partial)
+    started = time.perf_counter()
+    total, restarted, last = 0, 0, None
+    src = sqlite3.connect(source, timeout=30)
+    dst = sqlite3.connect(partial)
+    try:
+        def step(status, remaining, count):
+            nonlocal total, restarted, last
+            if last is not None and remaining > last:
+                restarted += 1
+                if restarted > restarts:
+                    raise _Restarted()
+            total, last = count, remaining
+            if progress:
+                progress(remaining, count)
+
+        try:
+            src.backup(dst, pages=pages, progress=step, sleep=pause)
+        except _Restarted:
+            src.backup(dst)
+        # A copy of a WAL database is marked WAL too; an immutable file must not be.
+        dst.execute("PRAGMA journal_mode=DELETE")
+    except BaseException:
+        dst.close()
+        os.unlink(partial)
+        raise
+    finally:
+        src.close()
+    dst.close()
+    os.replace(partial, path)
+    return path, total, restarted, time.perf_counter() - started
+
+
+def drop(source, name):
+    """Delete the snapshot called name; returns False if there was none."""
+    path = snapshot_path(source, name)
+    if not os.path.exists(path):
+        return False
+    os.unlink(path)
+    return True
@@ -0,0 +1,37 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+LIB = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, LIB)
+
+from db.database import DEFAULT_DB_PATH, configure, get_session, reconfigure  # noqa: E402
+
+
+@pytest.fixture
+def session(tmp_path):
+    """The shared session on a new, empty database file."""
+    configure(db_path=str(tmp_path / "test.db"))
+    yield get_session()
+    reconfigure()
+
+
+@pytest.fixture
+def bundled_db(tmp_path):
+    """A copy of the bundled nutrifit.db, at whatever revision it is stamped with."""
+    path = str(tmp_path / "nutrifit.db")
+    shutil.copyfile(DEFAULT_DB_PATH, path)
+    return path
+
+
+@pytest.fixture
+def catalog(session):
+    """Two users and two supplements; returns (users, supplements)."""
+    from db.models.supplement import Supplement
+    from db.models.user import User
+
+    users = [User.create(session, f"User {i}", f"user{i}@example.com") for i in (1, 2)]
+    supplements = [Supplement.create(session, f"Whey {i}", "test", 10.0 * i, 10, "Protein") for i in (1, 2)]
+    return users, supplements
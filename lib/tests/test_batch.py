@@ -0,0 +1,53 @@
+import json
+
+from db.batch import run_batch
+from db.models.cart import Cart
+from db.models.supplement import Supplement
+from db.models.user import User
+
+
+def ops(*items):
+    return [json.dumps(item) + "\n" for item in items]
+
+
+def stock(session, supplement_id):
+    session.expire_all()
+    return session.get(Supplement, supplement_id).quantity
+
+
+def test_failing_ops_are_replayed_without_the_rest_of_their_chunk(session, catalog):
+    (user, other), (whey, casein) = catalog
+    stats = run_batch(session, ops(
+        {"op": "add_to_cart", "user": user.name, "supplement": whey.id, "qty": 2},
+        {"op": "add_to_cart", "user": user.name, "supplement": whey.id, "qty": 100},
+        {"op": "add_to_cart", "user": "nobody", "supplement": whey.id},
+        {"op": "add_to_cart", "user": other.id, "supplement": casein.name, "qty": -1},
+        {"op": "add_user", "name": "New", "email": "new@example.com"},
+    ), chunk_size=10)
+    assert (stats.succeeded, stats.failed, stats.chunks) == (2, 3, 1)
+    assert [error.split(":")[0] for error in stats.errors] == ["line 2", "line 3", "line 4"]
+    assert stock(session, whey.id) == 8
+    assert stock(session, casein.id) == 10
+    assert [(line.user_id, line.quantity) for line in session.query(Cart)] == [(user.id, 2)]
+    assert session.query(User).filter_by(email="new@example.com").count() == 1
+
+
+def test_good_chunks_commit_around_a_bad_one(session, catalog):
+    (user, _), (whey, _) = catalog
+    lines = ops(*[{"op": "add_to_cart", "user": user.id, "supplement": whey.id} for _ in range(5)])
+    lines[2] = "not json\n"
+    stats = run_batch(session, lines, chunk_size=2)
+    assert (stats.succeeded, stats.failed) == (4, 1)
+    assert stock(session, whey.id) == 6
+
+
+def test_ids_too_large_for_sqlite_fail_one_op(session, catalog):
+    (user, _), (whey, _) = catalog
+    huge = "9" * 23
+    stats = run_batch(session, ops(
+        {"op": "delete_user", "user": huge},
+        {"op": "add_to_cart", "user": user.id, "supplement": whey.id, "qty": int(huge)},
+        {"op": "add_to_cart", "user": user.id, "supplement": whey.id},
+    ))
+    assert (stats.succeeded, stats.failed) == (1, 2)
+    assert stock(session, whey.id) == 9
@@ -0,0 +1,52 @@
+import pytest
+
+from db.database import get_engine
+from db.importer import IMPORTERS, ImportStats, import_file, validate_supplement, write_batch
+from db.models.supplement import Supplement
+from db.models.user import User
+
+
+def row(**fields):
+    return dict({"name": "Whey", "description": " Vanilla ", "price": "29.99", "quantity": "40", "category": "Protein"},
+                **fields)
+
+
+def test_validate_supplement_cleans_fields():
+    assert validate_supplement(row(quantity="")) == {
+        "name": "Whey", "description": "Vanilla", "price": 29.99, "quantity": 0, "category": "Protein",
+    }
+
+
+@pytest.mark.parametrize("price", ["nan", "inf", "-inf", "NaN", "Infinity", "-1", "", None, "cheap"])
+def test_validate_supplement_rejects_bad_prices(price):
+    with pytest.raises(ValueError):
+        validate_supplement(row(price=price))
+
+
+@pytest.mark.parametrize("fields", [{"name": " "}, {"quantity": "-1"}, {"quantity": "1.5"}])
+def test_validate_supplement_rejects_bad_fields(fields):
+    with pytest.raises(ValueError):
+        validate_supplement(row(**fields))
+
+
+def test_import_reports_invalid_rows_and_keeps_the_rest(session, tmp_path):
+    path = tmp_path / "supplements.csv"
+    path.write_text("name,price,quantity,category\nGood,5,3,X\nBad,inf,2,X\nAlso good,7,1,X\nWorse,nan,1,X\n")
+    stats = import_file(get_engine(), "supplements", str(path))
+    assert (stats.inserted, stats.invalid) == (2, 2)
+    assert [error.split(":")[0] for error in stats.errors] == ["line 3", "line 5"]
+    assert sorted(s.name for s in session.query(Supplement)) == ["Also good", "Good"]
+
+
+def test_write_batch_replays_rows_the_database_rejects(session):
+    table, key, _ = IMPORTERS["users"]
+    stats = ImportStats()
+    batch = [
+        ("line 2", {"name": "Ann", "email": "ann@example.com"}),
+        ("line 3", {"name": None, "email": "nobody@example.com"}),
+        ("line 4", {"name": "Bob", "email": "bob@example.com"}),
+    ]
+    write_batch(get_engine(), table, key, batch, False, stats)
+    assert (stats.inserted, stats.invalid) == (2, 1)
+    assert stats.errors[0].startswith("line 3: rejected by the database")
+    assert sorted(u.email for u in session.query(User)) == ["ann@example.com", "bob@example.com"]
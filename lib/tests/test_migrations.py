@@ -0,0 +1,65 @@
+import sqlite3
+
+from alembic import command
+from alembic.config import Config
+
+from db.database import HEAD_REVISION, MIGRATIONS_DIR, upgrade_schema
+
+# The bundled database is stamped with this revision; the migrations after it
+# are the ones that can run on an existing file.
+BUNDLED_REVISION = "669f6811d9cc"
+
+
+def alembic_config(path):
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    config.set_main_option("sqlalchemy.url", f"sqlite:///{path}")
+    return config
+
+
+def query(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def revision(path):
+    return query(path, "SELECT version_num FROM alembic_version")[0][0]
+
+
+def test_bundled_database_is_upgraded_to_head(bundled_db):
+    assert revision(bundled_db) == BUNDLED_REVISION
+    upgrade_schema(bundled_db)
+    assert revision(bundled_db) == HEAD_REVISION
+    tables = {name for name, in query(bundled_db, "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"orders", "order_items", "category_stats", "supplements_fts"} <= tables
+
+
+def test_migrations_downgrade_and_upgrade_again(bundled_db):
+    upgrade_schema(bundled_db)
+    cart = query(bundled_db, "SELECT id, user_id, supplement_id, quantity FROM cart ORDER BY id")
+    config = alembic_config(bundled_db)
+    # 1258db81ee53 itself cannot be downgraded on the bundled file (its cart
+    # table predates the revision), so the round trip stops just above it.
+    command.downgrade(config, "1258db81ee53")
+    assert revision(bundled_db) == "1258db81ee53"
+    command.upgrade(config, "head")
+    assert revision(bundled_db) == HEAD_REVISION
+    assert query(bundled_db, "SELECT id, user_id, supplement_id, quantity FROM cart ORDER BY id") == cart
+
+
+def test_orphaned_cart_lines_are_dropped_without_restocking(bundled_db):
+    config = alembic_config(bundled_db)
+    command.upgrade(config, "5c8f2a61d9e0")
+    conn = sqlite3.connect(bundled_db)
+    with conn:
+        supplement_id, = conn.execute("SELECT supplement_id FROM cart ORDER BY id").fetchone()
+        conn.execute("INSERT INTO cart (quantity, user_id, supplement_id) VALUES (7, 999999, ?)", (supplement_id,))
+    conn.close()
+    stock = query(bundled_db, "SELECT id, quantity FROM supplements ORDER BY id")
+
+    command.upgrade(config, "head")
+    assert query(bundled_db, "SELECT COUNT(*) FROM cart WHERE user_id = 999999") == [(0,)]
+    assert query(bundled_db, "SELECT id, quantity FROM supplements ORDER BY id") == stock
@@ -0,0 +1,69 @@
+import pytest
+
+from db.models.cart import Cart
+from db.models.supplement import Supplement
+from db.models.user import User
+
+
+def stock(session, supplement):
+    session.expire_all()
+    return session.get(Supplement, supplement.id).quantity
+
+
+def test_add_reserves_stock(session, catalog):
+    (user, _), (whey, _) = catalog
+    Cart.add(session, user, whey, 3)
+    assert stock(session, whey) == 7
+    Cart.add(session, user, whey, 2)
+    lines = session.query(Cart).filter_by(user_id=user.id).all()
+    assert [(line.supplement_id, line.quantity) for line in lines] == [(whey.id, 5)]
+    assert stock(session, whey) == 5
+
+
+@pytest.mark.parametrize("quantity", [0, -50])
+def test_add_refuses_non_positive_quantity(session, catalog, quantity):
+    (user, _), (whey, _) = catalog
+    with pytest.raises(ValueError):
+        Cart.add(session, user, whey, quantity)
+    session.rollback()
+    assert stock(session, whey) == 10
+    assert session.query(Cart).count() == 0
+
+
+def test_add_refuses_more_than_in_stock(session, catalog):
+    (user, _), (whey, _) = catalog
+    with pytest.raises(ValueError, match="Not enough stock"):
+        Cart.add(session, user, whey, 11)
+    session.rollback()
+    assert stock(session, whey) == 10
+    assert session.query(Cart).count() == 0
+
+
+def test_delete_and_clear_release_stock(session, catalog):
+    (user, _), (whey, casein) = catalog
+    line = Cart.add(session, user, whey, 4)
+    Cart.add(session, user, casein, 6)
+    Cart.delete(session, line)
+    assert stock(session, whey) == 10
+    Cart.clear(session, user.id)
+    assert stock(session, casein) == 10
+    assert session.query(Cart).count() == 0
+
+
+def test_deleting_user_with_loaded_cart_releases_and_cascades(session, catalog):
+    (user, other), (whey, _) = catalog
+    Cart.add(session, user, whey, 4)
+    Cart.add(session, other, whey, 1)
+    assert len(user.carts) == 1
+    User.delete(session, user.id)
+    assert stock(session, whey) == 9
+    assert [line.user_id for line in session.query(Cart)] == [other.id]
+
+
+def test_deleting_supplement_with_loaded_lines_cascades(session, catalog):
+    (user, _), (whey, casein) = catalog
+    Cart.add(session, user, whey, 4)
+    Cart.add(session, user, casein, 1)
+    assert len(whey.cart_items) == 1
+    Supplement.delete(session, whey.id)
+    assert [line.supplement_id for line in session.query(Cart)] == [casein.id]